@@ -4,6 +4,7 @@ import psutil
 import json
 import subprocess
 import platform
+import sys
 from datetime import datetime, timedelta
 
 # Tentative d'import nvidia-ml-py
@@ -17,6 +18,15 @@ except ImportError:
 # Obtenir le répertoire courant
 base_dir = os.path.dirname(os.path.abspath(__file__))
 
+# Métriques publiées par le détecteur (bloc mémoire partagé, voir src/pipeline_metrics.py)
+sys.path.insert(0, os.path.join(os.path.dirname(base_dir), 'src'))
+from pipeline_metrics import read_metrics
+from storage_manager import read_usage
+from config import ARDUINO_PORT, BAUD_RATE, PIPELINE_METRICS_INTERVAL, FINETUNE_STATUS_PATH
+
+# Au-delà, le détecteur est considéré comme arrêté
+METRICS_STALE_SECONDS = max(5.0, 5 * PIPELINE_METRICS_INTERVAL)
+
 app = Flask(__name__, 
             static_folder=os.path.join(base_dir, 'static'),
             static_url_path='/static',
@@ -175,7 +185,7 @@ def processes():
 def scripts_status():
     """Vérifie l'état réel de tous les scripts"""
     try:
-        scripts_list = ['test_app.py', 'test_hardware.py', 'run_auto.sh', 'run_manual.sh']
+        scripts_list = ['test_app.py', 'test_hardware.py', 'run_auto.sh', 'run_manual.sh', 'run_finetune.sh']
         status = {}
         
         for script in scripts_list:
@@ -308,20 +318,47 @@ def save_config():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+# ============= API PIPELINE ============= 
+
+def _live_metrics():
+    """Dernier instantané du détecteur, ou None s'il ne tourne pas"""
+    metrics = read_metrics()
+    if not metrics or not metrics.get('running') or metrics.get('age_s', 0) > METRICS_STALE_SECONDS:
+        return None
+    return metrics
+
+@app.route('/api/pipeline/metrics')
+def pipeline_metrics():
+    """Métriques en direct du détecteur (FPS, latences par étape, files, tris/min)"""
+    try:
+        metrics = read_metrics()
+        if metrics is None:
+            return jsonify({'success': True, 'running': False, 'error': 'Aucune métrique publiée'})
+        if metrics.get('age_s', 0) > METRICS_STALE_SECONDS:
+            metrics['running'] = False
+        return jsonify({'success': True, **metrics})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e), 'running': False})
+
 # ============= API CAMÉRA ============= 
 
 @app.route('/api/camera/status')
 def camera_status():
-    """Récupère le statut de la caméra"""
+    """Récupère le statut de la caméra (métriques du détecteur)"""
     try:
-        # TODO: Intégrer avec le code caméra réel
+        metrics = _live_metrics()
+        if metrics is None:
+            return jsonify({'success': True, 'connected': False, 'error': 'Détecteur arrêté'})
+        camera = metrics['camera']
+        last_frame = camera.get('last_frame')
         return jsonify({
             'success': True,
             'connected': True,
-            'resolution': '1920x1080',
-            'fps': 30,
-            'device': '/dev/video0',
-            'last_frame': datetime.now().isoformat()
+            'resolution': camera.get('resolution'),
+            'fps': camera.get('fps'),
+            'device': camera.get('source'),
+            'replay': camera.get('replay', False),
+            'last_frame': datetime.fromtimestamp(last_frame).isoformat() if last_frame else None
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e), 'connected': False})
@@ -330,19 +367,73 @@ def camera_status():
 
 @app.route('/api/arduino/status')
 def arduino_status():
-    """Récupère le statut d'Arduino"""
+    """Récupère le statut d'Arduino (actionneur du détecteur)"""
     try:
-        # TODO: Intégrer avec le code Arduino réel
+        metrics = _live_metrics()
+        if metrics is None:
+            return jsonify({
+                'success': True,
+                'connected': False,
+                'port': ARDUINO_PORT,
+                'baudrate': BAUD_RATE,
+                'error': 'Détecteur arrêté'
+            })
+        arduino = metrics['arduino']
+        last_communication = arduino.get('last_communication')
+        if arduino.get('busy'):
+            motor_status = f"Tri en cours ({arduino.get('current')})"
+        elif arduino.get('connected'):
+            motor_status = 'Fonctionnel'
+        else:
+            motor_status = 'Simulation'
         return jsonify({
             'success': True,
-            'connected': True,
-            'port': 'COM3',
-            'baudrate': 9600,
-            'motor_status': 'Fonctionnel',
-            'last_communication': datetime.now().isoformat()
+            'connected': arduino.get('connected', False),
+            'port': arduino.get('port'),
+            'baudrate': arduino.get('baudrate'),
+            'motor_status': motor_status,
+            'queued': arduino.get('queued', 0),
+            'completed': arduino.get('completed', 0),
+            'timeouts': arduino.get('timeouts', 0),
+            'errors': arduino.get('errors', 0),
+            'last_message': arduino.get('last_line'),
+            'last_communication': datetime.fromtimestamp(last_communication).isoformat() if last_communication else None
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e), 'connected': False})
 
+# ============= API STOCKAGE ============= 
+
+@app.route('/api/storage')
+def storage_usage():
+    """Usage du dossier d'apprentissage (quota, classes, dossiers, évictions, disque)"""
+    try:
+        # Compteurs en direct si le détecteur tourne, sinon index sur disque (lecture seule)
+        metrics = _live_metrics()
+        usage = metrics.get('storage') if metrics else None
+        if usage is None:
+            usage = read_usage()
+        if usage is None:
+            return jsonify({'success': True, 'indexed': False,
+                            'error': "Index absent : python3 src/storage_manager.py rescan"})
+        return jsonify({'success': True, 'indexed': True, **usage})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+# ============= API ENTRAÎNEMENT ============= 
+
+@app.route('/api/training/finetune')
+def finetune_status():
+    """État du réentraînement en arrière-plan (époque, métriques avant / après, historique)"""
+    try:
+        if not FINETUNE_STATUS_PATH.exists():
+            return jsonify({'success': True, 'state': 'never_run', 'history': []})
+        status = json.loads(FINETUNE_STATUS_PATH.read_text())
+        updated_at = status.get('updated_at')
+        status['updated_at'] = datetime.fromtimestamp(updated_at).isoformat() if updated_at else None
+        return jsonify({'success': True, **status})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000, host='0.0.0.0')
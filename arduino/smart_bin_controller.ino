@@ -11,6 +11,12 @@
  * - Yellow : 150° | Bascule HAUT   (vers 0°)
  * - Green  : 90°  | Bascule BAS    (vers 180°)
  * 
+ * COMMANDES SÉRIE :
+ * - brown / yellow / green      : tri d'un objet puis retour au repos
+ * - batch brown,green,yellow    : tri enchaîné de plusieurs objets, la plateforme
+ *                                 passe d'un bac au suivant sans revenir au repos
+ * - stop / calibrate
+ * 
  * MATÉRIEL :
  * - 2x Servomoteurs MG996R
  * - NVIDIA Jetson Nano (via USB Série)
@@ -51,7 +57,9 @@ const int TILT_DOWN = 160;         // Vidage vers le bas (proche de 180°)
 // ============================================
 // CONSTANTES DE TIMING (millisecondes)
 // ============================================
-const int DELAY_ORIENTATION = 1000;    // Temps pour tourner vers la position
+const int DELAY_ORIENTATION = 1000;    // Temps pour tourner de ORIENTATION_DELAY_DEGREES
+const int ORIENTATION_DELAY_DEGREES = 60;  // Rotation couverte par DELAY_ORIENTATION
+const int DELAY_ORIENTATION_MIN = 150;  // Attente min (plateforme déjà en face du bac)
 const int DELAY_DUMP = 600;            // Temps pour basculer pour le vidage
 const int DELAY_VIBRATION = 150;       // Durée de chaque secousse
 const int VIBRATION_COUNT = 4;         // Nombre de secousses
@@ -61,6 +69,14 @@ const int DELAY_RESET = 500;           // Temps pour retour au repos
 // Amplitude de vibration
 const int VIBRATION_AMPLITUDE = 20;    // Degrés de mouvement pendant la secousse
 
+const int MAX_BATCH = 8;               // Bacs max par commande batch
+
+// Angle d'orientation courant (temps de rotation proportionnel au déplacement)
+int currentOrientation = POSITION_REST;
+
+// Prototype (argument par défaut déclaré une seule fois)
+void executeSortingSequence(int targetAngle, String binName, int tiltDirection, bool returnToRest = true);
+
 
 // ============================================
 // SETUP - EXÉCUTÉ UNE FOIS
@@ -79,7 +95,7 @@ void setup() {
   
   // Message de démarrage
   Serial.println("Smart Bin SI - Controleur Arduino Pret");
-  Serial.println("En attente de commandes : yellow, green, brown, stop, calibrate");
+  Serial.println("En attente de commandes : yellow, green, brown, batch, stop, calibrate");
 }
 
 
@@ -103,6 +119,9 @@ void loop() {
     else if (command == "green") {
       executeSortingSequence(ANGLE_GREEN, "GREEN", 1);  // 1 = bascule BAS
     }
+    else if (command.startsWith("batch ")) {
+      executeBatch(command.substring(6));
+    }
     else if (command == "stop") {
       emergencyStop();
     }
@@ -128,8 +147,10 @@ void loop() {
  * @param targetAngle      Angle de rotation cible (30°/90°/150°)
  * @param binName          Nom du bac pour le débogage
  * @param tiltDirection    0 = HAUT (vers 0°), 1 = BAS (vers 180°)
+ * @param returnToRest     false dans un lot : l'orientation reste sur le bac
+ *                         (seule l'inclinaison revient à plat)
  */
-void executeSortingSequence(int targetAngle, String binName, int tiltDirection) {
+void executeSortingSequence(int targetAngle, String binName, int tiltDirection, bool returnToRest) {
   Serial.print("Cible : ");
   Serial.print(binName);
   Serial.print(" bac | ");
@@ -143,8 +164,7 @@ void executeSortingSequence(int targetAngle, String binName, int tiltDirection)
   Serial.print(targetAngle);
   Serial.print("°... ");
   
-  orientationServo.write(targetAngle);
-  delay(DELAY_ORIENTATION);
+  rotateTo(targetAngle);
   
   // PHASE 2 : VIDAGE
   // Incliner la plateforme pour libérer les déchets
@@ -183,23 +203,91 @@ void executeSortingSequence(int targetAngle, String binName, int tiltDirection)
   tiltServo.write(POSITION_REST);
   delay(DELAY_RESET);
   
+  if (!returnToRest) {
+    // Lot en cours : le bac suivant part de cette orientation
+    Serial.println("OK");
+    return;
+  }
+  
   // Puis centrer la rotation
   orientationServo.write(POSITION_REST);
+  currentOrientation = POSITION_REST;
   
   Serial.println("✓ Termine");
 }
 
 
+// ============================================
+// TRI ENCHAÎNÉ (LOT)
+// ============================================
+/**
+ * Trie plusieurs objets à la suite : "batch brown,green,yellow"
+ * L'ordre est choisi par le Jetson pour limiter la rotation ; la plateforme
+ * ne revient au repos qu'après le dernier bac, puis envoie un seul "Termine"
+ * 
+ * @param targets  Bacs séparés par des virgules
+ */
+void executeBatch(String targets) {
+  String bins[MAX_BATCH];
+  int count = 0;
+  
+  // Découper et valider la liste avant de bouger
+  while (targets.length() > 0 && count < MAX_BATCH) {
+    int comma = targets.indexOf(',');
+    String name = (comma < 0) ? targets : targets.substring(0, comma);
+    name.trim();
+    targets = (comma < 0) ? "" : targets.substring(comma + 1);
+    if (name != "brown" && name != "yellow" && name != "green") {
+      Serial.print("Erreur : Bac inconnu dans le lot '");
+      Serial.print(name);
+      Serial.println("'");
+      return;
+    }
+    bins[count++] = name;
+  }
+  if (count == 0) {
+    Serial.println("Erreur : Lot vide");
+    return;
+  }
+  
+  Serial.print("Lot de ");
+  Serial.print(count);
+  Serial.println(" objets");
+  
+  for (int i = 0; i < count; i++) {
+    bool last = (i == count - 1);
+    if (bins[i] == "brown") {
+      executeSortingSequence(ANGLE_BROWN, "BROWN", 0, last);
+    } else if (bins[i] == "yellow") {
+      executeSortingSequence(ANGLE_YELLOW, "YELLOW", 0, last);
+    } else {
+      executeSortingSequence(ANGLE_GREEN, "GREEN", 1, last);
+    }
+  }
+}
+
+
 // ============================================
 // FONCTIONS UTILITAIRES
 // ============================================
 
+/**
+ * Rotation vers un angle, attente proportionnelle au déplacement
+ */
+void rotateTo(int targetAngle) {
+  int travel = abs(targetAngle - currentOrientation);
+  orientationServo.write(targetAngle);
+  currentOrientation = targetAngle;
+  delay(max((long)DELAY_ORIENTATION_MIN, (long)DELAY_ORIENTATION * travel / ORIENTATION_DELAY_DEGREES));
+}
+
 /**
  * Arrêt d'urgence - retour immédiat en position de repos
  * Peut être appelé via la commande série "STOP"
  */
 void emergencyStop() {
   orientationServo.write(POSITION_REST);
+  currentOrientation = POSITION_REST;
   tiltServo.write(POSITION_REST);
   Serial.println("ARRET D'URGENCE - Retour en position de repos");
 }
@@ -222,6 +310,7 @@ void calibrationMode() {
   
   // Retour au centre
   orientationServo.write(POSITION_REST);
+  currentOrientation = POSITION_REST;
   delay(1000);
   
   // Test servo d'inclinaison
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Smart Bin SI - Coût base de données par tri (usage_count)
+Compare, sur une base temporaire du même disque que data/ (carte SD) :
+  avant : journal DELETE, synchronous=FULL, UPDATE + commit à chaque tri
+  WAL   : journal WAL, synchronous=NORMAL, UPDATE + commit à chaque tri
+  après : WAL + compteurs en mémoire, une transaction par DB_USAGE_FLUSH_INTERVAL
+Usage : python3 scripts/bench_db.py [--sorts 500] [--dir data/]
+"""
+import argparse
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+import waste_classifier  # noqa: E402
+from config import DATA_DIR, DB_USAGE_FLUSH_INTERVAL  # noqa: E402
+
+ITEMS = ["plastic_bottle", "can", "paper", "cardboard", "glass_bottle", "banana_peel"]
+# Tris groupés sur une plateforme chargée : ~30 tris / min → tris par écriture groupée
+SORTS_PER_MINUTE = 30
+
+
+def _create(path, journal_mode, synchronous):
+    conn = sqlite3.connect(str(path))
+    conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS waste_classification (
+            item_name TEXT PRIMARY KEY,
+            bin_color TEXT NOT NULL,
+            created_at TEXT,
+            usage_count INTEGER DEFAULT 1
+        )
+    """)
+    conn.executemany("INSERT OR IGNORE INTO waste_classification VALUES (?, 'yellow', '', 1)",
+                     [(name,) for name in ITEMS])
+    conn.commit()
+    return conn
+
+
+def bench_commit_per_sort(path, sorts, journal_mode, synchronous):
+    """Ancienne version : une transaction (et ses fsync) par tri"""
+    conn = _create(path, journal_mode, synchronous)
+    samples = []
+    for i in range(sorts):
+        start = time.perf_counter()
+        conn.execute("UPDATE waste_classification SET usage_count = usage_count + 1 WHERE item_name = ?",
+                     (ITEMS[i % len(ITEMS)],))
+        conn.commit()
+        samples.append(time.perf_counter() - start)
+    conn.close()
+    return samples
+
+
+def bench_write_behind(path, sorts):
+    """Nouvelle version : waste_classifier (WAL + compteurs écrits par lot)"""
+    _create(path, "WAL", "NORMAL").close()
+    waste_classifier.DB_PATH = path
+    waste_classifier.init_database()
+    batch = max(1, int(SORTS_PER_MINUTE * DB_USAGE_FLUSH_INTERVAL / 60))
+    samples, flushes = [], []
+    for i in range(sorts):
+        start = time.perf_counter()
+        waste_classifier.classify_and_sort(ITEMS[i % len(ITEMS)], ask_if_unknown=False, send=False)
+        samples.append(time.perf_counter() - start)
+        if (i + 1) % batch == 0:
+            start = time.perf_counter()
+            waste_classifier.flush_usage_counts()
+            flushes.append(time.perf_counter() - start)
+    waste_classifier.cleanup()
+    # Coût de l'écriture groupée réparti sur les tris qu'elle regroupe
+    amortized = sum(flushes) / sorts
+    return [s + amortized for s in samples], batch
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return (statistics.mean(samples) * 1000, ordered[int(0.95 * (len(ordered) - 1))] * 1000,
+            ordered[-1] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coût DB par tri, avant / après")
+    parser.add_argument("--sorts", type=int, default=500, help="Nombre de tris simulés")
+    parser.add_argument("--dir", default=str(DATA_DIR), help="Dossier de la base temporaire (même disque)")
+    args = parser.parse_args()
+
+    Path(args.dir).mkdir(parents=True, exist_ok=True)
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.dir, prefix="bench_db_") as tmp:
+        tmp = Path(tmp)
+        results["avant (DELETE, FULL)"] = bench_commit_per_sort(tmp / "before.db", args.sorts, "DELETE", "FULL")
+        results["WAL, NORMAL"] = bench_commit_per_sort(tmp / "wal.db", args.sorts, "WAL", "NORMAL")
+        samples, batch = bench_write_behind(tmp / "after.db", args.sorts)
+        results[f"après (WAL + lots de {batch})"] = samples
+
+    print(f"Smart Bin SI - Coût DB par tri ({args.sorts} tris, disque de {args.dir})\n" + "=" * 64)
+    print(f"{'Variante':32} {'moy (ms)':>9} {'p95 (ms)':>9} {'max (ms)':>9}")
+    for name, samples in results.items():
+        mean, p95, worst = _summary(samples)
+        print(f"{name:32} {mean:9.3f} {p95:9.3f} {worst:9.3f}")
+    before = statistics.mean(next(iter(results.values())))
+    after = statistics.mean(samples)
+    print(f"\n✓ Coût moyen par tri divisé par {before / after:.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,4 @@
+#!/bin/bash
+# Réentraînement incrémental en arrière-plan : attend assez de nouvelles images et un poste inactif
+cd "$(dirname "$0")/.."
+exec python3 src/finetune.py daemon
@@ -0,0 +1,4 @@
+#!/bin/bash
+# Serveur de modèle partagé : un seul YOLO pour plusieurs détecteurs (USE_MODEL_SERVER)
+cd "$(dirname "$0")/.."
+exec python3 src/model_server.py
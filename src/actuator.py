@@ -0,0 +1,237 @@
+"""
+Smart Bin SI - Actionneur de tri non bloquant
+- Un thread propriétaire du port série envoie les commandes de tri depuis une file
+- Un thread lecteur lit les messages de l'Arduino : la ligne "Termine" marque la fin de la séquence
+- Le détecteur continue d'analyser les images pendant que les servos bougent
+"""
+
+import queue
+import threading
+import time
+
+from config import SORTING_DURATION, ACTUATOR_QUEUE_SIZE, ACTUATOR_ACK_DRAIN
+
+# Message de fin de séquence envoyé par smart_bin_controller.ino
+ACK_TOKEN = "Termine"
+ERROR_TOKEN = "Erreur"
+
+
+class SortJob:
+    """Commande de tri en attente ou en cours"""
+
+    __slots__ = ("command", "timeout", "submitted_at", "started_at", "finished_at", "ok", "done")
+
+    def __init__(self, command, timeout=None):
+        self.command = command
+        self.timeout = timeout
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.ok = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class SortActuator:
+    """
+    Propriétaire du port série : file de commandes + lecture des acquittements
+    """
+
+    def __init__(self, serial_port=None, ack_timeout=SORTING_DURATION,
+                 maxsize=ACTUATOR_QUEUE_SIZE, ack_drain=ACTUATOR_ACK_DRAIN):
+        """
+        Args:
+            serial_port: serial.Serial ouvert, ou None pour la simulation
+            ack_timeout: Attente max de "Termine" avant de considérer le tri fini (s)
+            maxsize: Taille max de la file de commandes
+            ack_drain: Après un délai dépassé, attente max du "Termine" tardif (s)
+        """
+        self.serial = serial_port
+        self.ack_timeout = ack_timeout
+        self.ack_drain = ack_drain
+        self.commands = queue.Queue(maxsize=maxsize)
+        self.current = None
+        self.stop_event = threading.Event()
+        self._ack = threading.Event()
+        self._ack_ok = True
+        # Commande en attente d'acquittement (None : un "Termine" reçu est en retard)
+        self._awaiting = None
+        self._ack_lock = threading.Lock()
+        self._threads = []
+        self._pending = 0               # Commandes soumises et pas encore terminées
+        self._pending_lock = threading.Lock()
+
+        # Suivi (affichage / interface admin)
+        self.last_line = None
+        self.last_communication = None
+        self.completed = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.late_acks = 0              # Acquittements reçus après le délai (attendus ou non)
+
+    def start(self):
+        worker = threading.Thread(target=self._worker, name="actuator", daemon=True)
+        self._threads.append(worker)
+        if self.serial is not None:
+            reader = threading.Thread(target=self._reader, name="serial-reader", daemon=True)
+            self._threads.append(reader)
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Arrêter les threads (la commande en cours se termine côté Arduino)"""
+        self.stop_event.set()
+        try:
+            self.commands.put_nowait(None)
+        except queue.Full:
+            pass
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def submit(self, command, timeout=None):
+        """
+        Ajouter une commande de tri à la file (non bloquant)
+
+        Args:
+            command: Commande série ("brown", "batch brown,green"...)
+            timeout: Attente max de l'acquittement (défaut : ack_timeout)
+
+        Retourne:
+            SortJob: À attendre avec job.wait() si besoin, ou None si la file est pleine
+        """
+        job = SortJob(command, timeout)
+        with self._pending_lock:
+            self._pending += 1
+        try:
+            self.commands.put_nowait(job)
+        except queue.Full:
+            with self._pending_lock:
+                self._pending -= 1
+            print(f"⚠ File de tri pleine, commande ignorée : {command}")
+            return None
+        return job
+
+    def is_busy(self):
+        """La plateforme est-elle occupée (tri en cours ou en attente) ?"""
+        return self._pending > 0
+
+    def wait_idle(self, timeout=None):
+        """Attendre que la plateforme soit libre"""
+        deadline = time.time() + timeout if timeout else None
+        while self.is_busy():
+            if deadline and time.time() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def _write(self, command):
+        if self.serial is None:
+            print(f"[Simulation] → Tri vers bac {command}")
+            return True
+        try:
+            self.serial.write(f"{command}\n".encode())
+            self.serial.flush()
+            self.last_communication = time.time()
+            return True
+        except Exception as e:
+            print(f"⚠ Erreur envoi Arduino : {e}")
+            return False
+
+    def _worker(self):
+        while not self.stop_event.is_set():
+            job = self.commands.get()
+            if job is None:
+                break
+            self.current = job
+            job.started_at = time.time()
+            # Acquittements restés d'une commande précédente jetés avant l'envoi :
+            # seul un message reçu après ce point termine cette commande
+            with self._ack_lock:
+                self._ack.clear()
+                self._awaiting = job
+            job.ok = self._write(job.command)
+            timed_out = False
+            if job.ok and self.serial is not None:
+                timeout = job.timeout or self.ack_timeout
+                if self._ack.wait(timeout):
+                    job.ok = self._ack_ok
+                else:
+                    # Pas d'acquittement : on considère la séquence finie après le délai max
+                    self.timeouts += 1
+                    timed_out = True
+                    print(f"⚠ Pas de '{ACK_TOKEN}' de l'Arduino après {timeout:.0f} s")
+            if job.ok:
+                self.completed += 1
+            else:
+                self.errors += 1
+            job.finished_at = time.time()
+            self.current = None
+            job.done.set()
+            if timed_out:
+                self._drain_late_ack()
+            with self._ack_lock:
+                self._awaiting = None
+                self._ack.clear()
+            # Plateforme libre seulement ici : pas de nouvelle commande pendant l'attente
+            with self._pending_lock:
+                self._pending -= 1
+
+    def _drain_late_ack(self):
+        """
+        Après un délai dépassé, attendre le "Termine" tardif (au plus ack_drain) avant
+        d'envoyer la commande suivante : il ne doit pas être pris pour le sien
+        """
+        if self._ack.wait(self.ack_drain):
+            self.late_acks += 1
+            print(f"ℹ '{ACK_TOKEN}' tardif reçu, plateforme libre")
+        else:
+            print(f"⚠ Toujours pas de '{ACK_TOKEN}' après {self.ack_drain:.0f} s, commande suivante envoyée")
+
+    def _reader(self):
+        while not self.stop_event.is_set():
+            try:
+                raw = self.serial.readline()
+            except Exception as e:
+                if not self.stop_event.is_set():
+                    print(f"⚠ Erreur lecture Arduino : {e}")
+                break
+            if not raw:
+                continue
+            line = raw.decode(errors="replace").strip()
+            self.last_line = line
+            self.last_communication = time.time()
+            if ACK_TOKEN in line:
+                self._acknowledge(True)
+            elif line.startswith(ERROR_TOKEN):
+                print(f"⚠ Arduino : {line}")
+                self._acknowledge(False)
+
+    def _acknowledge(self, ok):
+        """Fin de séquence reçue : termine la commande en attente, ignorée sinon"""
+        with self._ack_lock:
+            if self._awaiting is None or self._ack.is_set():
+                # Aucune commande en attente (ou déjà acquittée) : rien à terminer
+                self.late_acks += 1
+                print("ℹ Acquittement Arduino tardif ignoré")
+                return
+            self._ack_ok = ok
+            self._ack.set()
+
+    def status(self):
+        """État courant de l'actionneur"""
+        return {
+            "connected": self.serial is not None,
+            "busy": self.is_busy(),
+            "current": self.current.command if self.current else None,
+            "queued": self.commands.qsize(),
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "late_acks": self.late_acks,
+            "last_line": self.last_line,
+            "last_communication": self.last_communication,
+        }
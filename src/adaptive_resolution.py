@@ -0,0 +1,117 @@
+"""
+Smart Bin SI - Taille d'inférence adaptative
+- Mesure la latence d'inférence récente (moyenne glissante) par rapport au budget 1 / ADAPTIVE_TARGET_FPS
+- Descend d'une taille (ex : 640 → 416 → 320) si le budget est dépassé pendant plusieurs images,
+  remonte seulement si la taille supérieure tiendrait largement dans le budget (hystérésis)
+- Les images qui confirment un tri utilisent toujours la plus grande taille
+"""
+
+from config import (
+    ADAPTIVE_TARGET_FPS, ADAPTIVE_HIGH_RATIO, ADAPTIVE_LOW_RATIO, ADAPTIVE_PATIENCE,
+    ADAPTIVE_COOLDOWN, ADAPTIVE_EWMA_ALPHA,
+)
+
+
+class ResolutionController:
+    """
+    Choix de la taille d'inférence parmi quelques tailles préchauffées
+    """
+
+    def __init__(self, sizes, target_fps=ADAPTIVE_TARGET_FPS, high_ratio=ADAPTIVE_HIGH_RATIO,
+                 low_ratio=ADAPTIVE_LOW_RATIO, patience=ADAPTIVE_PATIENCE,
+                 cooldown=ADAPTIVE_COOLDOWN, alpha=ADAPTIVE_EWMA_ALPHA):
+        """
+        Args:
+            sizes: Tailles autorisées (multiples de 32) ; on démarre à la plus grande
+            target_fps: Cadence visée pour l'inférence
+            high_ratio: Descendre si latence > budget * high_ratio
+            low_ratio: Remonter si la latence estimée à la taille supérieure < budget * low_ratio
+            patience: Images consécutives au-delà d'un seuil avant de changer
+            cooldown: Images ignorées après un changement (mesures de la nouvelle taille)
+            alpha: Poids de la dernière mesure dans la moyenne glissante
+        """
+        self.sizes = sorted(set(int(s) for s in sizes))
+        self.level = len(self.sizes) - 1
+        self.budget = 1.0 / target_fps
+        self.high = self.budget * high_ratio
+        self.low = self.budget * low_ratio
+        self.patience = patience
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self.latency = {}        # taille → latence moyenne glissante (s)
+        self._over = 0
+        self._under = 0
+        self._cooldown_left = 0
+        self.switches = 0
+        self.frames = {size: 0 for size in self.sizes}
+        self.boosted = 0
+
+    @property
+    def size(self):
+        """Taille courante (hors images de confirmation)"""
+        return self.sizes[self.level]
+
+    @property
+    def max_size(self):
+        return self.sizes[-1]
+
+    def select(self, confirming=False):
+        """
+        Args:
+            confirming: True si l'image peut confirmer un tri (piste proche du seuil)
+
+        Retourne:
+            int: Taille d'inférence pour cette image
+        """
+        size = self.max_size if confirming else self.size
+        if confirming and size != self.size:
+            self.boosted += 1
+        self.frames[size] += 1
+        return size
+
+    def observe(self, size, seconds):
+        """Enregistrer la latence d'inférence mesurée à une taille donnée"""
+        previous = self.latency.get(size)
+        self.latency[size] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+        if size != self.size:
+            return  # Image de confirmation : ne pilote pas la taille courante
+        if self._cooldown_left:
+            self._cooldown_left -= 1
+            return
+
+        latency = self.latency[size]
+        if latency > self.high and self.level > 0:
+            self._over += 1
+            self._under = 0
+            if self._over >= self.patience:
+                self._switch(self.level - 1)
+        elif self.level < len(self.sizes) - 1:
+            # Coût ~ proportionnel à la surface de l'image
+            bigger = self.sizes[self.level + 1]
+            predicted = latency * (bigger / size) ** 2
+            self._over = 0
+            self._under = self._under + 1 if predicted < self.low else 0
+            if self._under >= self.patience:
+                self._switch(self.level + 1)
+        else:
+            self._over = self._under = 0
+
+    def _switch(self, level):
+        old = self.size
+        self.level = level
+        self._over = self._under = 0
+        self._cooldown_left = self.cooldown
+        self.switches += 1
+        print(f"↕ Taille d'inférence : {old} → {self.size} "
+              f"(latence {self.latency[old] * 1000:.0f} ms, budget {self.budget * 1000:.0f} ms)")
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "sizes": self.sizes,
+            "target_fps": round(1.0 / self.budget, 2),
+            "latency_ms": {size: round(s * 1000, 1) for size, s in self.latency.items()},
+            "switches": self.switches,
+            "frames": self.frames,
+            "boosted": self.boosted,
+        }
@@ -0,0 +1,364 @@
+"""
+Smart Bin SI - Pipeline caméra en étapes (capture / inférence / affichage)
+- Thread de capture : lit la caméra en continu et ne garde que l'image la plus récente
+- Thread d'inférence : exécute YOLO sur la dernière image disponible
+- Thread principal : affichage OpenCV, clavier et décisions de tri
+Les étapes sont reliées par des files bornées : une étape lente fait jeter
+les images les plus anciennes au lieu de les accumuler.
+En relecture (blocking=True), les files bloquent : aucune image n'est jetée.
+Les images sont lues directement dans un anneau de tampons préalloués (FrameRing) :
+pas d'allocation ni de copie par image, les dernières images analysées restent
+disponibles pour les corrections.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# État d'un emplacement de l'anneau
+FREE, CAPTURED, TAKEN, KEPT = range(4)
+
+
+def get_csi_pipeline(camera_id=0, width=640, height=480, fps=30):
+    """
+    Créer un pipeline GStreamer pour caméra CSI Jetson
+
+    Args:
+        camera_id: ID du capteur caméra (0 ou 1)
+        width: Largeur de l'image
+        height: Hauteur de l'image
+        fps: Fréquence d'images
+
+    Retourne:
+        str: Chaîne de pipeline GStreamer
+    """
+    return (
+        f"nvarguscamerasrc sensor-id={camera_id} ! "
+        f"video/x-raw(memory:NVMM), width={width}, height={height}, "
+        f"format=NV12, framerate={fps}/1 ! "
+        f"nvvidconv flip-method=0 ! "
+        f"video/x-raw, width={width}, height={height}, format=BGRx ! "
+        f"videoconvert ! "
+        f"video/x-raw, format=BGR ! appsink"
+    )
+
+
+def put_latest(q, item, on_drop=None):
+    """
+    Dépose un élément dans une file bornée en jetant le plus ancien si elle est pleine
+
+    Args:
+        q: queue.Queue bornée (maxsize >= 1)
+        item: Élément à déposer
+        on_drop: Fonction appelée avec chaque élément jeté (optionnel)
+
+    Retourne:
+        int: Nombre d'éléments jetés pour faire de la place
+    """
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                old = q.get_nowait()
+                dropped += 1
+                if on_drop and old is not None:
+                    on_drop(old)
+            except queue.Empty:
+                pass
+
+
+def put_blocking(q, item, stop_event):
+    """
+    Dépose un élément en attendant de la place (relecture déterministe)
+
+    Retourne:
+        int: 0 (aucun élément jeté), ou 1 si l'arrêt a été demandé avant le dépôt
+    """
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return 0
+        except queue.Full:
+            continue
+    return 1
+
+
+class FrameRing:
+    """
+    Anneau de tampons d'images préalloués, partagé par les étapes du pipeline
+
+    Cycle d'un emplacement : libre → capturé (lu par cap.read) → pris (inférence)
+    → gardé (historique des images analysées) ou libéré. Les images arrivent dans
+    l'ordre des numéros : quand une étape prend l'image n, les images capturées
+    avant n ont été jetées par la file et leurs emplacements sont réutilisables.
+    """
+
+    def __init__(self, history, spare):
+        """
+        Args:
+            history: Images analysées gardées (avec leurs détections) pour les corrections
+            spare: Emplacements pour les images en cours (files + inférences en vol + marge)
+        """
+        self.history = deque(maxlen=history)
+        self.slots = history + spare
+        self.buffers = None
+        self.state = np.full(self.slots, FREE, dtype=np.int8)
+        self.ids = np.zeros(self.slots, dtype=np.int64)
+        self.overflow = 0        # Images lues hors de l'anneau (aucun emplacement libre)
+        self._display = None
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, frame_id):
+        """
+        Emplacement libre pour la prochaine lecture
+
+        Retourne:
+            tuple: (emplacement, tampon), ou (None, None) avant la première image
+                ou si tous les emplacements sont occupés
+        """
+        if self.buffers is None:
+            return None, None
+        with self._lock:
+            for i in range(self.slots):
+                slot = (self._next + i) % self.slots
+                if self.state[slot] == FREE:
+                    self._next = slot + 1
+                    self.state[slot] = CAPTURED
+                    self.ids[slot] = frame_id
+                    return slot, self.buffers[slot]
+            self.overflow += 1
+            return None, None
+
+    def store(self, slot, frame):
+        """
+        Image lue pour un emplacement : en place si cap.read a écrit dans le tampon,
+        sinon copiée (source qui alloue, ex : dossier d'images) ou laissée hors de l'anneau
+
+        Retourne:
+            ndarray: Image à faire circuler dans le pipeline
+        """
+        if self.buffers is None:
+            # Première image : dimensions de la source
+            with self._lock:
+                self.buffers = np.empty((self.slots,) + frame.shape, dtype=frame.dtype)
+                self._display = np.empty_like(frame)
+            return frame
+        if slot is None or np.may_share_memory(frame, self.buffers[slot]):
+            return frame if slot is None else self.buffers[slot]
+        if frame.shape == self.buffers.shape[1:]:
+            np.copyto(self.buffers[slot], frame)
+            return self.buffers[slot]
+        with self._lock:
+            self.state[slot] = FREE
+        return frame
+
+    def abandon(self, slot):
+        """Lecture échouée : rendre l'emplacement"""
+        if slot is not None:
+            with self._lock:
+                self.state[slot] = FREE
+
+    def _release_before(self, frame_id, taken=True):
+        # Images plus anciennes restées capturées (ou prises) : jetées par une file
+        stale = (self.ids < frame_id) & ((self.state == CAPTURED) | (taken & (self.state == TAKEN)))
+        self.state[stale] = FREE
+
+    def _slot_of(self, frame_id):
+        matches = np.flatnonzero((self.ids == frame_id) & (self.state != FREE))
+        return int(matches[0]) if len(matches) else None
+
+    def taken(self, frame_id):
+        """L'étape d'inférence a pris l'image frame_id (les précédentes peuvent être encore en vol)"""
+        with self._lock:
+            self._release_before(frame_id, taken=False)
+            slot = self._slot_of(frame_id)
+            if slot is not None:
+                self.state[slot] = TAKEN
+
+    def keep(self, frame_id, frame, timestamp, detections):
+        """Image analysée : gardée dans l'historique avec ses détections (sans copie)"""
+        with self._lock:
+            self._release_before(frame_id)
+            slot = self._slot_of(frame_id)
+            if slot is not None:
+                self.state[slot] = KEPT
+            if len(self.history) == self.history.maxlen:
+                evicted = self.history[0]["slot"]
+                if evicted is not None:
+                    self.state[evicted] = FREE
+            self.history.append({"frame_id": frame_id, "slot": slot, "frame": frame,
+                                 "timestamp": timestamp, "detections": detections})
+
+    def discard(self, item):
+        """Élément (frame_id, ...) jeté par une file : son emplacement est libéré"""
+        with self._lock:
+            slot = self._slot_of(item[0])
+            if slot is not None and self.state[slot] != KEPT:
+                self.state[slot] = FREE
+
+    def release(self, frame_id):
+        """Image affichée sans être gardée (sautée par le filtre de mouvement)"""
+        with self._lock:
+            self._release_before(frame_id)
+            slot = self._slot_of(frame_id)
+            if slot is not None and self.state[slot] != KEPT:
+                self.state[slot] = FREE
+
+    def best(self, class_id=None):
+        """
+        Image de l'historique où la détection (de la classe donnée) est la plus confiante
+
+        Retourne:
+            tuple: (image, Detection), ou (None, None) si aucune ne correspond
+        """
+        best_frame, best_detection, best_conf = None, None, -1.0
+        for entry in list(self.history):
+            detections = entry["detections"]
+            if not detections:
+                continue
+            conf = detections.confidences
+            if class_id is not None:
+                conf = np.where(detections.class_ids == class_id, conf, -1.0)
+            i = int(np.argmax(conf))
+            if conf[i] > best_conf:
+                best_frame, best_detection, best_conf = entry["frame"], detections[i], float(conf[i])
+        return best_frame, best_detection
+
+    def latest(self):
+        """Dernière image gardée (ou None)"""
+        return self.history[-1]["frame"] if self.history else None
+
+    def display(self, frame):
+        """Copie de l'image dans un tampon d'affichage réutilisé (annotations hors de l'anneau)"""
+        if self._display is None or self._display.shape != frame.shape:
+            self._display = np.empty_like(frame)
+        np.copyto(self._display, frame)
+        return self._display
+
+    def stats(self):
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "kept": len(self.history),
+                "in_use": int((self.state != FREE).sum()),
+                "overflow": self.overflow,
+            }
+
+
+class FrameGrabber(threading.Thread):
+    """
+    Thread de capture : vide le buffer de la caméra en continu
+    pour que l'inférence travaille toujours sur l'image la plus récente
+    """
+
+    def __init__(self, cap, maxsize=1, blocking=False, clock=time.time, timer=None, ring=None):
+        """
+        Args:
+            cap: cv2.VideoCapture déjà ouvert
+            maxsize: Taille de la file de sortie (1 = uniquement la dernière image)
+            blocking: Attendre l'étape suivante au lieu de jeter des images (relecture)
+            clock: Horodatage des images (temps de la source en relecture)
+            timer: StageTimer optionnel (durée de cap.read, étape "capture")
+            ring: FrameRing optionnel : cap.read écrit directement dans ses tampons
+        """
+        super().__init__(name="frame-grabber", daemon=True)
+        self.cap = cap
+        self.frames = queue.Queue(maxsize=maxsize)
+        self.stop_event = threading.Event()
+        self.blocking = blocking
+        self.clock = clock
+        self.timer = timer
+        self.ring = ring
+        self.frame_id = 0
+        self.dropped = 0
+        self.failed = False
+
+    def run(self):
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            slot = buffer = None
+            if self.ring:
+                slot, buffer = self.ring.acquire(self.frame_id + 1)
+            ret, frame = self.cap.read(buffer) if buffer is not None else self.cap.read()
+            if not ret:
+                if self.ring:
+                    self.ring.abandon(slot)
+                self.failed = True
+                break
+            if self.ring:
+                frame = self.ring.store(slot, frame)
+            if self.timer:
+                self.timer.add("capture", time.perf_counter() - start)
+            self.frame_id += 1
+            item = (self.frame_id, self.clock(), frame)
+            if self.blocking:
+                put_blocking(self.frames, item, self.stop_event)
+            else:
+                self.dropped += put_latest(self.frames, item,
+                                           on_drop=self.ring.discard if self.ring else None)
+        # Sentinelle de fin pour l'étape suivante (après les images en file en relecture)
+        if not self.blocking or put_blocking(self.frames, None, self.stop_event):
+            put_latest(self.frames, None)
+
+    def stop(self):
+        self.stop_event.set()
+
+
+class InferenceStage(threading.Thread):
+    """
+    Thread d'inférence : prend la dernière image capturée, exécute la détection
+    et publie (frame_id, timestamp, image, détections) vers l'affichage
+    """
+
+    def __init__(self, frames, infer, maxsize=1, blocking=False, ring=None):
+        """
+        Args:
+            frames: File d'entrée (sortie du FrameGrabber)
+            infer: Fonction image -> détections
+            maxsize: Taille de la file de résultats
+            blocking: Attendre l'affichage au lieu de jeter des résultats (relecture)
+            ring: FrameRing du FrameGrabber (images prises signalées)
+        """
+        super().__init__(name="inference", daemon=True)
+        self.frames = frames
+        self.infer = infer
+        self.ring = ring
+        self.results = queue.Queue(maxsize=maxsize)
+        self.stop_event = threading.Event()
+        self.blocking = blocking
+        self.dropped = 0
+        self.error = None
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    item = self.frames.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+                frame_id, timestamp, frame = item
+                if self.ring:
+                    self.ring.taken(frame_id)
+                detections = self.infer(frame)
+                item = (frame_id, timestamp, frame, detections)
+                if self.blocking:
+                    put_blocking(self.results, item, self.stop_event)
+                else:
+                    self.dropped += put_latest(self.results, item,
+                                               on_drop=self.ring.discard if self.ring else None)
+        except Exception as e:
+            self.error = e
+        if not self.blocking or put_blocking(self.results, None, self.stop_event):
+            put_latest(self.results, None)
+
+    def stop(self):
+        self.stop_event.set()
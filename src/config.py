@@ -24,31 +24,196 @@ MODELS_DIR.mkdir(exist_ok=True)
 MODEL_PATH = str(MODELS_DIR / "best.pt")  # Ton modèle entraîné
 CONFIDENCE_THRESHOLD = 0.6                # Seuil de confiance
 IOU_THRESHOLD = 0.45                      # Seuil NMS
+INFERENCE_SIZE = 640                      # Taille d'entrée du modèle (plus grand côté)
+
+# Taille d'inférence adaptative : descend (640 → 416 → 320) si la latence dépasse
+# le budget 1 / ADAPTIVE_TARGET_FPS, remonte quand la marge le permet (hystérésis)
+ADAPTIVE_RESOLUTION = True
+ADAPTIVE_SIZES = (320, 416, 640)          # Tailles préchauffées (≤ taille configurée)
+ADAPTIVE_TARGET_FPS = 10                  # Cadence d'inférence visée
+ADAPTIVE_HIGH_RATIO = 1.1                 # Descendre si latence > 110 % du budget
+ADAPTIVE_LOW_RATIO = 0.7                  # Remonter si la taille supérieure tient sous 70 %
+ADAPTIVE_PATIENCE = 10                    # Images consécutives avant de changer
+ADAPTIVE_COOLDOWN = 20                    # Images ignorées après un changement
+ADAPTIVE_EWMA_ALPHA = 0.2                 # Lissage de la latence mesurée
+ADAPTIVE_CONFIRM_RATIO = 0.5              # Taille max dès que la piste atteint 50 % du seuil de tri
+
+# Rechargement à chaud : de nouveaux poids copiés sur MODEL_PATH (dans MODELS_DIR)
+# sont chargés en arrière-plan, préchauffés, vérifiés puis échangés entre deux images
+MODEL_HOT_RELOAD = True
+MODEL_RELOAD_INTERVAL = 5.0          # Vérification du fichier de poids (s)
+MODEL_RELOAD_MAX_SLOWDOWN = 3.0      # Refus si le nouveau modèle est 3× plus lent
+MODEL_RELOAD_PROBATION = 50          # Inférences avec retour possible à l'ancien modèle
+MODEL_RELOAD_LOG = DATA_DIR / "model_reloads.jsonl"
+
+# Backend d'inférence : "torch" (torch.hub), "onnx" (ONNX Runtime), "openvino",
+# "torchscript" (module pré-sérialisé, démarrage le plus rapide)
+# ou "onnx-int8" (ONNX quantifié INT8, postes CPU)
+# L'export est créé une fois à côté de best.pt puis réutilisé
+INFERENCE_BACKEND = "torch"
+
+# Quantification INT8 (onnx-int8), calibrée sur un échantillon de TRAINING_DIR
+# Vérifier latence / mémoire / accord avec FP32 avant de l'activer sur un poste :
+#   python3 src/inference_backends.py compare --backend onnx-int8
+QUANT_CALIBRATION_SAMPLES = 200           # Images de calibration
+QUANT_PER_CHANNEL = True                  # Échelles par canal pour les poids
+QUANT_EXCLUDE_HEAD = True                 # Tête Detect laissée en FP32 (précision des boîtes)
+
+# Registre local (code YOLOv5 + poids épinglés) : démarrage sans réseau
+# Épingler une fois avec : python3 src/model_registry.py pin
+MODEL_OFFLINE = True
+MODEL_REGISTRY_DIR = MODELS_DIR / "registry"
+
+# Serveur de modèle : un seul processus charge les poids pour plusieurs caméras
+# (lancer d'abord : python3 src/model_server.py)
+USE_MODEL_SERVER = False
+MODEL_SERVER_SOCKET = "/tmp/smartbin_model.sock"
+MODEL_SERVER_MAX_BATCH = 4                # Images max par passage du modèle
+MODEL_SERVER_MAX_WAIT_MS = 10             # Attente max pour compléter un lot
+MODEL_SERVER_STATS_PATH = DATA_DIR / "model_server_stats.json"
 
 # ============================================
 # CAMÉRA
 # ============================================
-CAMERA_SOURCE = 0        # 0 = USB, 1 = deuxième caméra
+CAMERA_SOURCE = 0        # 0 = USB, 1 = deuxième caméra, ou vidéo / dossier d'images (relecture)
 USE_CSI_CAMERA = False   # True pour Raspberry Pi Camera
 FRAME_WIDTH = 640
 FRAME_HEIGHT = 480
 SHOW_DISPLAY = True      # Afficher la fenêtre OpenCV
 
+# Zone de la plateforme (x1, y1, x2, y2) en pixels de FRAME_WIDTH x FRAME_HEIGHT ; None = image entière
+# Calibration : python3 src/platform_roi.py (prioritaire sur PLATFORM_ROI)
+PLATFORM_ROI = None
+ROI_FILE = DATA_DIR / "roi.json"
+ROI_INFERENCE_SIZE = 320 # Taille d'inférence sur la zone recadrée
+
+# Relecture (CAMERA_SOURCE = fichier vidéo ou dossier d'images) : Arduino simulé,
+# aucune image jetée, rapport de latence par étape à la fin
+REPLAY_SPEED = "native"  # "native" = cadence de la source, "max" = aussi vite que possible
+REPLAY_FOLDER_FPS = 30   # Cadence d'un dossier d'images
+REPLAY_ANSWERS = None    # Script de réponses aux questions (une par ligne), ex: DATA_DIR / "answers.txt"
+REPLAY_DEFAULT_ANSWER = "y"  # Réponse quand le script est épuisé
+REPLAY_REPORT_PATH = DATA_DIR / "replay_report.json"
+
+# Métriques en direct pour l'interface admin (/api/pipeline/metrics) :
+# bloc mémoire partagé (fichier mmap) réécrit au plus une fois par intervalle
+PIPELINE_METRICS = True
+PIPELINE_METRICS_PATH = DATA_DIR / "pipeline_metrics.bin"
+PIPELINE_METRICS_SIZE = 64 * 1024     # Taille du bloc (octets)
+PIPELINE_METRICS_INTERVAL = 1.0       # Secondes entre deux publications
+PIPELINE_METRICS_WINDOW = 1000        # Mesures de latence gardées par étape
+
+CAPTURE_QUEUE_SIZE = 1   # Images en attente d'inférence (1 = toujours la plus récente)
+RESULT_QUEUE_SIZE = 1    # Résultats en attente d'affichage / décision
+FRAME_RING_HISTORY = 8   # Images analysées gardées (sans copie) pour choisir la meilleure à sauvegarder
+
+# Processus d'inférence parallèles (postes CPU multi-cœurs) : 0 = un thread dans le
+# processus principal ; N > 0 = N processus lisant les images dans un anneau en mémoire
+# partagée (aucune copie sérialisée), résultats remis en ordre par numéro d'image
+INFERENCE_WORKERS = 0
+INFERENCE_RING_SLOTS = 0  # Emplacements de l'anneau (0 = 2 par processus)
+WORKER_WEIGHTS_DIR = MODELS_DIR / "workers"  # Copies figées des poids chargés par les processus
+
+# ============================================
+# FILTRE DE MOUVEMENT (saute YOLO si la plateforme est statique)
+# ============================================
+MOTION_GATE = True                # Activer le filtre
+MOTION_SCALE_WIDTH = 160          # Largeur de l'image réduite comparée au fond
+MOTION_PIXEL_THRESHOLD = 25       # Écart de gris pour un pixel "changé"
+MOTION_MIN_CHANGED_RATIO = 0.01   # Part de pixels changés = mouvement
+MOTION_BACKGROUND_ALPHA = 0.05    # Vitesse d'adaptation du fond
+MOTION_SETTLE_FRAMES = 5          # Inférences après l'arrêt du mouvement
+MOTION_IDLE_FPS = 5               # Cadence de vérification quand rien ne bouge
+
 # ============================================
 # ARDUINO
 # ============================================
 ARDUINO_PORT = '/dev/ttyACM0'
 BAUD_RATE = 9600
-SORTING_DURATION = 10    # Secondes d'attente pour le tri
+SORTING_DURATION = 10    # Attente max de l'acquittement "Termine" de l'Arduino (s)
+ACTUATOR_QUEUE_SIZE = 4  # Commandes de tri en attente max
+ACTUATOR_ACK_DRAIN = 10  # Après un délai dépassé : attente max du "Termine" tardif avant la commande suivante (s)
+
+# Angles d'orientation de la plateforme (identiques à smart_bin_controller.ino)
+ORIENTATION_ANGLES = {"brown": 30, "green": 90, "yellow": 150}
+ORIENTATION_REST = 90
+
+# Tri groupé : les objets prêts attendent dans une file puis partent en une commande
+# "batch brown,green" (ordre limitant la rotation, pas de retour au repos entre deux bacs)
+SORT_BATCH = True
+SORT_BATCH_MAX = 4       # Objets max par commande
+SORT_BATCH_WINDOW = 0.5  # Attente (s) pour regrouper des objets prêts presque ensemble
 
 # ============================================
 # APPRENTISSAGE
 # ============================================
 LEARNING_MODE = True      # Demander validation pour chaque détection
 SAVE_IMAGES = True        # Sauvegarder les images
-MIN_DETECTIONS = 3        # Détections consécutives avant tri
+
+# Apprentissage actif : ne demander / enregistrer que les décisions incertaines
+# (confiance faible, 1re et 2e classes proches, classes différentes selon les images).
+# En mode auto, les décisions retenues vont dans training_images/_review/ (à vérifier)
+ACTIVE_LEARNING = True
+ACTIVE_LEARNING_BUDGET = 0.2          # Part visée des décisions demandées / enregistrées
+ACTIVE_LEARNING_MIN_SCORE = 0.15      # Score min (0-1) : une décision sûre n'est jamais retenue
+ACTIVE_LEARNING_WINDOW = 200          # Décisions récentes pour le seuil du budget
+ACTIVE_LEARNING_WEIGHTS = (0.4, 0.3, 0.3)  # Poids confiance, marge, désaccord
+TRAINING_IMAGE_FORMAT = "jpg"     # "jpg", "png" ou "webp"
+TRAINING_IMAGE_QUALITY = 95       # Qualité JPEG/WebP (0-100) ou compression PNG (0-9)
+IMAGE_WRITER_WORKERS = 1          # Threads d'écriture des images (hors boucle caméra)
+IMAGE_WRITER_QUEUE_SIZE = 16      # Images en attente d'écriture max
+IMAGE_WRITER_MAX_BLOCK_S = 0.5    # Attente max si la file est pleine, puis image abandonnée
+
+# Déduplication (hash perceptuel) : un objet resté sur la plateforme n'est
+# enregistré qu'une fois par classe. Nettoyage batch : python3 src/image_dedup.py
+DEDUP_IMAGES = True
+DEDUP_HASH_SIZE = 8               # dHash 8x8 = 64 bits
+DEDUP_MAX_DISTANCE = 6            # Distance de Hamming max entre quasi-doublons
+DEDUP_POLICY = "skip"             # "skip" = ignorer, "merge" = compter sur l'image existante
+DEDUP_INDEX_NAME = ".dhash_index.json"
+
+# Quota du dossier d'apprentissage (carte SD) : python3 src/storage_manager.py status
+# Place faite avant chaque écriture d'image selon la politique d'éviction
+STORAGE_QUOTA_MB = 8192           # Taille max de training_images (0 = pas de quota)
+STORAGE_CLASS_CAP_MB = 1024       # Taille max par classe (0 = pas de limite)
+STORAGE_LOW_WATER = 0.9           # Après éviction, descendre à cette fraction de la limite
+STORAGE_EVICTION_POLICY = "errors_first"  # "oldest", "balanced" ou "errors_first"
+STORAGE_MIN_FREE_MB = 500         # Espace libre minimal sur le disque, sinon image refusée
+STORAGE_INDEX_NAME = ".storage_index.json"
+
+# Paquet du jeu d'apprentissage (gros fichiers + index) : python3 src/dataset_pack.py pack
+DATASET_PACK_DIR = DATA_DIR / "training_pack"
+DATASET_SHARD_SIZE_MB = 256       # Taille max d'un shard
+
+# Réentraînement incrémental (CPU, basse priorité) : python3 src/finetune.py daemon
+# Repart de MODEL_PATH avec les nouvelles images labellisées, ne remplace les poids
+# que s'ils font mieux sur le jeu de validation (rechargés à chaud par le détecteur)
+FINETUNE_DIR = DATA_DIR / "finetune"
+FINETUNE_STATUS_PATH = DATA_DIR / "finetune_status.json"
+FINETUNE_MIN_NEW_IMAGES = 50      # Nouvelles images labellisées avant un cycle
+FINETUNE_HOLDOUT_PERCENT = 15     # Part des images réservée à la validation (fixe par image)
+FINETUNE_EPOCHS = 10
+FINETUNE_MAX_MINUTES = 120        # Budget d'un entraînement (arrêt au-delà, dernier état gardé)
+FINETUNE_IMAGE_SIZE = 416
+FINETUNE_BATCH_SIZE = 8
+FINETUNE_FREEZE = 10              # Couches du backbone gelées (plus rapide sur CPU)
+FINETUNE_NICE = 19                # Priorité la plus basse : le détecteur reste prioritaire
+FINETUNE_THREADS = 2              # Threads de calcul de l'entraînement
+FINETUNE_IDLE_MINUTES = 10        # Poste inactif : aucun tri depuis ce délai
+FINETUNE_CHECK_INTERVAL = 600     # Période de vérification du démon (s)
+FINETUNE_MIN_GAIN = 0.01          # Gain de F1 minimal pour remplacer les poids
+MODEL_BACKUP_DIR = MODELS_DIR / "backups"
+MIN_DETECTIONS = 3        # Ancienne règle (benchmark) : détections consécutives avant tri
 AUTO_SORT_DELAY = 2.0     # Délai entre deux tris (secondes)
 
+# Suivi des objets : le tri se déclenche quand la meilleure classe d'une piste
+# devance la deuxième d'au moins TRACK_EVIDENCE_THRESHOLD (confiance cumulée)
+TRACK_EVIDENCE_THRESHOLD = 1.5
+TRACK_IOU_THRESHOLD = 0.3            # IoU min pour prolonger une piste
+TRACK_MAX_CENTROID_DISTANCE = 80     # Sinon, distance max des centres (px)
+TRACK_MAX_MISSES = 5                 # Images sans détection avant d'oublier la piste
+DETECTION_LOG_PATH = None            # Ex: DATA_DIR / "detections.jsonl" (benchmark tracker.py)
+
 # ============================================
 # BACS DE TRI
 # ============================================
@@ -72,6 +237,23 @@ WASTE_TO_BIN_MAPPING = {
     "trash": "brown",
 }
 
+# Cache mémoire objet → bac : vérification des modifications externes de la DB
+# (PRAGMA data_version, ex : interface admin) au plus une fois par intervalle (s)
+BIN_CACHE_CHECK_INTERVAL = 1.0
+
+# Base SQLite (carte SD) : journal WAL, l'interface admin lit pendant les écritures.
+# synchronous=NORMAL : pas de fsync par transaction, seulement aux checkpoints.
+# Durabilité : un arrêt du programme ne perd rien de validé ; une coupure de courant
+# peut annuler les dernières transactions (base jamais corrompue).
+# usage_count : incréments gardés en mémoire et écrits en une transaction toutes les
+# DB_USAGE_FLUSH_INTERVAL s et à l'arrêt (cleanup) ; un crash en perd au plus autant.
+# Les associations objet → bac (save_to_database) restent validées immédiatement.
+# Mesure : python3 scripts/bench_db.py
+DB_JOURNAL_MODE = "WAL"
+DB_SYNCHRONOUS = "NORMAL"
+DB_BUSY_TIMEOUT_MS = 2000         # Attente max si un autre processus écrit
+DB_USAGE_FLUSH_INTERVAL = 30.0    # Écriture groupée des usage_count (s)
+
 # Couleurs pour l'affichage OpenCV (BGR)
 BIN_COLORS = {
     "yellow": (0, 255, 255),
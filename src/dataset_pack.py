@@ -0,0 +1,265 @@
+"""
+Smart Bin SI - Jeu d'apprentissage empaqueté (shards + index)
+- Regroupe les milliers de petits .jpg + .txt de training_images en quelques gros fichiers
+- Index compact (NumPy) : shard, offset, taille, classe, erreur, boîte YOLO
+- Ajout incrémental : seules les nouvelles images sont ajoutées au dernier shard
+- Accès aléatoire par indice via mmap (pas d'ouverture de fichier par image)
+- Export vers l'arborescence YOLO d'origine si besoin
+
+Commandes :
+  python3 src/dataset_pack.py pack               (crée ou complète le paquet)
+  python3 src/dataset_pack.py info
+  python3 src/dataset_pack.py export <dossier>   (reconstruit <classe>/*.jpg + .txt)
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from config import TRAINING_DIR, DATASET_PACK_DIR, DATASET_SHARD_SIZE_MB
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+SKIPPED_DIRS = ("_duplicates", "_review")   # _review : décisions incertaines non vérifiées
+ERRORS_DIR = "_errors"
+
+INDEX_NAME = "index.npy"
+RECORDS_NAME = "records.jsonl"
+META_NAME = "meta.json"
+
+# Une ligne d'index par image
+INDEX_DTYPE = np.dtype([
+    ("shard", np.uint16),
+    ("offset", np.uint64),
+    ("length", np.uint32),
+    ("class_id", np.int32),      # indice dans meta["classes"] (dossier de l'image)
+    ("label_class", np.int32),   # classe du label YOLO, -1 si pas de label
+    ("box", np.float32, 4),      # x_center, y_center, width, height normalisés
+    ("error", np.bool_),         # image rangée dans _errors/
+])
+
+
+def shard_name(shard):
+    return f"shard_{shard:05d}.bin"
+
+
+def _parse_label(text):
+    """Première ligne d'un label YOLO → (classe, boîte) ou (-1, zéros)"""
+    fields = text.split()
+    if len(fields) < 5:
+        return -1, (0.0, 0.0, 0.0, 0.0)
+    return int(fields[0]), tuple(float(v) for v in fields[1:5])
+
+
+def scan_tree(root):
+    """
+    Images de l'arborescence d'apprentissage
+
+    Retourne:
+        list: [(chemin relatif posix, nom de classe, erreur), ...] triés
+    """
+    root = Path(root)
+    found = []
+    for path in root.rglob("*"):
+        if path.suffix.lower() not in IMAGE_SUFFIXES or path.name.startswith("."):
+            continue
+        rel = path.relative_to(root)
+        if rel.parts[0] in SKIPPED_DIRS or len(rel.parts) < 2:
+            continue
+        error = rel.parts[0] == ERRORS_DIR
+        if error and len(rel.parts) < 3:
+            continue
+        class_name = rel.parts[1] if error else rel.parts[0]
+        found.append((rel.as_posix(), class_name, error))
+    return sorted(found)
+
+
+class DatasetPack:
+    """
+    Paquet d'images : shards binaires + index NumPy + enregistrements (chemin, label)
+    """
+
+    def __init__(self, pack_dir=DATASET_PACK_DIR, shard_size_mb=DATASET_SHARD_SIZE_MB):
+        self.pack_dir = Path(pack_dir)
+        self.shard_size = int(shard_size_mb * 1024 * 1024)
+        self._maps = {}
+        self.meta = {"classes": [], "source": None}
+        self.index = np.zeros(0, dtype=INDEX_DTYPE)
+        self.records = []   # [{"path": ..., "label": ...}, ...] dans l'ordre de l'index
+        self._load()
+
+    def _load(self):
+        meta_path = self.pack_dir / META_NAME
+        if not meta_path.exists():
+            return
+        self.meta = json.loads(meta_path.read_text())
+        self.index = np.load(self.pack_dir / INDEX_NAME)
+        with open(self.pack_dir / RECORDS_NAME) as f:
+            self.records = [json.loads(line) for line in f]
+        # Ajout interrompu avant l'écriture de l'index : oublier les enregistrements en trop
+        if len(self.records) > len(self.index):
+            self.records = self.records[:len(self.index)]
+            self._atomic_save(RECORDS_NAME, lambda f: f.write(
+                "".join(json.dumps(r) + "\n" for r in self.records).encode()))
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def classes(self):
+        return self.meta["classes"]
+
+    # ------------------------------------------
+    # Écriture
+    # ------------------------------------------
+
+    def append_from(self, root=TRAINING_DIR):
+        """
+        Ajouter les images de root absentes du paquet
+
+        Retourne:
+            int: Nombre d'images ajoutées
+        """
+        root = Path(root)
+        self.pack_dir.mkdir(parents=True, exist_ok=True)
+        self.close()
+        known = {r["path"] for r in self.records}
+        new = [item for item in scan_tree(root) if item[0] not in known]
+        if not new:
+            return 0
+
+        classes = list(self.classes)
+        class_ids = {name: i for i, name in enumerate(classes)}
+        shard = int(self.index["shard"].max()) if len(self.index) else 0
+        shard_path = self.pack_dir / shard_name(shard)
+        offset = shard_path.stat().st_size if shard_path.exists() else 0
+
+        rows, records = [], []
+        out = open(shard_path, "ab")
+        try:
+            for rel, class_name, error in new:
+                data = (root / rel).read_bytes()
+                if offset and offset + len(data) > self.shard_size:
+                    out.close()
+                    shard += 1
+                    offset = 0
+                    # Shard absent de l'index : un éventuel fichier (ajout interrompu) est orphelin
+                    out = open(self.pack_dir / shard_name(shard), "wb")
+                out.write(data)
+                if class_name not in class_ids:
+                    class_ids[class_name] = len(classes)
+                    classes.append(class_name)
+                label_path = (root / rel).with_suffix(".txt")
+                label = label_path.read_text() if label_path.exists() else None
+                label_class, box = _parse_label(label) if label else (-1, (0.0, 0.0, 0.0, 0.0))
+                rows.append((shard, offset, len(data), class_ids[class_name], label_class, box, error))
+                records.append({"path": rel, "label": label})
+                offset += len(data)
+            out.flush()
+            os.fsync(out.fileno())
+        finally:
+            out.close()
+
+        # Données d'abord, index ensuite : un arrêt brutal laisse au pire des octets orphelins
+        with open(self.pack_dir / RECORDS_NAME, "a") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        self.index = np.concatenate([self.index, np.array(rows, dtype=INDEX_DTYPE)])
+        self.records.extend(records)
+        self.meta = {"classes": classes, "source": str(root)}
+        self._atomic_save(INDEX_NAME, lambda f: np.save(f, self.index))
+        self._atomic_save(META_NAME, lambda f: f.write(json.dumps(self.meta, indent=2).encode()))
+        return len(new)
+
+    def _atomic_save(self, name, write):
+        path = self.pack_dir / name
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+
+    # ------------------------------------------
+    # Lecture (mmap)
+    # ------------------------------------------
+
+    def _shard(self, shard):
+        if shard not in self._maps:
+            self._maps[shard] = np.memmap(self.pack_dir / shard_name(shard), dtype=np.uint8, mode="r")
+        return self._maps[shard]
+
+    def raw(self, i):
+        """Octets encodés de l'image i (vue mmap, sans copie)"""
+        row = self.index[i]
+        offset = int(row["offset"])
+        return self._shard(int(row["shard"]))[offset:offset + int(row["length"])]
+
+    def image(self, i):
+        """Image i décodée (BGR)"""
+        return cv2.imdecode(self.raw(i), cv2.IMREAD_COLOR)
+
+    def sample(self, i):
+        """(image BGR, nom de classe, label YOLO texte ou None)"""
+        row = self.index[i]
+        return self.image(i), self.classes[int(row["class_id"])], self.records[i]["label"]
+
+    def close(self):
+        self._maps = {}
+
+    # ------------------------------------------
+    # Export
+    # ------------------------------------------
+
+    def export_yolo(self, out_dir):
+        """Reconstruire l'arborescence <classe>/ et _errors/<classe>/ (images + labels)"""
+        out_dir = Path(out_dir)
+        for i, record in enumerate(self.records):
+            target = out_dir / record["path"]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(self.raw(i).tobytes())
+            if record["label"] is not None:
+                target.with_suffix(".txt").write_text(record["label"])
+        return len(self.records)
+
+    def info(self):
+        shards = sorted(set(int(s) for s in self.index["shard"])) if len(self.index) else []
+        counts = np.bincount(self.index["class_id"], minlength=len(self.classes)) if len(self.index) else []
+        return {
+            "images": len(self),
+            "errors": int(self.index["error"].sum()) if len(self.index) else 0,
+            "labelled": int((self.index["label_class"] >= 0).sum()) if len(self.index) else 0,
+            "shards": len(shards),
+            "size_mb": round(sum((self.pack_dir / shard_name(s)).stat().st_size for s in shards) / 1e6, 1),
+            "classes": {name: int(n) for name, n in zip(self.classes, counts)},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Empaquetage du jeu d'apprentissage")
+    parser.add_argument("--pack-dir", default=str(DATASET_PACK_DIR))
+    sub = parser.add_subparsers(dest="command", required=True)
+    pack = sub.add_parser("pack", help="Créer ou compléter le paquet")
+    pack.add_argument("--root", default=str(TRAINING_DIR))
+    sub.add_parser("info", help="Contenu du paquet")
+    export = sub.add_parser("export", help="Reconstruire l'arborescence YOLO")
+    export.add_argument("out_dir")
+    args = parser.parse_args()
+
+    dataset = DatasetPack(args.pack_dir)
+    if args.command == "pack":
+        added = dataset.append_from(args.root)
+        print(f"✓ {added} images ajoutées ({len(dataset)} au total) → {dataset.pack_dir}")
+    elif args.command == "info":
+        for key, value in dataset.info().items():
+            print(f"  {key:9} : {value}")
+    elif args.command == "export":
+        count = dataset.export_yolo(args.out_dir)
+        print(f"✓ {count} images exportées → {args.out_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
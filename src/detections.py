@@ -0,0 +1,147 @@
+"""
+Smart Bin SI - Structures de détection compactes
+- Lit directement le tenseur results.xyxy[0] (x1, y1, x2, y2, conf, cls) dans un tableau NumPy
+- Filtrage de confiance, meilleure boîte et correspondance classe → bac vectorisés
+- Le format dict historique ({'class', 'confidence', 'bbox'}) reste disponible via to_dicts()
+"""
+
+import numpy as np
+
+# Colonnes du tableau de détections
+X1, Y1, X2, Y2, CONF, CLS = range(6)
+
+
+class Detection:
+    """Une détection (vue légère sur une ligne du tableau)"""
+
+    __slots__ = ("class_name", "class_id", "confidence", "bbox", "bin_color")
+
+    def __init__(self, class_name, class_id, confidence, bbox, bin_color=None):
+        self.class_name = class_name
+        self.class_id = class_id
+        self.confidence = confidence
+        self.bbox = bbox
+        self.bin_color = bin_color
+
+    def as_dict(self):
+        """Format dict historique : {'class', 'confidence', 'bbox'}"""
+        return {
+            'class': self.class_name,
+            'confidence': self.confidence,
+            'bbox': list(self.bbox),
+        }
+
+    def __repr__(self):
+        return f"Detection({self.class_name!r}, {self.confidence:.2f}, bin={self.bin_color})"
+
+
+class Detections:
+    """
+    Ensemble des détections d'une image, stocké dans un seul tableau float32 (N, 6)
+    """
+
+    __slots__ = ("boxes", "names", "bins")
+
+    def __init__(self, boxes, names, bins=None):
+        """
+        Args:
+            boxes: Tableau (N, 6) [x1, y1, x2, y2, conf, cls]
+            names: Noms des classes du modèle (dict id -> nom ou liste)
+            bins: Couleur du bac par détection (tableau objet de taille N) ou None
+        """
+        self.boxes = boxes
+        self.names = names
+        self.bins = bins
+
+    @classmethod
+    def from_results(cls, results, names, conf_threshold=0.0, class_bins=None, offset=None):
+        """
+        Construire les détections depuis les résultats YOLO, sans passer par pandas
+
+        Args:
+            results: Résultats YOLO (attribut xyxy) ou tableau (N, 6) déjà extrait
+            names: Noms des classes du modèle
+            conf_threshold: Confiance minimale
+            class_bins: Tableau indexé par id de classe → couleur du bac (optionnel)
+            offset: (x, y) à ajouter aux boîtes (inférence sur une zone recadrée)
+
+        Retourne:
+            Detections
+        """
+        pred = results.xyxy[0] if hasattr(results, "xyxy") else results
+        if hasattr(pred, "cpu"):
+            pred = pred.cpu().numpy()
+        boxes = np.asarray(pred, dtype=np.float32).reshape(-1, 6)
+        if conf_threshold > 0 and len(boxes):
+            boxes = boxes[boxes[:, CONF] >= conf_threshold]
+        if offset is not None and len(boxes):
+            boxes = boxes + np.array([offset[0], offset[1], offset[0], offset[1], 0, 0],
+                                     dtype=np.float32)
+        bins = None
+        if class_bins is not None and len(boxes):
+            bins = class_bins[boxes[:, CLS].astype(np.intp)]
+        return cls(boxes, names, bins)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __bool__(self):
+        return len(self.boxes) > 0
+
+    def __iter__(self):
+        for i in range(len(self.boxes)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        row = self.boxes[i]
+        class_id = int(row[CLS])
+        return Detection(
+            class_name=self.names[class_id],
+            class_id=class_id,
+            confidence=float(row[CONF]),
+            bbox=row[:4].tolist(),
+            bin_color=self.bins[i] if self.bins is not None else None,
+        )
+
+    @property
+    def xyxy(self):
+        return self.boxes[:, :4]
+
+    @property
+    def confidences(self):
+        return self.boxes[:, CONF]
+
+    @property
+    def class_ids(self):
+        return self.boxes[:, CLS].astype(np.intp)
+
+    def best(self):
+        """Détection de plus haute confiance (ou None si vide)"""
+        if not len(self.boxes):
+            return None
+        return self[int(np.argmax(self.boxes[:, CONF]))]
+
+    def to_dicts(self):
+        """Vue au format historique : liste de dicts {'class', 'confidence', 'bbox'}"""
+        return [det.as_dict() for det in self]
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    IoU entre deux ensembles de boîtes xyxy
+
+    Args:
+        boxes_a: Tableau (N, 4)
+        boxes_b: Tableau (M, 4)
+
+    Retourne:
+        np.ndarray: Matrice (N, M) des IoU
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
@@ -0,0 +1,467 @@
+"""
+Smart Bin SI - Réentraînement incrémental en arrière-plan (CPU)
+- Jeu YOLO construit au fur et à mesure depuis TRAINING_DIR : seules les nouvelles images
+  labellisées sont ajoutées (liens, pas de copie) ; validation fixe par image (hash du nom)
+- Quand assez d'images sont arrivées et que le poste est inactif, les poids actuels sont
+  affinés avec le train.py YOLOv5 épinglé (priorité basse, backbone gelé, budget en temps)
+- Anciens et nouveaux poids évalués sur la validation (précision / rappel / F1 à IoU 0.5) :
+  les nouveaux remplacent MODEL_PATH seulement s'ils font mieux (sauvegarde de l'ancien)
+- Avancement dans FINETUNE_STATUS_PATH (interface admin : /api/training/finetune)
+
+Commandes :
+  python3 src/finetune.py status
+  python3 src/finetune.py build            (met à jour le jeu YOLO seulement)
+  python3 src/finetune.py run [--force]    (un cycle : construction, entraînement, évaluation)
+  python3 src/finetune.py daemon           (cycle dès que les conditions sont réunies)
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from detections import Detections, box_iou
+from pipeline_metrics import read_metrics
+from config import (
+    MODEL_PATH, MODEL_BACKUP_DIR, TRAINING_DIR, CONFIDENCE_THRESHOLD, PIPELINE_METRICS_INTERVAL,
+    FINETUNE_DIR, FINETUNE_STATUS_PATH, FINETUNE_MIN_NEW_IMAGES, FINETUNE_HOLDOUT_PERCENT,
+    FINETUNE_EPOCHS, FINETUNE_MAX_MINUTES, FINETUNE_IMAGE_SIZE, FINETUNE_BATCH_SIZE,
+    FINETUNE_FREEZE, FINETUNE_NICE, FINETUNE_THREADS, FINETUNE_IDLE_MINUTES,
+    FINETUNE_CHECK_INTERVAL, FINETUNE_MIN_GAIN,
+)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+MANIFEST_NAME = "manifest.json"
+HISTORY_SIZE = 20
+EVAL_IOU = 0.5
+# Ligne de progression de train.py : "      3/9      0G   0.04512 ..."
+EPOCH_LINE = re.compile(r"^\s*(\d+)/(\d+)\s")
+
+
+# ============================================
+# ÉTAT (interface admin)
+# ============================================
+
+def read_status(path=FINETUNE_STATUS_PATH):
+    path = Path(path)
+    if not path.exists():
+        return {"state": "never_run", "history": []}
+    return json.loads(path.read_text())
+
+
+def write_status(path=FINETUNE_STATUS_PATH, **fields):
+    """Mettre à jour l'état (écriture atomique, lue par l'interface admin)"""
+    status = read_status(path)
+    status.update(fields, updated_at=time.time(), pid=os.getpid())
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(status, indent=2))
+    os.replace(tmp, path)
+    return status
+
+
+# ============================================
+# JEU DE DONNÉES INCRÉMENTAL
+# ============================================
+
+def split_of(name, holdout_percent=FINETUNE_HOLDOUT_PERCENT):
+    """Partition fixe d'une image (ne change pas d'un cycle à l'autre)"""
+    return "val" if zlib.crc32(name.encode()) % 100 < holdout_percent else "train"
+
+
+def dataset_links(rel, root=FINETUNE_DIR / "dataset"):
+    """Liens d'une image de TRAINING_DIR dans le jeu : (image, label)"""
+    split = split_of(rel)
+    flat = rel.replace("/", "__")
+    return (Path(root) / "images" / split / flat,
+            Path(root) / "labels" / split / (Path(flat).stem + ".txt"))
+
+
+def unlink_evicted(paths, root=FINETUNE_DIR / "dataset", source=TRAINING_DIR):
+    """
+    Éviction du stockage : supprimer aussi les liens durs du jeu, sinon l'espace n'est
+    pas libéré (le manifeste est mis à jour au prochain update)
+
+    Args:
+        paths: Images supprimées (chemins absolus, hors de source : ignorées)
+    """
+    source = Path(source).resolve()
+    for path in paths:
+        try:
+            rel = Path(path).resolve().relative_to(source).as_posix()
+        except ValueError:
+            continue
+        for link in dataset_links(rel, root):
+            try:
+                link.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _link(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class IncrementalDataset:
+    """
+    Jeu YOLO (images/ + labels/, train/ + val/, data.yaml) alimenté depuis TRAINING_DIR
+    """
+
+    def __init__(self, root=FINETUNE_DIR / "dataset", source=TRAINING_DIR):
+        self.root = Path(root)
+        self.source = Path(source)
+        self.manifest_path = self.root / MANIFEST_NAME
+        self.manifest = {"files": {}, "trained_files": 0}
+        if self.manifest_path.exists():
+            self.manifest = json.loads(self.manifest_path.read_text())
+
+    @property
+    def files(self):
+        return self.manifest["files"]
+
+    @property
+    def new_since_training(self):
+        return len(self.files) - self.manifest["trained_files"]
+
+    def counts(self):
+        splits = list(self.files.values())
+        return {"train": splits.count("train"), "val": splits.count("val")}
+
+    def scan(self):
+        """Images labellisées de TRAINING_DIR (hors _errors/, _duplicates/...)"""
+        found = []
+        if not self.source.exists():
+            return found
+        for class_dir in sorted(self.source.iterdir()):
+            if not class_dir.is_dir() or class_dir.name.startswith(("_", ".")):
+                continue
+            for image in sorted(class_dir.iterdir()):
+                if image.suffix.lower() in IMAGE_SUFFIXES and image.with_suffix(".txt").exists():
+                    found.append(image)
+        return found
+
+    def pending(self):
+        """Images labellisées de TRAINING_DIR pas encore dans le jeu (chemins relatifs)"""
+        found = (image.relative_to(self.source).as_posix() for image in self.scan())
+        return [rel for rel in found if rel not in self.files]
+
+    def update(self, names, pending=None):
+        """
+        Ajouter les nouvelles images (liens) et réécrire data.yaml
+
+        Args:
+            names: Noms des classes du modèle (dict id → nom), ordre des labels
+            pending: Résultat de pending() déjà calculé (sinon nouveau parcours)
+
+        Retourne:
+            int: Nombre d'images ajoutées
+        """
+        self.prune()
+        added = 0
+        for rel in self.pending() if pending is None else pending:
+            image = self.source / rel
+            for src, dst in zip((image, image.with_suffix(".txt")), dataset_links(rel, self.root)):
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                if not dst.exists():
+                    _link(src, dst)
+            self.files[rel] = split_of(rel)
+            added += 1
+        names = dict(names) if isinstance(names, dict) else dict(enumerate(names))
+        lines = [f"path: {self.root.resolve()}", "train: images/train", "val: images/val",
+                 f"nc: {len(names)}", "names:"]
+        lines += [f"  {idx}: {json.dumps(str(name))}" for idx, name in sorted(names.items())]
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / "data.yaml").write_text("\n".join(lines) + "\n")
+        self.save()
+        return added
+
+    def prune(self):
+        """
+        Oublier les images supprimées de TRAINING_DIR (éviction, suppression à la main)
+        et leurs liens
+
+        Retourne:
+            int: Nombre d'images retirées du jeu
+        """
+        trained = self.manifest["trained_files"]
+        removed = 0
+        for position, rel in enumerate(list(self.files)):
+            if (self.source / rel).exists():
+                continue
+            unlink_evicted([self.source / rel], self.root, self.source)
+            del self.files[rel]
+            removed += 1
+            # Les trained_files premières entrées (ordre d'ajout) sont déjà entraînées
+            if position < trained:
+                self.manifest["trained_files"] -= 1
+        return removed
+
+    def mark_trained(self):
+        self.manifest["trained_files"] = len(self.files)
+        self.save()
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_name(MANIFEST_NAME + ".tmp")
+        tmp.write_text(json.dumps(self.manifest))
+        os.replace(tmp, self.manifest_path)
+
+    def val_samples(self):
+        """[(image, label), ...] de la validation"""
+        folder = self.root / "images" / "val"
+        if not folder.exists():
+            return []
+        return [(p, self.root / "labels" / "val" / (p.stem + ".txt")) for p in sorted(folder.iterdir())]
+
+
+# ============================================
+# ÉVALUATION
+# ============================================
+
+def _read_labels(label_path, width, height):
+    """Label YOLO → (classes, boîtes xyxy en pixels)"""
+    rows = [line.split() for line in Path(label_path).read_text().splitlines() if line.strip()]
+    if not rows:
+        return np.zeros(0, dtype=np.intp), np.zeros((0, 4), dtype=np.float32)
+    values = np.array([[float(v) for v in row[:5]] for row in rows], dtype=np.float32)
+    xc, yc, w, h = values[:, 1] * width, values[:, 2] * height, values[:, 3] * width, values[:, 4] * height
+    boxes = np.stack([xc - w / 2, yc - h / 2, xc + w / 2, yc + h / 2], axis=1)
+    return values[:, 0].astype(np.intp), boxes
+
+
+def evaluate(weights_path, samples, size=FINETUNE_IMAGE_SIZE, iou_threshold=EVAL_IOU):
+    """
+    Précision / rappel / F1 des poids sur la validation (même classe et IoU >= seuil)
+
+    Retourne:
+        dict: {"precision", "recall", "f1", "images", "ms_per_image"}
+    """
+    from inference_backends import load_backend  # torch : seulement pour l'évaluation
+
+    model = load_backend("torch", str(weights_path))
+    tp = fp = fn = 0
+    start = time.perf_counter()
+    for image_path, label_path in samples:
+        frame = cv2.imread(str(image_path))
+        if frame is None or not label_path.exists():
+            continue
+        gt_classes, gt_boxes = _read_labels(label_path, frame.shape[1], frame.shape[0])
+        pred = Detections.from_results(model(frame, size=size), model.names,
+                                       conf_threshold=CONFIDENCE_THRESHOLD)
+        matched = np.zeros(len(gt_boxes), dtype=bool)
+        if len(pred) and len(gt_boxes):
+            ious = box_iou(pred.xyxy, gt_boxes)
+            ious[pred.class_ids[:, None] != gt_classes[None, :]] = 0.0
+            # Association gloutonne, détections les plus confiantes d'abord
+            for i in np.argsort(-pred.confidences):
+                candidates = np.where(matched, 0.0, ious[i])
+                j = int(np.argmax(candidates))
+                if candidates[j] >= iou_threshold:
+                    matched[j] = True
+                    tp += 1
+                else:
+                    fp += 1
+        else:
+            fp += len(pred)
+        fn += int((~matched).sum())
+    images = len(samples)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(f1, 4),
+        "images": images,
+        "ms_per_image": round((time.perf_counter() - start) * 1000 / max(images, 1), 1),
+    }
+
+
+# ============================================
+# ENTRAÎNEMENT
+# ============================================
+
+def station_idle(idle_minutes=FINETUNE_IDLE_MINUTES):
+    """Poste inactif : détecteur arrêté, ou aucun tri récent et rien sur la plateforme"""
+    metrics = read_metrics()
+    stale_s = max(5.0, 5 * PIPELINE_METRICS_INTERVAL)
+    if not metrics or not metrics.get("running") or metrics.get("age_s", 0) > stale_s:
+        return True
+    if metrics.get("last_detection"):
+        return False
+    last = (metrics.get("sorts") or {}).get("last")
+    return not last or time.time() - last["at"] >= idle_minutes * 60
+
+
+def _low_priority():
+    """Passer le processus en priorité FINETUNE_NICE (une fois ; hérité par train.py)"""
+    current = os.nice(0)
+    if current < FINETUNE_NICE:
+        os.nice(FINETUNE_NICE - current)
+
+
+def train(data_yaml, weights_path, run_name, epochs=FINETUNE_EPOCHS,
+          budget_s=FINETUNE_MAX_MINUTES * 60):
+    """
+    Affiner les poids avec train.py (YOLOv5 épinglé), en basse priorité
+
+    Retourne:
+        Path: Poids obtenus (best.pt, sinon last.pt si le budget a interrompu l'entraînement)
+    """
+    from model_registry import CODE_DIR
+
+    train_script = CODE_DIR / "train.py"
+    if not train_script.exists():
+        raise FileNotFoundError(f"{train_script} absent : lancer 'python3 src/model_registry.py pin'")
+    project = FINETUNE_DIR / "runs"
+    cmd = [
+        sys.executable, str(train_script),
+        "--weights", str(weights_path), "--data", str(data_yaml),
+        "--epochs", str(epochs), "--img", str(FINETUNE_IMAGE_SIZE),
+        "--batch-size", str(FINETUNE_BATCH_SIZE), "--device", "cpu", "--workers", "0",
+        "--freeze", str(FINETUNE_FREEZE), "--project", str(project), "--name", run_name,
+        "--exist-ok", "--noplots",
+    ]
+    env = dict(os.environ, OMP_NUM_THREADS=str(FINETUNE_THREADS), MKL_NUM_THREADS=str(FINETUNE_THREADS))
+    # Priorité basse héritée du processus (_low_priority)
+    proc = subprocess.Popen(cmd, cwd=str(CODE_DIR), env=env, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True)
+    # Budget dépassé : arrêt, on garde le dernier état sauvegardé
+    timer = threading.Timer(budget_s, proc.terminate)
+    timer.start()
+    try:
+        last_epoch = -1
+        for line in proc.stdout:  # Retours chariot de la barre de progression = lignes
+            match = EPOCH_LINE.match(line)
+            if match and int(match.group(1)) != last_epoch:
+                last_epoch = int(match.group(1))
+                write_status(state="training", epoch=last_epoch + 1, epochs=int(match.group(2)) + 1)
+        proc.wait()
+    finally:
+        timer.cancel()
+    weights_dir = project / run_name / "weights"
+    for name in ("best.pt", "last.pt"):
+        if (weights_dir / name).exists():
+            return weights_dir / name
+    raise RuntimeError(f"train.py terminé (code {proc.returncode}) sans poids dans {weights_dir}")
+
+
+def promote(candidate, model_path=MODEL_PATH):
+    """Sauvegarder les poids actuels puis les remplacer (atomique : rechargés à chaud)"""
+    model_path = Path(model_path)
+    backup = None
+    if model_path.exists():
+        MODEL_BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+        backup = MODEL_BACKUP_DIR / f"{model_path.stem}_{datetime.now():%Y%m%d_%H%M%S}.pt"
+        shutil.copy2(model_path, backup)
+    tmp = model_path.with_name(model_path.name + ".tmp")
+    shutil.copy2(candidate, tmp)
+    os.replace(tmp, model_path)
+    return backup
+
+
+def run_cycle(force=False):
+    """
+    Un cycle complet ; retourne l'état final ("skipped", "promoted", "rejected", "failed")
+    """
+    dataset = IncrementalDataset()
+    started = time.time()
+    try:
+        # Vérifications peu coûteuses d'abord : aucun modèle chargé pour un cycle sauté
+        pending = dataset.pending()
+        new = dataset.new_since_training + len(pending)
+        if not force:
+            reason = None
+            if new < FINETUNE_MIN_NEW_IMAGES:
+                reason = f"{new} nouvelles images (min {FINETUNE_MIN_NEW_IMAGES})"
+            elif not station_idle():
+                reason = "poste actif"
+            if reason:
+                write_status(state="idle", reason=reason,
+                             dataset={**dataset.counts(), "new_since_training": new})
+                print(f"⊘ Pas de réentraînement : {reason}")
+                return "skipped"
+
+        from model_registry import checkpoint_names  # torch : seulement pour un vrai cycle
+        _low_priority()
+        write_status(state="building", started_at=started, epoch=0)
+        added = dataset.update(checkpoint_names(MODEL_PATH), pending)
+        counts = dataset.counts()
+        write_status(dataset={**counts, "added": added, "new_since_training": new})
+        if not counts["val"] or not counts["train"]:
+            write_status(state="idle", reason="jeu d'entraînement ou de validation vide")
+            return "skipped"
+
+        run_name = f"run_{datetime.now():%Y%m%d_%H%M%S}"
+        print(f"🏋 Réentraînement {run_name} : {counts['train']} images, "
+              f"{counts['val']} en validation ({new} nouvelles)")
+        write_status(state="training", run=run_name, epoch=0, epochs=FINETUNE_EPOCHS, reason=None)
+        candidate = train(dataset.root / "data.yaml", MODEL_PATH, run_name)
+
+        write_status(state="evaluating")
+        samples = dataset.val_samples()
+        before = evaluate(MODEL_PATH, samples)
+        after = evaluate(candidate, samples)
+        gain = round(after["f1"] - before["f1"], 4)
+        promoted = gain >= FINETUNE_MIN_GAIN
+        backup = promote(candidate) if promoted else None
+        dataset.mark_trained()
+        state = "promoted" if promoted else "rejected"
+        print(f"{'✓' if promoted else '⊘'} F1 {before['f1']:.3f} → {after['f1']:.3f} : "
+              f"{'nouveaux poids en service' if promoted else 'poids actuels conservés'}")
+        entry = {"run": run_name, "state": state, "before": before, "after": after, "gain": gain,
+                 "backup": str(backup) if backup else None, "candidate": str(candidate),
+                 "duration_s": round(time.time() - started, 1), "finished_at": time.time()}
+    except Exception as e:
+        print(f"✗ Réentraînement en échec : {e}")
+        state = "failed"
+        entry = {"state": state, "error": f"{type(e).__name__}: {e}", "finished_at": time.time()}
+    history = (read_status().get("history") or [])[-(HISTORY_SIZE - 1):] + [entry]
+    write_status(state=state, last=entry, history=history)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réentraînement incrémental")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Dernier état")
+    sub.add_parser("build", help="Mettre à jour le jeu YOLO")
+    run = sub.add_parser("run", help="Un cycle de réentraînement")
+    run.add_argument("--force", action="store_true", help="Sans attendre images ni inactivité")
+    sub.add_parser("daemon", help="Vérifier périodiquement et lancer un cycle si besoin")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        print(json.dumps(read_status(), indent=2))
+    elif args.command == "build":
+        dataset = IncrementalDataset()
+        from model_registry import checkpoint_names
+        added = dataset.update(checkpoint_names(MODEL_PATH))
+        print(f"✓ {added} images ajoutées, {dataset.counts()} ({dataset.new_since_training} non entraînées)")
+    elif args.command == "run":
+        return 0 if run_cycle(force=args.force) != "failed" else 1
+    elif args.command == "daemon":
+        print(f"⏳ Réentraînement en attente (vérification toutes les {FINETUNE_CHECK_INTERVAL} s)")
+        while True:
+            run_cycle()
+            time.sleep(FINETUNE_CHECK_INTERVAL)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
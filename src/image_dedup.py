@@ -0,0 +1,373 @@
+"""
+Smart Bin SI - Déduplication des images d'apprentissage (hash perceptuel)
+- dHash 64 bits de l'objet (boîte du label YOLO) ou de l'image entière
+- Index persistant par dossier de classe : les quasi-doublons (distance de Hamming
+  <= DEDUP_MAX_DISTANCE) ne sont pas réécrits quand l'objet reste sur la plateforme
+- Commande batch pour nettoyer un dossier training_images existant (tous les cœurs) :
+  python3 src/image_dedup.py            (simulation : liste les doublons)
+  python3 src/image_dedup.py --apply    (déplace les doublons dans _duplicates/)
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from config import (
+    TRAINING_DIR, DEDUP_HASH_SIZE, DEDUP_MAX_DISTANCE, DEDUP_POLICY, DEDUP_INDEX_NAME,
+)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+DUPLICATES_DIR = "_duplicates"
+
+
+# ============================================
+# HASH PERCEPTUEL
+# ============================================
+
+def dhash(image, hash_size=DEDUP_HASH_SIZE):
+    """
+    Hash de différence : compare les pixels voisins d'une vignette en niveaux de gris
+
+    Retourne:
+        int: hash de hash_size² bits
+    """
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(image, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _distances(hashes, h):
+    """Distances de Hamming entre un hash et un tableau de hashes uint64"""
+    if not len(hashes):
+        return np.empty(0, dtype=np.int64)
+    xor = np.bitwise_xor(hashes, np.uint64(h))
+    return np.unpackbits(xor.view(np.uint8)).reshape(len(hashes), -1).sum(axis=1)
+
+
+def crop_box(image, bbox):
+    """Zone de l'objet (x1, y1, x2, y2) ; image entière si la boîte est vide"""
+    if bbox is None:
+        return image
+    h, w = image.shape[:2]
+    x1, y1, x2, y2 = [int(round(v)) for v in bbox]
+    x1, x2 = max(0, min(x1, w)), max(0, min(x2, w))
+    y1, y2 = max(0, min(y1, h)), max(0, min(y2, h))
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return image
+    return image[y1:y2, x1:x2]
+
+
+def _label_bbox(label_path, width, height):
+    """Boîte en pixels lue dans un label YOLO (première ligne), ou None"""
+    try:
+        fields = label_path.read_text().split()
+    except OSError:
+        return None
+    if len(fields) < 5:
+        return None
+    xc, yc, bw, bh = (float(v) for v in fields[1:5])
+    return ((xc - bw / 2) * width, (yc - bh / 2) * height,
+            (xc + bw / 2) * width, (yc + bh / 2) * height)
+
+
+def hash_file(path, hash_size=DEDUP_HASH_SIZE):
+    """
+    Hash d'une image enregistrée, calculé comme à la sauvegarde
+    (zone de l'objet si un label YOLO accompagne l'image)
+
+    Retourne:
+        (str, int): (chemin, hash) ou (chemin, None) si l'image est illisible
+    """
+    path = Path(path)
+    image = cv2.imread(str(path))
+    if image is None:
+        return str(path), None
+    h, w = image.shape[:2]
+    bbox = _label_bbox(path.with_suffix(".txt"), w, h)
+    return str(path), dhash(crop_box(image, bbox), hash_size)
+
+
+# ============================================
+# INDEX PAR CLASSE
+# ============================================
+
+class HashIndex:
+    """
+    Index des hashes d'un dossier de classe (fichier DEDUP_INDEX_NAME dans le dossier)
+    Les images présentes mais absentes de l'index sont hashées au chargement
+    """
+
+    def __init__(self, folder, entries=None):
+        """
+        Args:
+            folder: Dossier de la classe
+            entries: Index déjà calculé (commande batch) ; sinon lu / complété depuis le disque
+        """
+        self.folder = Path(folder)
+        self.path = self.folder / DEDUP_INDEX_NAME
+        self.entries = {}       # nom de fichier → {"hash": hex, "count": n}
+        self.dirty = False
+        if entries is None:
+            self._load()
+        else:
+            self.entries = entries
+            self.dirty = True
+            self._rebuild()
+
+    def _load(self):
+        if self.path.exists():
+            try:
+                self.entries = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                self.entries = {}
+        present = set()
+        if self.folder.is_dir():
+            present = {p.name for p in self.folder.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES}
+        # Images supprimées à la main : les oublier
+        for name in set(self.entries) - present:
+            del self.entries[name]
+            self.dirty = True
+        # Images écrites sans index (arrêt brutal, ancienne version) : les hasher
+        for name in sorted(present - set(self.entries)):
+            _, h = hash_file(self.folder / name)
+            if h is not None:
+                self.entries[name] = {"hash": f"{h:016x}", "count": 1}
+                self.dirty = True
+        self._rebuild()
+
+    def _rebuild(self):
+        self.names = list(self.entries)
+        self.hashes = np.array([int(e["hash"], 16) for e in self.entries.values()], dtype=np.uint64)
+
+    def nearest(self, h):
+        """(nom, distance) de l'image la plus proche, ou (None, None)"""
+        distances = _distances(self.hashes, h)
+        if not len(distances):
+            return None, None
+        i = int(np.argmin(distances))
+        return self.names[i], int(distances[i])
+
+    def add(self, name, h):
+        self.entries[name] = {"hash": f"{h:016x}", "count": 1}
+        self.names.append(name)
+        self.hashes = np.append(self.hashes, np.uint64(h))
+        self.dirty = True
+
+    def remove(self, names):
+        """Oublier des images supprimées (ex : éviction du quota de stockage)"""
+        removed = [name for name in names if self.entries.pop(name, None) is not None]
+        if removed:
+            self._rebuild()
+            self.dirty = True
+        return len(removed)
+
+    def merge(self, name):
+        """Compter un quasi-doublon sur l'image existante (sans nouveau fichier)"""
+        self.entries[name]["count"] = self.entries[name].get("count", 1) + 1
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.folder.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(self.entries, indent=0))
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+class ImageDeduplicator:
+    """
+    Étape de déduplication du chemin de sauvegarde (thread de détection)
+    Le hash d'une vignette 9x8 coûte bien moins qu'un encodage JPEG
+    """
+
+    def __init__(self, max_distance=DEDUP_MAX_DISTANCE, policy=DEDUP_POLICY):
+        """
+        Args:
+            max_distance: Distance de Hamming max pour considérer deux images identiques
+            policy: "skip" (ignorer le doublon) ou "merge" (compter le doublon sur
+                l'image existante, utile pour pondérer le réentraînement)
+        """
+        self.max_distance = max_distance
+        self.policy = policy
+        self.indexes = {}
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+
+    def preload(self, root=TRAINING_DIR):
+        """
+        Charger (et compléter) au démarrage les index de tous les dossiers existants :
+        les images pas encore indexées sont hashées ici, pas dans la boucle caméra
+        """
+        folders = class_folders(root)
+        with self._lock:
+            for folder in folders:
+                self.index(folder)
+        return len(folders)
+
+    def index(self, folder):
+        key = str(folder)
+        if key not in self.indexes:
+            self.indexes[key] = HashIndex(folder)
+        return self.indexes[key]
+
+    def check(self, folder, frame, bbox=None):
+        """
+        Args:
+            folder: Dossier de classe de destination
+            frame: Image à sauvegarder
+            bbox: Boîte de l'objet (le hash porte alors sur l'objet seul)
+
+        Retourne:
+            (int, str): (hash, nom de l'image existante si c'est un doublon, sinon None)
+        """
+        h = dhash(crop_box(frame, bbox))
+        with self._lock:
+            self.checked += 1
+            index = self.index(folder)
+            name, distance = index.nearest(h)
+            if name is not None and distance <= self.max_distance:
+                self.duplicates += 1
+                if self.policy == "merge":
+                    index.merge(name)
+                return h, name
+        return h, None
+
+    def register(self, folder, filename, h):
+        """Ajouter une image écrite à l'index de sa classe (rappel du thread d'écriture)"""
+        with self._lock:
+            self.index(folder).add(filename, h)
+
+    def forget(self, paths):
+        """
+        Retirer des index des images supprimées : un quasi-doublon d'une image
+        qui n'existe plus doit être enregistré
+
+        Args:
+            paths: Chemins des images supprimées
+        """
+        by_folder = {}
+        for path in paths:
+            path = Path(path)
+            by_folder.setdefault(str(path.parent), []).append(path.name)
+        with self._lock:
+            for folder, names in by_folder.items():
+                if folder in self.indexes:
+                    self.indexes[folder].remove(names)
+
+    def save(self):
+        """Écrire les index modifiés (à l'arrêt)"""
+        with self._lock:
+            for index in self.indexes.values():
+                index.save()
+
+    def stats(self):
+        return {"checked": self.checked, "duplicates": self.duplicates}
+
+
+# ============================================
+# COMMANDE BATCH
+# ============================================
+
+def class_folders(root):
+    """Dossiers contenant des images (classes et _errors/<classe>), hors _duplicates"""
+    folders = set()
+    for path in Path(root).rglob("*"):
+        if path.suffix.lower() in IMAGE_SUFFIXES and DUPLICATES_DIR not in path.parts:
+            folders.add(path.parent)
+    return sorted(folders)
+
+
+def find_duplicates(paths_hashes, max_distance=DEDUP_MAX_DISTANCE):
+    """
+    Garder la première image (ordre des noms = ordre de sauvegarde) de chaque groupe
+
+    Retourne:
+        (list, dict): (images gardées [(chemin, hash)], doublon → image gardée)
+    """
+    kept, kept_hashes, duplicates = [], np.empty(0, dtype=np.uint64), {}
+    for path, h in sorted(paths_hashes):
+        distances = _distances(kept_hashes, h)
+        if len(distances) and distances.min() <= max_distance:
+            duplicates[path] = kept[int(np.argmin(distances))][0]
+            continue
+        kept.append((path, h))
+        kept_hashes = np.append(kept_hashes, np.uint64(h))
+    return kept, duplicates
+
+
+def dedupe_tree(root=TRAINING_DIR, max_distance=DEDUP_MAX_DISTANCE, workers=None, apply=False):
+    """
+    Dédupliquer un dossier d'images existant (hash en parallèle sur tous les cœurs)
+
+    Args:
+        apply: False = simulation ; True = doublons (+ labels) déplacés dans
+            <root>/_duplicates/ et index reconstruits
+    """
+    root = Path(root)
+    folders = class_folders(root)
+    paths = [p for folder in folders for p in sorted(folder.iterdir())
+             if p.suffix.lower() in IMAGE_SUFFIXES]
+    print(f"🔍 {len(paths)} images dans {len(folders)} dossiers ({root})")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        hashed = list(pool.map(hash_file, paths, chunksize=32))
+
+    by_folder = {}
+    for path, h in hashed:
+        if h is not None:
+            by_folder.setdefault(str(Path(path).parent), []).append((path, h))
+
+    total = 0
+    for folder in folders:
+        kept, duplicates = find_duplicates(by_folder.get(str(folder), []), max_distance)
+        total += len(duplicates)
+        if duplicates:
+            print(f"  {folder.relative_to(root)} : {len(duplicates)} doublons / {len(kept) + len(duplicates)}")
+        if not apply:
+            continue
+        counts = {}
+        target = root / DUPLICATES_DIR / folder.relative_to(root)
+        for dup, original in duplicates.items():
+            counts[Path(original).name] = counts.get(Path(original).name, 1) + 1
+            target.mkdir(parents=True, exist_ok=True)
+            dup = Path(dup)
+            for companion in (dup, dup.with_suffix(".txt")):
+                if companion.exists():
+                    shutil.move(str(companion), str(target / companion.name))
+        HashIndex(folder, {
+            Path(p).name: {"hash": f"{h:016x}", "count": counts.get(Path(p).name, 1)}
+            for p, h in kept
+        }).save()
+
+    action = "déplacés dans " + str(root / DUPLICATES_DIR) if apply else "trouvés (simulation, --apply pour déplacer)"
+    print(f"✓ {total} doublons {action}")
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Déduplication des images d'apprentissage")
+    parser.add_argument("--root", default=str(TRAINING_DIR), help="Dossier des images")
+    parser.add_argument("--max-distance", type=int, default=DEDUP_MAX_DISTANCE,
+                        help="Distance de Hamming max entre doublons")
+    parser.add_argument("--workers", type=int, default=None, help="Processus (défaut : tous les cœurs)")
+    parser.add_argument("--apply", action="store_true", help="Déplacer les doublons (sinon simulation)")
+    args = parser.parse_args()
+    dedupe_tree(args.root, args.max_distance, args.workers, args.apply)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
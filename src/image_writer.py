@@ -0,0 +1,224 @@
+"""
+Smart Bin SI - Écriture asynchrone des images d'apprentissage
+- Encodage + écriture disque dans des threads dédiés (la boucle caméra ne bloque plus sur la carte SD)
+- File bornée : si elle est pleine, on attend au plus IMAGE_WRITER_MAX_BLOCK_S puis l'image est abandonnée
+- Noms uniques : horodatage à la milliseconde + compteur monotone (plus d'écrasement dans la même seconde)
+- Écriture atomique (fichier temporaire puis renommage) : pas d'image tronquée en cas de coupure
+- Quota optionnel (StorageManager) : place faite avant l'écriture, disque plein → échec compté et affiché
+"""
+
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from itertools import count
+
+import cv2
+
+from storage_manager import SAVE_INTERVAL
+from config import (
+    IMAGE_WRITER_WORKERS, IMAGE_WRITER_QUEUE_SIZE, IMAGE_WRITER_MAX_BLOCK_S,
+    TRAINING_IMAGE_FORMAT, TRAINING_IMAGE_QUALITY,
+)
+
+# Paramètres d'encodage OpenCV par format
+_QUALITY_FLAGS = {
+    "jpg": cv2.IMWRITE_JPEG_QUALITY,
+    "jpeg": cv2.IMWRITE_JPEG_QUALITY,
+    "webp": cv2.IMWRITE_WEBP_QUALITY,
+    "png": cv2.IMWRITE_PNG_COMPRESSION,   # 0-9 (niveau de compression, pas une qualité)
+}
+
+
+def yolo_label(bbox, class_id, width, height):
+    """Ligne de label YOLO : class_id x_center y_center width height (normalisés 0-1)"""
+    x1, y1, x2, y2 = [float(x) for x in bbox]
+    x_center = ((x1 + x2) / 2) / width
+    y_center = ((y1 + y2) / 2) / height
+    w = (x2 - x1) / width
+    h = (y2 - y1) / height
+    return f"{class_id} {x_center:.6f} {y_center:.6f} {w:.6f} {h:.6f}\n"
+
+
+class _WriteJob:
+    __slots__ = ("image_path", "frame", "label_path", "label", "on_written", "submitted_at")
+
+    def __init__(self, image_path, frame, label_path=None, label=None, on_written=None):
+        self.image_path = image_path
+        self.frame = frame
+        self.label_path = label_path
+        self.label = label
+        self.on_written = on_written
+        self.submitted_at = time.perf_counter()
+
+
+class TrainingImageWriter:
+    """
+    Pool de threads d'écriture avec file bornée et compteurs de contre-pression
+    """
+
+    def __init__(self, workers=IMAGE_WRITER_WORKERS, maxsize=IMAGE_WRITER_QUEUE_SIZE,
+                 max_block=IMAGE_WRITER_MAX_BLOCK_S, image_format=TRAINING_IMAGE_FORMAT,
+                 quality=TRAINING_IMAGE_QUALITY, storage=None):
+        """
+        Args:
+            workers: Nombre de threads d'écriture
+            maxsize: Images en attente max
+            max_block: Attente max (s) quand la file est pleine avant d'abandonner l'image
+            image_format: "jpg", "png" ou "webp"
+            quality: Qualité JPEG/WebP (0-100) ou compression PNG (0-9)
+            storage: StorageManager (quota : place faite avant chaque écriture)
+        """
+        self.image_format = image_format.lower().lstrip(".")
+        flag = _QUALITY_FLAGS.get(self.image_format)
+        self.encode_params = [flag, int(quality)] if flag is not None and quality is not None else []
+        self.max_block = max_block
+        self.storage = storage
+        self.jobs = queue.Queue(maxsize=maxsize)
+        self._counter = count(1)
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"image-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+
+        # Contre-pression
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.blocked_seconds = 0.0
+        self.max_depth = 0
+        self.write_seconds = 0.0
+        self.max_latency = 0.0
+
+        for thread in self._threads:
+            thread.start()
+
+    def unique_base(self, prefix):
+        """Nom de fichier unique : <prefix>_<date>_<heure>_<ms>_<compteur>"""
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        with self._lock:
+            n = next(self._counter)
+        return f"{prefix}_{stamp}_{n:06d}"
+
+    def save(self, folder, prefix, frame, bbox=None, class_id=None, on_written=None):
+        """
+        Mettre une image (+ label YOLO optionnel) dans la file d'écriture
+
+        Args:
+            folder: Dossier de destination (créé si besoin)
+            prefix: Préfixe du nom ("ok", "err")
+            frame: Image BGR (ne plus la modifier ensuite : elle n'est pas copiée)
+            bbox: [x1, y1, x2, y2] optionnel → fichier .txt au format YOLO
+            class_id: Index de la classe pour le label
+            on_written: Fonction appelée avec le chemin une fois l'image écrite
+                (thread d'écriture ; jamais appelée si l'écriture échoue ou est refusée)
+
+        Retourne:
+            Path: Chemin de l'image à venir, ou None si la file est restée pleine
+        """
+        base = self.unique_base(prefix)
+        image_path = folder / f"{base}.{self.image_format}"
+        label_path = label = None
+        if bbox is not None and class_id is not None and len(bbox) == 4:
+            h, w = frame.shape[:2]
+            label_path = folder / f"{base}.txt"
+            label = yolo_label(bbox, class_id, w, h)
+
+        job = _WriteJob(image_path, frame, label_path, label, on_written)
+        start = time.perf_counter()
+        try:
+            self.jobs.put(job, timeout=self.max_block)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+                self.blocked_seconds += time.perf_counter() - start
+            print(f"⚠ File d'écriture pleine, image abandonnée : {image_path.name}")
+            return None
+        with self._lock:
+            self.submitted += 1
+            self.blocked_seconds += time.perf_counter() - start
+            self.max_depth = max(self.max_depth, self.jobs.qsize())
+        return image_path
+
+    @staticmethod
+    def _atomic_write(path, data):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _write(self, job):
+        job.image_path.parent.mkdir(parents=True, exist_ok=True)
+        ok, encoded = cv2.imencode(f".{self.image_format}", job.frame, self.encode_params)
+        if not ok:
+            raise ValueError(f"encodage {self.image_format} impossible")
+        data = encoded.tobytes()
+        label = job.label.encode() if job.label_path is not None else b""
+        if self.storage:
+            self.storage.make_room(job.image_path, len(data) + len(label))
+        self._atomic_write(job.image_path, data)
+        if job.label_path is not None:
+            self._atomic_write(job.label_path, label)
+        if self.storage:
+            self.storage.add(job.image_path, len(data) + len(label))
+
+    def _worker(self):
+        while True:
+            try:
+                job = self.jobs.get(timeout=SAVE_INTERVAL if self.storage else None)
+            except queue.Empty:
+                # File vide : index de stockage écrit s'il a changé
+                self.storage.save()
+                continue
+            try:
+                if job is None:
+                    return
+                start = time.perf_counter()
+                try:
+                    self._write(job)
+                except Exception as e:
+                    with self._lock:
+                        self.failed += 1
+                    print(f"⚠ Échec d'écriture {job.image_path.name} : {e}")
+                    continue
+                done = time.perf_counter()
+                with self._lock:
+                    self.written += 1
+                    self.write_seconds += done - start
+                    self.max_latency = max(self.max_latency, done - job.submitted_at)
+                if job.on_written:
+                    job.on_written(job.image_path)
+            finally:
+                self.jobs.task_done()
+
+    def flush(self):
+        """Attendre que toutes les images en file soient écrites"""
+        self.jobs.join()
+
+    def close(self):
+        """Écrire les images restantes puis arrêter les threads"""
+        self.flush()
+        for _ in self._threads:
+            self.jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.storage:
+            self.storage.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "pending": self.jobs.qsize(),
+                "max_queue_depth": self.max_depth,
+                "blocked_ms": round(self.blocked_seconds * 1000, 1),
+                "avg_write_ms": round(self.write_seconds / self.written * 1000, 1) if self.written else 0.0,
+                "max_latency_ms": round(self.max_latency * 1000, 1),
+            }
@@ -0,0 +1,715 @@
+"""
+Smart Bin SI - Backends d'inférence YOLO
+- torch    : modèle torch.hub (YOLOv5 AutoShape), comportement historique
+- onnx     : export ONNX de best.pt mis en cache à côté des poids, exécuté par ONNX Runtime
+- openvino : export OpenVINO IR (optionnel) dérivé de l'export ONNX
+- torchscript : module TorchScript pré-sérialisé (démarrage rapide, sans code YOLOv5)
+- onnx-int8 : export ONNX quantifié INT8 (statique), calibré sur les images de TRAINING_DIR
+Pré/post-traitement (letterbox, NMS) des backends exportés en NumPy.
+
+Commandes :
+  python3 src/inference_backends.py export [--openvino] [--torchscript] [--int8]
+  python3 src/inference_backends.py compare [--frames DOSSIER] [--backend onnx-int8]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+import model_registry
+from detections import box_iou
+from model_registry import StartupTimer, hub_load
+from config import (
+    MODEL_PATH, CONFIDENCE_THRESHOLD, IOU_THRESHOLD,
+    INFERENCE_BACKEND, INFERENCE_SIZE, MODEL_OFFLINE, TRAINING_DIR,
+    QUANT_CALIBRATION_SAMPLES, QUANT_PER_CHANNEL, QUANT_EXCLUDE_HEAD,
+)
+
+# Dépendances optionnelles
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+try:
+    from onnxruntime.quantization import (
+        CalibrationDataReader, QuantFormat, QuantType, quantize_static,
+    )
+    ONNX_QUANTIZATION_AVAILABLE = True
+except ImportError:
+    CalibrationDataReader = object
+    ONNX_QUANTIZATION_AVAILABLE = False
+
+try:
+    import openvino as ov
+    OPENVINO_AVAILABLE = True
+except ImportError:
+    OPENVINO_AVAILABLE = False
+
+BACKENDS = ("torch", "onnx", "openvino", "torchscript", "onnx-int8")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+# ============================================
+# BACKEND TORCH.HUB (historique)
+# ============================================
+
+def load_yolo_model(model_path, timer=None):
+    """
+    Charger le modèle YOLO depuis un fichier
+    Supporte YOLOv5 et YOLOv8 via torch.hub ou ultralytics
+    Avec MODEL_OFFLINE et un registre épinglé, chargement direct depuis le disque
+
+    Args:
+        model_path: Chemin vers les poids YOLO entraînés (fichier .pt)
+        timer: StartupTimer à compléter (optionnel)
+
+    Retourne:
+        model: Modèle YOLO prêt pour l'inférence
+    """
+    timer = timer or StartupTimer()
+    print(f"📦 Chargement du modèle depuis : {model_path}")
+
+    if MODEL_OFFLINE and model_registry.is_pinned():
+        weights = model_path if Path(model_path).exists() else model_registry.fallback_weights()
+        if weights is not None:
+            if weights != model_path:
+                print(f"⚠ Fichier du modèle introuvable : {model_path}")
+                print(f"   Utilisation des poids épinglés : {weights}")
+            model = model_registry.load_local_model(weights, timer)
+            print("✓ Modèle chargé depuis le registre local (hors ligne)")
+            return model
+
+    if MODEL_OFFLINE:
+        print("⚠ Registre local absent : 'python3 src/model_registry.py pin' pour démarrer hors ligne")
+
+    if not Path(model_path).exists():
+        print(f"⚠ Fichier du modèle introuvable : {model_path}")
+        print("   Utilisation du YOLOv5s par défaut (pré-entraîné sur COCO)")
+        print("   Pour utiliser un modèle custom, entraîne-le d'abord !")
+
+        # Charger YOLOv5s pré-entraîné comme solution de secours
+        with timer.phase("model_build"):
+            model = hub_load('yolov5s', pretrained=True)
+    else:
+        # Charger le modèle custom entraîné
+        try:
+            with timer.phase("model_build"):
+                model = hub_load('custom', path=model_path)
+            print("✓ Modèle custom chargé avec succès")
+        except Exception as e:
+            print(f"✗ Erreur lors du chargement du modèle custom : {e}")
+            print("   Retour au YOLOv5s pré-entraîné")
+            with timer.phase("model_build"):
+                model = hub_load('yolov5s', pretrained=True)
+
+    # Définir les paramètres du modèle
+    model.conf = CONFIDENCE_THRESHOLD
+    model.iou = IOU_THRESHOLD
+
+    # Utiliser le GPU si disponible (important pour Jetson)
+    if torch.cuda.is_available():
+        model = model.cuda()
+        print("✓ Accélération GPU activée")
+    else:
+        print("⚠ Exécution sur CPU (plus lent)")
+
+    return model
+
+
+# ============================================
+# PRÉ / POST-TRAITEMENT NUMPY
+# ============================================
+
+def letterbox(frame, size, stride=32, color=(114, 114, 114)):
+    """
+    Redimensionner une image comme AutoShape de YOLOv5 : le plus grand côté
+    vaut size, puis bordures pour obtenir des dimensions multiples de stride
+
+    Args:
+        frame: Image (H, W, 3)
+        size: Taille d'inférence (plus grand côté)
+        stride: Pas maximal du réseau
+
+    Retourne:
+        tuple: (image, ratio, (pad_x, pad_y))
+    """
+    h, w = frame.shape[:2]
+    ratio = size / max(h, w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    target_w = int(math.ceil(new_w / stride) * stride)
+    target_h = int(math.ceil(new_h / stride) * stride)
+    if (new_w, new_h) != (w, h):
+        frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    pad_x, pad_y = (target_w - new_w) / 2, (target_h - new_h) / 2
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    if top or bottom or left or right:
+        frame = cv2.copyMakeBorder(frame, top, bottom, left, right,
+                                   cv2.BORDER_CONSTANT, value=color)
+    return frame, ratio, (pad_x, pad_y)
+
+
+def to_blob(images):
+    """Images HWC uint8 (même taille) → tenseur NCHW float32 normalisé 0-1"""
+    blob = np.stack(images).transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(blob, dtype=np.float32) / 255.0
+
+
+def xywh_to_xyxy(boxes):
+    out = np.empty_like(boxes)
+    out[:, 0] = boxes[:, 0] - boxes[:, 2] / 2
+    out[:, 1] = boxes[:, 1] - boxes[:, 3] / 2
+    out[:, 2] = boxes[:, 0] + boxes[:, 2] / 2
+    out[:, 3] = boxes[:, 1] + boxes[:, 3] / 2
+    return out
+
+
+def nms(boxes, scores, iou_threshold):
+    """NMS glouton : indices des boîtes conservées, par score décroissant"""
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        if order.size == 1:
+            break
+        ious = box_iou(boxes[i:i + 1], boxes[order[1:]])[0]
+        order = order[1:][ious <= iou_threshold]
+    return np.asarray(keep, dtype=np.intp)
+
+
+def non_max_suppression(pred, conf_threshold=CONFIDENCE_THRESHOLD,
+                        iou_threshold=IOU_THRESHOLD, max_det=300, max_nms=30000):
+    """
+    Post-traitement YOLOv5 pour une image
+
+    Args:
+        pred: Sortie brute (N, 5 + nb_classes) [cx, cy, w, h, obj, scores...]
+
+    Retourne:
+        np.ndarray: Détections (M, 6) [x1, y1, x2, y2, conf, cls]
+    """
+    pred = pred[pred[:, 4] > conf_threshold]
+    if not len(pred):
+        return np.zeros((0, 6), dtype=np.float32)
+    scores = pred[:, 5:] * pred[:, 4:5]
+    classes = scores.argmax(axis=1)
+    conf = scores[np.arange(len(scores)), classes]
+    mask = conf > conf_threshold
+    boxes, conf, classes = xywh_to_xyxy(pred[mask, :4]), conf[mask], classes[mask]
+    if len(conf) > max_nms:
+        top = conf.argsort()[::-1][:max_nms]
+        boxes, conf, classes = boxes[top], conf[top], classes[top]
+    # NMS par classe : décaler les boîtes de chaque classe
+    offsets = classes[:, None].astype(np.float32) * 7680.0
+    keep = nms(boxes + offsets, conf, iou_threshold)[:max_det]
+    return np.concatenate(
+        [boxes[keep], conf[keep, None], classes[keep, None].astype(np.float32)], axis=1
+    ).astype(np.float32)
+
+
+def scale_boxes(boxes, ratio, pad, shape):
+    """Ramener les boîtes letterbox aux coordonnées de l'image d'origine"""
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / ratio
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / ratio
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+    return boxes
+
+
+class BackendResults:
+    """Résultats au format YOLOv5 minimal : .xyxy (une entrée par image) et .names"""
+
+    def __init__(self, xyxy, names):
+        self.xyxy = xyxy
+        self.names = names
+
+
+class _NumpyBackend:
+    """
+    Base commune des backends exportés : même interface d'appel que le modèle torch.hub
+    (model(frame ou liste, size=...) → résultats .xyxy, attribut .names)
+    Même convention que AutoShape : l'image est passée telle quelle (pas de conversion de canaux).
+    """
+
+    def __init__(self, names, stride=32):
+        self.names = names
+        self.stride = stride
+        self.conf = CONFIDENCE_THRESHOLD
+        self.iou = IOU_THRESHOLD
+
+    def _forward(self, blob):
+        raise NotImplementedError
+
+    def __call__(self, frames, size=INFERENCE_SIZE):
+        single = isinstance(frames, np.ndarray)
+        frames = [frames] if single else list(frames)
+        size = size or INFERENCE_SIZE
+        prepared = [letterbox(frame, size, self.stride) for frame in frames]
+        # Un seul passage si toutes les images ont la même taille après letterbox
+        shapes = {img.shape for img, _, _ in prepared}
+        if len(shapes) == 1:
+            outputs = list(self._forward(to_blob([img for img, _, _ in prepared])))
+        else:
+            outputs = [self._forward(to_blob([img]))[0] for img, _, _ in prepared]
+        xyxy = []
+        for frame, (_, ratio, pad), pred in zip(frames, prepared, outputs):
+            boxes = non_max_suppression(pred, self.conf, self.iou)
+            boxes[:, :4] = scale_boxes(boxes[:, :4], ratio, pad, frame.shape[:2])
+            xyxy.append(boxes)
+        return BackendResults(xyxy, self.names)
+
+
+class OnnxBackend(_NumpyBackend):
+    """Inférence via ONNX Runtime (CPU)"""
+
+    def __init__(self, onnx_path, names, stride=32, threads=0):
+        super().__init__(names, stride)
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("onnxruntime non installé (pip install onnxruntime)")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _forward(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoBackend(_NumpyBackend):
+    """Inférence via OpenVINO (CPU)"""
+
+    def __init__(self, xml_path, names, stride=32):
+        super().__init__(names, stride)
+        if not OPENVINO_AVAILABLE:
+            raise ImportError("openvino non installé (pip install openvino)")
+        self.compiled = ov.Core().compile_model(str(xml_path), "CPU")
+        self.output = self.compiled.output(0)
+
+    def _forward(self, blob):
+        return self.compiled(blob)[self.output]
+
+
+class TorchScriptBackend(_NumpyBackend):
+    """Inférence via un module TorchScript pré-sérialisé (aucun code YOLOv5 requis)"""
+
+    def __init__(self, ts_path, names, stride=32):
+        super().__init__(names, stride)
+        self.module = torch.jit.load(str(ts_path), map_location="cpu").eval()
+
+    def _forward(self, blob):
+        with torch.no_grad():
+            return self.module(torch.from_numpy(blob))[0].numpy()
+
+
+# ============================================
+# EXPORT ET CACHE
+# ============================================
+
+def _export_meta_path(export_path):
+    return Path(f"{export_path}.json")
+
+
+def _is_export_fresh(weights_path, export_path):
+    """L'export en cache correspond-il encore aux poids (taille + date) ?"""
+    meta_path = _export_meta_path(export_path)
+    if not Path(export_path).exists() or not meta_path.exists():
+        return False
+    meta = json.loads(meta_path.read_text())
+    stat = Path(weights_path).stat()
+    return meta.get("source_size") == stat.st_size and meta.get("source_mtime") == stat.st_mtime
+
+
+def read_export_meta(export_path):
+    """Noms des classes et stride enregistrés à l'export"""
+    meta = json.loads(_export_meta_path(export_path).read_text())
+    return {int(k): v for k, v in meta["names"].items()}, meta["stride"]
+
+
+def _load_export_net(weights_path):
+    """
+    Réseau YOLOv5 brut préparé pour l'export (tête Detect en mode export)
+
+    Retourne:
+        tuple: (réseau, noms des classes, stride)
+    """
+    if model_registry.is_pinned():
+        net = model_registry.load_checkpoint_net(weights_path)
+    else:
+        model = hub_load('custom', path=str(weights_path), autoshape=False)
+        net = getattr(model, "model", model)
+    net = net.float().eval()
+    for module in net.modules():
+        if type(module).__name__ == "Detect":
+            module.inplace = False
+            module.dynamic = True
+            module.export = True
+    names = net.names if isinstance(net.names, dict) else dict(enumerate(net.names))
+    return net, names, int(max(net.stride))
+
+
+def _write_export_meta(weights_path, export_path, names, stride):
+    stat = Path(weights_path).stat()
+    _export_meta_path(export_path).write_text(json.dumps({
+        "names": {str(k): v for k, v in names.items()},
+        "stride": stride,
+        "source_size": stat.st_size,
+        "source_mtime": stat.st_mtime,
+    }, indent=2))
+
+
+def export_onnx(weights_path=MODEL_PATH, onnx_path=None, size=INFERENCE_SIZE, opset=12):
+    """
+    Exporter les poids YOLOv5 en ONNX (axes batch / hauteur / largeur dynamiques)
+    Le fichier est mis en cache à côté des poids, avec un .json de métadonnées
+
+    Retourne:
+        Path: Chemin du fichier .onnx
+    """
+    weights_path = Path(weights_path)
+    onnx_path = Path(onnx_path) if onnx_path else weights_path.with_suffix(".onnx")
+    if _is_export_fresh(weights_path, onnx_path):
+        return onnx_path
+
+    print(f"📦 Export ONNX : {weights_path.name} → {onnx_path.name}")
+    net, names, stride = _load_export_net(weights_path)
+    dummy = torch.zeros(1, 3, size, size)
+    with torch.no_grad():
+        net(dummy)
+        torch.onnx.export(
+            net, dummy, str(onnx_path), opset_version=opset, do_constant_folding=True,
+            input_names=["images"], output_names=["output0"],
+            dynamic_axes={"images": {0: "batch", 2: "height", 3: "width"},
+                          "output0": {0: "batch", 1: "anchors"}},
+        )
+    _write_export_meta(weights_path, onnx_path, names, stride)
+    print("✓ Export ONNX terminé")
+    return onnx_path
+
+
+def export_torchscript(weights_path=MODEL_PATH, size=INFERENCE_SIZE):
+    """
+    Sérialiser les poids YOLOv5 en TorchScript (best.torchscript à côté des poids)
+
+    Retourne:
+        Path: Chemin du fichier .torchscript
+    """
+    weights_path = Path(weights_path)
+    ts_path = weights_path.with_suffix(".torchscript")
+    if _is_export_fresh(weights_path, ts_path):
+        return ts_path
+    print(f"📦 Export TorchScript : {weights_path.name} → {ts_path.name}")
+    net, names, stride = _load_export_net(weights_path)
+    with torch.no_grad():
+        traced = torch.jit.trace(net, torch.zeros(1, 3, size, size), strict=False)
+    traced.save(str(ts_path))
+    _write_export_meta(weights_path, ts_path, names, stride)
+    print("✓ Export TorchScript terminé")
+    return ts_path
+
+
+def export_openvino(weights_path=MODEL_PATH):
+    """
+    Convertir l'export ONNX en OpenVINO IR (.xml + .bin) à côté des poids
+
+    Retourne:
+        Path: Chemin du fichier .xml
+    """
+    if not OPENVINO_AVAILABLE:
+        raise ImportError("openvino non installé (pip install openvino)")
+    onnx_path = export_onnx(weights_path)
+    xml_path = Path(weights_path).with_suffix(".xml")
+    if _is_export_fresh(weights_path, xml_path):
+        return xml_path
+    print(f"📦 Export OpenVINO : {onnx_path.name} → {xml_path.name}")
+    ov.save_model(ov.convert_model(str(onnx_path)), str(xml_path))
+    _export_meta_path(xml_path).write_text(_export_meta_path(onnx_path).read_text())
+    print("✓ Export OpenVINO terminé")
+    return xml_path
+
+
+class _CalibrationReader(CalibrationDataReader):
+    """Images de TRAINING_DIR prétraitées comme à l'inférence (letterbox + blob)"""
+
+    def __init__(self, paths, input_name, size, stride):
+        self.paths = iter(paths)
+        self.input_name = input_name
+        self.size = size
+        self.stride = stride
+
+    def get_next(self):
+        for path in self.paths:
+            frame = cv2.imread(str(path))
+            if frame is not None:
+                img, _, _ = letterbox(frame, self.size, self.stride)
+                return {self.input_name: to_blob([img])}
+        return None
+
+
+def _detect_head_nodes(onnx_path):
+    """Nœuds de la tête Detect (dernier module YOLOv5), laissés en FP32 pour la précision"""
+    import onnx
+    graph = onnx.load(str(onnx_path)).graph
+    indices = [int(part.split(".")[1]) for node in graph.node
+               for part in node.name.split("/") if part.startswith("model.") and part[6:].isdigit()]
+    if not indices:
+        return []
+    prefix = f"/model.{max(indices)}/"
+    return [node.name for node in graph.node if node.name.startswith(prefix)]
+
+
+def export_onnx_int8(weights_path=MODEL_PATH, calibration_dir=TRAINING_DIR,
+                     samples=QUANT_CALIBRATION_SAMPLES, size=INFERENCE_SIZE):
+    """
+    Quantifier l'export ONNX en INT8 (quantification statique QDQ d'ONNX Runtime)
+    Calibration sur un échantillon fixe (graine 0) des images d'apprentissage
+
+    Retourne:
+        Path: Chemin du fichier .int8.onnx
+    """
+    if not ONNX_QUANTIZATION_AVAILABLE:
+        raise ImportError("onnxruntime (quantization) non installé (pip install onnxruntime onnx)")
+    onnx_path = export_onnx(weights_path)
+    int8_path = Path(weights_path).with_suffix(".int8.onnx")
+    if _is_export_fresh(weights_path, int8_path):
+        return int8_path
+
+    paths = list_frames(calibration_dir)
+    if not paths:
+        raise FileNotFoundError(f"Aucune image de calibration dans {calibration_dir}")
+    random.Random(0).shuffle(paths)
+    paths = paths[:samples]
+    names, stride = read_export_meta(onnx_path)
+    input_name = ort.InferenceSession(str(onnx_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    print(f"📦 Quantification INT8 : {onnx_path.name} → {int8_path.name} "
+          f"(calibration sur {len(paths)} images)")
+    quantize_static(
+        str(onnx_path), str(int8_path),
+        _CalibrationReader(paths, input_name, size, stride),
+        quant_format=QuantFormat.QDQ,
+        per_channel=QUANT_PER_CHANNEL,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        nodes_to_exclude=_detect_head_nodes(onnx_path) if QUANT_EXCLUDE_HEAD else [],
+    )
+    _write_export_meta(weights_path, int8_path, names, stride)
+    print("✓ Quantification INT8 terminée")
+    return int8_path
+
+
+EXPORTERS = {"onnx": export_onnx, "openvino": export_openvino,
+             "torchscript": export_torchscript, "onnx-int8": export_onnx_int8}
+BACKEND_CLASSES = {"onnx": OnnxBackend, "openvino": OpenVinoBackend,
+                   "torchscript": TorchScriptBackend, "onnx-int8": OnnxBackend}
+
+
+def load_backend(name=INFERENCE_BACKEND, weights_path=MODEL_PATH, timer=None):
+    """
+    Charger un backend d'inférence
+
+    Args:
+        name: "torch", "onnx", "openvino", "torchscript" ou "onnx-int8"
+            (ONNX quantifié INT8, calibré sur TRAINING_DIR)
+        weights_path: Poids YOLOv5 (.pt) de référence
+        timer: StartupTimer à compléter (optionnel)
+
+    Retourne:
+        model: Objet appelable model(frame, size=...) avec .names
+    """
+    timer = timer or StartupTimer()
+    if name not in BACKENDS:
+        raise ValueError(f"Backend inconnu : {name} (choix : {', '.join(BACKENDS)})")
+    if name != "torch" and not Path(weights_path).exists():
+        print(f"⚠ Poids introuvables pour l'export {name} : {weights_path}")
+        print("   Retour au backend torch")
+        name = "torch"
+    if name == "torch":
+        return load_yolo_model(weights_path, timer)
+
+    with timer.phase("model_build"):
+        export_path = EXPORTERS[name](weights_path)
+        names, stride = read_export_meta(export_path)
+    with timer.phase("weights_load"):
+        model = BACKEND_CLASSES[name](export_path, names, stride)
+    print(f"✓ Backend {name} : {export_path.name}")
+    return model
+
+
+# ============================================
+# COMPARAISON DES BACKENDS
+# ============================================
+
+def _to_numpy(pred):
+    if hasattr(pred, "cpu"):
+        pred = pred.cpu().numpy()
+    return np.asarray(pred, dtype=np.float32).reshape(-1, 6)
+
+
+def match_detections(ref, other, iou_threshold=0.5):
+    """
+    Nombre de détections appariées (même classe, IoU >= seuil), appariement glouton
+
+    Args:
+        ref, other: Tableaux (N, 6) [x1, y1, x2, y2, conf, cls]
+
+    Retourne:
+        int: Nombre de paires
+    """
+    if not len(ref) or not len(other):
+        return 0
+    ious = box_iou(ref[:, :4], other[:, :4])
+    ious[ref[:, 5][:, None] != other[:, 5][None, :]] = 0.0
+    matched = 0
+    while True:
+        i, j = np.unravel_index(np.argmax(ious), ious.shape)
+        if ious[i, j] < iou_threshold:
+            return matched
+        matched += 1
+        ious[i, :] = 0.0
+        ious[:, j] = 0.0
+
+
+def _rss_mb():
+    """Mémoire résidente du processus (Mo)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _artifact_mb(name, weights_path):
+    suffixes = {"torch": ".pt", "onnx": ".onnx", "openvino": ".bin",
+                "torchscript": ".torchscript", "onnx-int8": ".int8.onnx"}
+    path = Path(weights_path).with_suffix(suffixes[name])
+    return round(path.stat().st_size / 1e6, 2) if path.exists() else None
+
+
+def list_frames(folder):
+    """Images d'un dossier (triées par nom)"""
+    return sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def compare_backends(frames_dir=TRAINING_DIR, backend=INFERENCE_BACKEND, size=INFERENCE_SIZE,
+                     weights_path=MODEL_PATH, limit=None):
+    """
+    Comparer un backend au chemin torch (FP32) sur un dossier d'images :
+    latence par image, mémoire (hausse de la mémoire résidente au chargement,
+    taille du fichier) et accord des détections
+
+    Retourne:
+        dict: Rapport (latences en ms, mémoire en Mo, accord)
+    """
+    if backend == "torch":
+        raise ValueError("Choisir un backend différent de torch pour la comparaison")
+    frames = list_frames(frames_dir)[:limit]
+    if not frames:
+        raise FileNotFoundError(f"Aucune image dans {frames_dir}")
+    # Export / quantification avant les mesures mémoire
+    EXPORTERS[backend](weights_path)
+    models, memory = {}, {}
+    for name in ("torch", backend):
+        before = _rss_mb()
+        models[name] = load_yolo_model(weights_path) if name == "torch" else load_backend(name, weights_path)
+        models[name](np.zeros((size, size, 3), dtype=np.uint8), size=size)
+        memory[name] = {"rss_increase": round(_rss_mb() - before, 1),
+                        "artifact": _artifact_mb(name, weights_path)}
+
+    latencies = {name: [] for name in models}
+    matched = ref_total = other_total = top1_same = top1_total = 0
+    for path in frames:
+        frame = cv2.imread(str(path))
+        if frame is None:
+            continue
+        outputs = {}
+        for name, model in models.items():
+            start = time.perf_counter()
+            outputs[name] = _to_numpy(model(frame, size=size).xyxy[0])
+            latencies[name].append((time.perf_counter() - start) * 1000.0)
+        ref, other = outputs["torch"], outputs[backend]
+        matched += match_detections(ref, other)
+        ref_total += len(ref)
+        other_total += len(other)
+        if len(ref) or len(other):
+            top1_total += 1
+            if len(ref) and len(other):
+                top1_same += int(ref[np.argmax(ref[:, 4]), 5] == other[np.argmax(other[:, 4]), 5])
+
+    # La première inférence (préchauffage) est exclue des latences
+    report = {"frames": len(latencies["torch"]), "size": size, "latency_ms": {}, "memory_mb": memory}
+    for name, values in latencies.items():
+        values = np.asarray(values[1:] or values)
+        report["latency_ms"][name] = {
+            "mean": round(float(values.mean()), 2),
+            "p50": round(float(np.percentile(values, 50)), 2),
+            "p95": round(float(np.percentile(values, 95)), 2),
+        }
+    report["agreement"] = {
+        "matched_boxes": matched,
+        "torch_boxes": ref_total,
+        f"{backend}_boxes": other_total,
+        "recall_vs_torch": round(matched / ref_total, 4) if ref_total else 1.0,
+        "precision_vs_torch": round(matched / other_total, 4) if other_total else 1.0,
+        "top1_class_agreement": round(top1_same / top1_total, 4) if top1_total else 1.0,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backends d'inférence Smart Bin SI")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="Exporter best.pt en ONNX (et OpenVINO / TorchScript)")
+    export_cmd.add_argument("--weights", default=MODEL_PATH)
+    export_cmd.add_argument("--openvino", action="store_true")
+    export_cmd.add_argument("--torchscript", action="store_true")
+    export_cmd.add_argument("--int8", action="store_true", help="Quantification INT8 calibrée sur TRAINING_DIR")
+    compare_cmd = sub.add_parser("compare", help="Comparer un backend au chemin torch")
+    compare_cmd.add_argument("--frames", default=str(TRAINING_DIR), help="Dossier d'images")
+    compare_cmd.add_argument("--backend", default="onnx", choices=BACKENDS[1:])
+    compare_cmd.add_argument("--weights", default=MODEL_PATH)
+    compare_cmd.add_argument("--size", type=int, default=INFERENCE_SIZE)
+    compare_cmd.add_argument("--limit", type=int, default=None)
+    compare_cmd.add_argument("--json", help="Écrire le rapport dans ce fichier")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.weights)
+        if args.openvino:
+            export_openvino(args.weights)
+        if args.torchscript:
+            export_torchscript(args.weights)
+        if args.int8:
+            export_onnx_int8(args.weights)
+        return
+
+    report = compare_backends(args.frames, args.backend, args.size, args.weights, args.limit)
+    print("\n📊 Comparaison des backends")
+    for name, stats in report["latency_ms"].items():
+        memory = report["memory_mb"][name]
+        print(f"  {name:11} : {stats['mean']:7.1f} ms (p50 {stats['p50']:.1f}, p95 {stats['p95']:.1f})"
+              f" | mémoire +{memory['rss_increase']} Mo, fichier {memory['artifact']} Mo")
+    for key, value in report["agreement"].items():
+        print(f"  {key:22} : {value}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"💾 Rapport : {args.json}")
+
+
+if __name__ == "__main__":
+    main()
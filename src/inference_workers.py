@@ -0,0 +1,487 @@
+"""
+Smart Bin SI - Processus d'inférence parallèles (contourne le GIL sur CPU multi-cœurs)
+- Anneau d'images en mémoire partagée (multiprocessing.shared_memory) : l'image est copiée
+  une fois dans un emplacement libre, seuls (emplacement, numéro, forme) transitent par les files
+- N processus chargent chacun le modèle et traitent les emplacements qu'on leur confie
+- Les résultats reviennent avec le numéro d'image : l'étape ne publie que le plus récent
+  terminé (ou tous, remis en ordre, en relecture)
+- Nouveaux poids : un second groupe de processus démarre en arrière-plan, l'échange a
+  lieu entre deux images quand il est prêt (l'ancien groupe sert jusque-là)
+- Activé par INFERENCE_WORKERS > 0 (config.py)
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import shutil
+import threading
+import time
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+
+from camera_pipeline import put_latest, put_blocking
+from config import INFERENCE_BACKEND, MODEL_PATH, INFERENCE_RING_SLOTS, WORKER_WEIGHTS_DIR
+
+
+def snapshot_weights(weights_path, keep=(), folder=WORKER_WEIGHTS_DIR):
+    """
+    Copie figée des poids pour les processus : MODEL_PATH peut être remplacé pendant
+    qu'ils tournent, la version précédente reste disponible pour un retour arrière
+
+    Args:
+        weights_path: Poids à figer
+        keep: Copies encore utilisées (les autres sont supprimées, exports compris)
+        folder: Dossier des copies
+
+    Retourne:
+        Path: Copie (réutilisée, avec ses exports, si ces poids ont déjà été figés)
+    """
+    source = Path(weights_path)
+    stat = source.stat()
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    snapshot = folder / f"{source.stem}_{stat.st_size}_{stat.st_mtime_ns}{source.suffix}"
+    if not snapshot.exists():
+        tmp = snapshot.with_name(snapshot.name + ".tmp")
+        shutil.copy2(source, tmp)
+        os.replace(tmp, snapshot)
+    stems = {Path(path).stem for path in keep if path} | {snapshot.stem}
+    for path in folder.iterdir():
+        # Exports d'une copie : même nom, autre extension (.onnx, .int8.onnx, .xml...)
+        if not any(path.name.startswith(stem + ".") for stem in stems):
+            shutil.rmtree(path) if path.is_dir() else path.unlink()
+    return snapshot
+
+
+class SharedFrameRing:
+    """
+    Emplacements d'images de taille fixe dans un bloc de mémoire partagée
+    """
+
+    def __init__(self, slots, slot_bytes, name=None):
+        """
+        Args:
+            slots: Nombre d'emplacements
+            slot_bytes: Taille max d'une image (octets)
+            name: Nom d'un bloc existant (processus lecteur), sinon création
+        """
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buffer = np.ndarray((slots, slot_bytes), dtype=np.uint8, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, slot, frame):
+        """Copier une image (éventuellement non contiguë, ex : recadrage) dans un emplacement"""
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"Image trop grande pour l'anneau ({frame.nbytes} > {self.slot_bytes} octets)")
+        view = self.buffer[slot, :frame.nbytes].reshape(frame.shape)
+        np.copyto(view, frame)
+        return frame.shape
+
+    def view(self, slot, shape):
+        """Vue (sans copie) sur l'image d'un emplacement"""
+        return self.buffer[slot, :int(np.prod(shape))].reshape(shape)
+
+    def close(self):
+        del self.buffer
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _worker_main(worker_id, ring_name, slots, slot_bytes, tasks, results,
+                 backend, weights_path, warmup_sizes):
+    """Boucle d'un processus d'inférence : emplacement → boîtes (N, 6) en coordonnées de l'image reçue"""
+    ring = None
+    try:
+        from inference_backends import load_backend
+        ring = SharedFrameRing(slots, slot_bytes, name=ring_name)
+        model = load_backend(backend, weights_path)
+        blank = np.zeros((64, 64, 3), dtype=np.uint8)
+        for size in warmup_sizes:
+            model(blank, size=size)
+        results.put(("ready", worker_id, None))
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, seq, shape, size = task
+            start = time.perf_counter()
+            pred = model(ring.view(slot, shape), size=size).xyxy[0]
+            seconds = time.perf_counter() - start
+            if hasattr(pred, "cpu"):
+                pred = pred.cpu().numpy()
+            boxes = np.asarray(pred, dtype=np.float32).reshape(-1, 6)
+            results.put(("result", worker_id, (slot, seq, size, boxes, seconds)))
+    except Exception as e:
+        results.put(("error", worker_id, f"{type(e).__name__}: {e}"))
+    finally:
+        if ring is not None:
+            ring.close()
+
+
+class InferenceWorkerPool:
+    """
+    Processus d'inférence + anneau partagé ; les emplacements libres sont gérés ici
+    (seul le processus principal écrit dans l'anneau)
+    """
+
+    def __init__(self, workers, slot_bytes, slots=INFERENCE_RING_SLOTS, backend=INFERENCE_BACKEND,
+                 weights_path=MODEL_PATH, warmup_sizes=(), ready_timeout=300):
+        """
+        Args:
+            workers: Nombre de processus
+            slot_bytes: Taille max d'une image (octets)
+            slots: Emplacements de l'anneau (0 = 2 par processus)
+            backend, weights_path: Modèle chargé par chaque processus
+            warmup_sizes: Tailles préchauffées dans chaque processus
+            ready_timeout: Attente max du chargement des modèles (s)
+        """
+        ctx = mp.get_context("spawn")  # Pas de fork d'un processus qui a des threads
+        self.workers = workers
+        self.ring = SharedFrameRing(slots or 2 * workers, slot_bytes)
+        self.free = list(range(self.ring.slots))
+        self.tasks = ctx.Queue()
+        self.results = ctx.Queue()
+        self.completed = {i: 0 for i in range(workers)}
+        self.processes = [
+            ctx.Process(target=_worker_main, name=f"inference-worker-{i}", daemon=True,
+                        args=(i, self.ring.name, self.ring.slots, slot_bytes, self.tasks,
+                              self.results, backend, str(weights_path), tuple(warmup_sizes)))
+            for i in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+        try:
+            deadline = time.time() + ready_timeout
+            ready = 0
+            while ready < workers:
+                try:
+                    kind, worker_id, payload = self.results.get(timeout=0.5)
+                except queue.Empty:
+                    self._check_alive()
+                    if time.time() > deadline:
+                        raise RuntimeError("Processus d'inférence : chargement du modèle trop long")
+                    continue
+                if kind == "error":
+                    raise RuntimeError(f"Processus d'inférence {worker_id} : {payload}")
+                ready += 1
+        except Exception:
+            self.close()
+            raise
+        print(f"✓ {workers} processus d'inférence prêts (anneau de {self.ring.slots} images)")
+
+    def _check_alive(self):
+        dead = [p.name for p in self.processes if not p.is_alive()]
+        if dead:
+            raise RuntimeError(f"Processus d'inférence arrêtés : {', '.join(dead)}")
+
+    @property
+    def has_free_slot(self):
+        return bool(self.free)
+
+    @property
+    def in_flight(self):
+        return self.ring.slots - len(self.free)
+
+    def submit(self, seq, frame, size):
+        """Copier l'image dans un emplacement libre et la confier à un processus"""
+        slot = self.free.pop()
+        shape = self.ring.write(slot, frame)
+        self.tasks.put((slot, seq, shape, size))
+
+    def run_once(self, frame, size, timeout=60.0):
+        """
+        Une inférence de vérification (groupe pas encore en service)
+
+        Retourne:
+            tuple: (boîtes (N, 6), secondes)
+        """
+        self.submit(-1, frame, size)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            for _, _, boxes, seconds in self.poll(timeout=0.1):
+                return boxes, seconds
+        raise RuntimeError("Processus d'inférence : pas de résultat pour l'image d'essai")
+
+    def poll(self, timeout=0.0):
+        """
+        Résultats terminés (les emplacements correspondants redeviennent libres)
+
+        Retourne:
+            list: [(seq, size, boxes, seconds), ...]
+        """
+        done = []
+        try:
+            message = self.results.get(timeout=timeout) if timeout else self.results.get_nowait()
+            while True:
+                kind, worker_id, payload = message
+                if kind == "error":
+                    raise RuntimeError(f"Processus d'inférence {worker_id} : {payload}")
+                slot, seq, size, boxes, seconds = payload
+                self.free.append(slot)
+                self.completed[worker_id] += 1
+                done.append((seq, size, boxes, seconds))
+                message = self.results.get_nowait()
+        except queue.Empty:
+            if timeout and not done:
+                self._check_alive()
+        return done
+
+    def close(self):
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5.0)
+            if process.is_alive():
+                process.terminate()
+        self.ring.close()
+
+
+class WorkerModel:
+    """
+    Processus principal avec INFERENCE_WORKERS : le modèle est chargé par chaque
+    processus, seuls les noms des classes sont gardés ici
+    """
+
+    def __init__(self, names, weights_path):
+        self.names = names
+        self.weights_path = weights_path
+
+
+class WorkerInferenceStage(threading.Thread):
+    """
+    Remplace InferenceStage avec INFERENCE_WORKERS > 0 : distribue les images aux
+    processus et publie (frame_id, timestamp, image, détections) vers l'affichage
+    """
+
+    def __init__(self, frames, workers, prepare, finish, maxsize=1, blocking=False, ring=None,
+                 backend=INFERENCE_BACKEND, weights_path=MODEL_PATH, warmup_sizes=(), on_error=None):
+        """
+        Args:
+            frames: File d'entrée (sortie du FrameGrabber)
+            workers: Nombre de processus d'inférence
+            prepare: image -> (zone à analyser, taille) ou None si l'image est sautée
+            finish: (boîtes, taille, secondes) -> détections
+            maxsize: Taille de la file de résultats
+            blocking: Relecture : résultats publiés dans l'ordre des images
+            ring: FrameRing du FrameGrabber (images prises signalées)
+            backend, weights_path, warmup_sizes: Modèle des processus
+            on_error: Erreur des processus en service -> True si traitée (autres poids
+                demandés avec reload), sinon l'étape s'arrête
+        """
+        super().__init__(name="inference-dispatch", daemon=True)
+        self.frames = frames
+        self.n_workers = workers
+        self.prepare = prepare
+        self.finish = finish
+        self.ring = ring
+        self.model_args = {"backend": backend, "weights_path": weights_path,
+                           "warmup_sizes": warmup_sizes}
+        self.results = queue.Queue(maxsize=maxsize)
+        self.stop_event = threading.Event()
+        self.blocking = blocking
+        self.pool = None
+        self.pending = {}        # seq -> (timestamp, image) en cours dans un processus
+        self.ordered = {}        # seq -> résultat terminé en attente des précédents (relecture)
+        self.next_seq = None
+        self.last_published = 0
+        self.dropped = 0
+        self.stale = 0           # Résultats terminés après un plus récent (direct)
+        self.error = None
+        self.on_error = on_error
+        self.slot_bytes = None   # Taille d'un emplacement, fixée par la première image
+        self.reloads = 0
+        self._starting = None    # Thread de démarrage d'un nouveau groupe de processus
+        self._ready_pools = queue.Queue()  # Groupes démarrés (ou en échec), à échanger ici
+        self._generation = 0     # Seule la demande de rechargement la plus récente compte
+        self._generation_lock = threading.Lock()
+
+    def _publish(self, item):
+        if self.blocking:
+            put_blocking(self.results, item, self.stop_event)
+        else:
+            self.dropped += put_latest(self.results, item,
+                                       on_drop=self.ring.discard if self.ring else None)
+
+    def _complete(self, seq, item):
+        if self.blocking:
+            # Relecture : remettre en ordre, chaque image est publiée
+            self.ordered[seq] = item
+            while self.next_seq in self.ordered:
+                self._publish(self.ordered.pop(self.next_seq))
+                self.next_seq += 1
+        elif seq > self.last_published:
+            # Direct : seul le résultat le plus récent compte
+            self.last_published = seq
+            self._publish(item)
+        else:
+            self.stale += 1
+            if self.ring:
+                self.ring.discard(item)
+
+    def _collect(self, timeout=0.0):
+        try:
+            done = self.pool.poll(timeout)
+        except RuntimeError as e:
+            self._pool_failed(e)
+            return
+        for seq, size, boxes, seconds in done:
+            timestamp, frame = self.pending.pop(seq)
+            self._complete(seq, (seq, timestamp, frame, self.finish(boxes, size, seconds)))
+
+    def _pool_failed(self, error):
+        """Processus en service en échec : images en cours rendues sans détection, groupe fermé"""
+        for seq in sorted(self.pending):
+            timestamp, frame = self.pending.pop(seq)
+            self._complete(seq, (seq, timestamp, frame, None))
+        self.pool.close()
+        self.pool = None
+        if not (self.on_error and self.on_error(error)):
+            raise error
+
+    def _start_pool(self, generation, weights_path, check, on_ready, on_failed):
+        """Thread de démarrage : nouveau groupe chargé, préchauffé et vérifié pendant que l'ancien sert"""
+        pool = None
+        try:
+            pool = InferenceWorkerPool(self.n_workers, self.slot_bytes,
+                                       **dict(self.model_args, weights_path=weights_path))
+            if check:
+                check(pool)
+        except Exception as e:
+            if pool is not None:
+                pool.close()
+            self._ready_pools.put((generation, None, weights_path, e, on_failed))
+            return
+        self._ready_pools.put((generation, pool, weights_path, None, on_ready))
+
+    def _swap_pool(self):
+        """Thread de l'étape, entre deux images : passer au groupe prêt (ou signaler son échec)"""
+        try:
+            generation, pool, weights_path, error, callback = self._ready_pools.get_nowait()
+        except queue.Empty:
+            return
+        if generation != self._generation:
+            # Remplacé par une demande plus récente
+            if pool is not None:
+                pool.close()
+            return
+        self._starting = None
+        if error is not None:
+            print(f"✗ Nouveaux processus d'inférence refusés, poids actuels conservés : {error}")
+            if callback:
+                callback(error)
+            return
+        # Finir les images confiées à l'ancien groupe, puis échanger
+        while self.pending and self.pool is not None:
+            self._collect(timeout=0.01)
+        if generation != self._generation:
+            pool.close()
+            return
+        if self.pool is not None:
+            self.pool.close()
+        self.pool = pool
+        self.model_args["weights_path"] = weights_path
+        self.reloads += 1
+        if callback:
+            callback()
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                self._swap_pool()
+                if self.pool is not None:
+                    if not self.pool.has_free_slot:
+                        # Tous les processus occupés : la capture garde la plus récente
+                        self._collect(timeout=0.01)
+                        continue
+                    self._collect()
+                try:
+                    item = self.frames.get(timeout=0.005)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    # Fin de la source : attendre les images en cours
+                    while self.pending and not self.stop_event.is_set():
+                        self._collect(timeout=0.1)
+                    break
+                frame_id, timestamp, frame = item
+                if self.ring:
+                    self.ring.taken(frame_id)
+                if self.next_seq is None:
+                    self.next_seq = frame_id
+                prepared = self.prepare(frame)
+                if prepared is None:
+                    self._complete(frame_id, (frame_id, timestamp, frame, None))
+                    continue
+                region, size = prepared
+                if self.pool is None:
+                    if self._starting is not None:
+                        # Processus en cours de redémarrage : image rendue sans détection
+                        self._complete(frame_id, (frame_id, timestamp, frame, None))
+                        continue
+                    # Anneau dimensionné sur la première image (taille de source fixe)
+                    self.slot_bytes = region.nbytes
+                    self.pool = InferenceWorkerPool(self.n_workers, self.slot_bytes, **self.model_args)
+                self.pool.submit(frame_id, region, size)
+                self.pending[frame_id] = (timestamp, frame)
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+            while not self._ready_pools.empty():
+                pool = self._ready_pools.get_nowait()[1]
+                if pool is not None:
+                    pool.close()
+        if not self.blocking or put_blocking(self.results, None, self.stop_event):
+            put_latest(self.results, None)
+
+    def reload(self, weights_path, check=None, on_ready=None, on_failed=None):
+        """
+        Nouveaux poids : un second groupe de processus démarre en arrière-plan, l'échange
+        a lieu entre deux images quand il est prêt (l'ancien groupe sert jusque-là)
+
+        Args:
+            weights_path: Poids à charger
+            check: Fonction groupe -> None avant l'échange ; lève une exception pour refuser
+            on_ready: Appelée (thread de l'étape) au moment de l'échange
+            on_failed: Appelée avec l'erreur si le groupe ne démarre pas
+        """
+        weights_path = str(weights_path)
+        if self.slot_bytes is None:
+            # Aucune image encore : le premier groupe chargera directement ces poids
+            self.model_args["weights_path"] = weights_path
+            if on_ready:
+                on_ready()
+            return
+        with self._generation_lock:
+            self._generation += 1
+            generation = self._generation
+        self._starting = threading.Thread(
+            target=self._start_pool, name="inference-reload", daemon=True,
+            args=(generation, weights_path, check, on_ready, on_failed))
+        self._starting.start()
+
+    def stats(self):
+        return {
+            "workers": self.n_workers,
+            "in_flight": self.pool.in_flight if self.pool else 0,
+            "completed": dict(self.pool.completed) if self.pool else {},
+            "stale": self.stale,
+            "reloads": self.reloads,
+            "reloading": self._starting is not None,
+        }
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,278 @@
+"""
+Smart Bin SI - Registre local des modèles (démarrage rapide, sans réseau)
+- Épingle une fois le code YOLOv5 (tag fixe) et les poids de secours sous MODELS_DIR/registry
+- Charge ensuite le modèle directement depuis le disque, sans résolution torch.hub
+- Mesure le temps de démarrage : imports, chargement des poids, construction, 1re inférence
+
+Commandes :
+  python3 src/model_registry.py pin       (une fois, avec réseau)
+  python3 src/model_registry.py status
+  python3 src/model_registry.py bench     (détail du temps de démarrage)
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+import torch
+
+from config import (
+    MODEL_PATH, CONFIDENCE_THRESHOLD, IOU_THRESHOLD, MODEL_REGISTRY_DIR,
+)
+
+YOLOV5_REPO = "ultralytics/yolov5"
+YOLOV5_REF = "v7.0"
+FALLBACK_WEIGHTS = "yolov5s.pt"
+
+CODE_DIR = MODEL_REGISTRY_DIR / "yolov5"
+WEIGHTS_DIR = MODEL_REGISTRY_DIR / "weights"
+MANIFEST_PATH = MODEL_REGISTRY_DIR / "registry.json"
+
+
+# ============================================
+# MESURE DU DÉMARRAGE
+# ============================================
+
+class StartupTimer:
+    """Chronométrage du démarrage par phase (secondes)"""
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def report(self):
+        print("⏱ Temps de démarrage :")
+        for name, seconds in self.phases.items():
+            print(f"   {name:16} {seconds * 1000:8.0f} ms")
+        print(f"   {'total':16} {self.total() * 1000:8.0f} ms")
+
+
+class _Phase:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+# ============================================
+# REGISTRE
+# ============================================
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_pinned():
+    """Le code YOLOv5 est-il disponible localement ?"""
+    return (CODE_DIR / "hubconf.py").exists()
+
+
+def fallback_weights():
+    """Poids YOLOv5s épinglés (ou None)"""
+    path = WEIGHTS_DIR / FALLBACK_WEIGHTS
+    return path if path.exists() else None
+
+
+def read_manifest():
+    if not MANIFEST_PATH.exists():
+        return {}
+    return json.loads(MANIFEST_PATH.read_text())
+
+
+def pin(ref=YOLOV5_REF, force=False):
+    """
+    Télécharger une fois le code YOLOv5 (tag ref) et les poids YOLOv5s dans le registre
+    Seule opération qui nécessite le réseau.
+    """
+    MODEL_REGISTRY_DIR.mkdir(parents=True, exist_ok=True)
+    WEIGHTS_DIR.mkdir(parents=True, exist_ok=True)
+
+    if force and CODE_DIR.exists():
+        shutil.rmtree(CODE_DIR)
+    if not is_pinned():
+        url = f"https://github.com/{YOLOV5_REPO}/archive/refs/tags/{ref}.zip"
+        print(f"📥 Code YOLOv5 {ref} : {url}")
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = Path(tmp) / "yolov5.zip"
+            torch.hub.download_url_to_file(url, str(archive), progress=True)
+            with zipfile.ZipFile(archive) as zf:
+                zf.extractall(tmp)
+            extracted = next(p for p in Path(tmp).iterdir() if p.is_dir())
+            shutil.move(str(extracted), str(CODE_DIR))
+
+    weights = WEIGHTS_DIR / FALLBACK_WEIGHTS
+    if force or not weights.exists():
+        url = f"https://github.com/{YOLOV5_REPO}/releases/download/{ref}/{FALLBACK_WEIGHTS}"
+        print(f"📥 Poids de secours : {url}")
+        torch.hub.download_url_to_file(url, str(weights), progress=True)
+
+    manifest = {
+        "repo": YOLOV5_REPO,
+        "ref": ref,
+        "pinned_at": datetime.now().isoformat(),
+        "weights": {FALLBACK_WEIGHTS: _sha256(weights)},
+    }
+    if Path(MODEL_PATH).exists():
+        manifest["weights"][Path(MODEL_PATH).name] = _sha256(MODEL_PATH)
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2))
+    print(f"✓ Registre prêt : {MODEL_REGISTRY_DIR}")
+    return manifest
+
+
+def hub_load(model_name, **kwargs):
+    """
+    torch.hub.load sur le code épinglé (hors ligne) si disponible,
+    sinon sur le dépôt GitHub comme avant
+    """
+    if is_pinned():
+        return torch.hub.load(str(CODE_DIR), model_name, source="local", **kwargs)
+    return torch.hub.load(YOLOV5_REPO, model_name, **kwargs)
+
+
+def _import_yolov5():
+    """Rendre le code YOLOv5 épinglé importable (models, utils)"""
+    code_dir = str(CODE_DIR)
+    if code_dir not in sys.path:
+        sys.path.insert(0, code_dir)
+    from models.common import AutoShape
+    return AutoShape
+
+
+def _torch_load(path):
+    try:
+        return torch.load(str(path), map_location="cpu", weights_only=False)
+    except TypeError:
+        # Anciennes versions de PyTorch (Jetson) : pas d'argument weights_only
+        return torch.load(str(path), map_location="cpu")
+
+
+def checkpoint_names(weights_path):
+    """
+    Noms des classes d'un checkpoint .pt, sans construire ni préchauffer le réseau
+
+    Retourne:
+        dict: id → nom
+    """
+    _import_yolov5()  # Classes YOLOv5 nécessaires pour désérialiser le checkpoint
+    ckpt = _torch_load(weights_path)
+    names = (ckpt.get("ema") or ckpt["model"]).names
+    del ckpt
+    return dict(names) if isinstance(names, dict) else dict(enumerate(names))
+
+
+def load_checkpoint_net(weights_path, timer=None):
+    """
+    Charger le réseau YOLOv5 brut depuis un checkpoint .pt, sans torch.hub
+
+    Retourne:
+        torch.nn.Module: Réseau en mode évaluation (float32, couches fusionnées)
+    """
+    timer = timer or StartupTimer()
+    with timer.phase("imports"):
+        _import_yolov5()
+    with timer.phase("weights_load"):
+        ckpt = _torch_load(weights_path)
+    with timer.phase("model_build"):
+        net = (ckpt.get("ema") or ckpt["model"]).float()
+        if not hasattr(net, "stride"):
+            net.stride = torch.tensor([32.0])
+        if isinstance(getattr(net, "names", None), (list, tuple)):
+            net.names = dict(enumerate(net.names))
+        net = net.fuse().eval() if hasattr(net, "fuse") else net.eval()
+        # Compatibilité des checkpoints (mêmes ajustements que attempt_load de YOLOv5)
+        for module in net.modules():
+            kind = type(module).__name__
+            if kind in ("Detect", "Model", "DetectionModel"):
+                module.inplace = True
+            if kind == "Detect" and not isinstance(module.anchor_grid, list):
+                delattr(module, "anchor_grid")
+                setattr(module, "anchor_grid", [torch.zeros(1)] * module.nl)
+            elif kind == "Upsample" and not hasattr(module, "recompute_scale_factor"):
+                module.recompute_scale_factor = None
+    return net
+
+
+def load_local_model(weights_path, timer=None):
+    """
+    Charger le modèle YOLOv5 (interface AutoShape, comme torch.hub) depuis le registre
+
+    Args:
+        weights_path: Poids .pt (best.pt ou poids de secours)
+        timer: StartupTimer à compléter (optionnel)
+
+    Retourne:
+        model: Modèle AutoShape prêt pour l'inférence
+    """
+    timer = timer or StartupTimer()
+    net = load_checkpoint_net(weights_path, timer)
+    with timer.phase("model_build"):
+        AutoShape = _import_yolov5()
+        model = AutoShape(net)
+        model.conf = CONFIDENCE_THRESHOLD
+        model.iou = IOU_THRESHOLD
+        if torch.cuda.is_available():
+            model = model.cuda()
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Registre local des modèles Smart Bin SI")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pin_cmd = sub.add_parser("pin", help="Épingler le code YOLOv5 et les poids (réseau requis)")
+    pin_cmd.add_argument("--ref", default=YOLOV5_REF)
+    pin_cmd.add_argument("--force", action="store_true")
+    sub.add_parser("status", help="État du registre")
+    bench_cmd = sub.add_parser("bench", help="Détail du temps de démarrage")
+    bench_cmd.add_argument("--weights", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.command == "pin":
+        pin(args.ref, args.force)
+    elif args.command == "status":
+        print(f"Registre : {MODEL_REGISTRY_DIR}")
+        print(f"  Code YOLOv5 épinglé : {'oui' if is_pinned() else 'non'}")
+        print(f"  Poids de secours    : {fallback_weights() or 'absents'}")
+        for key, value in read_manifest().items():
+            print(f"  {key:19} : {value}")
+    else:
+        import numpy as np
+        timer = StartupTimer()
+        weights = args.weights if Path(args.weights).exists() else fallback_weights()
+        if weights is None or not is_pinned():
+            print("✗ Registre incomplet : lancer d'abord 'python3 src/model_registry.py pin'")
+            return 1
+        model = load_local_model(weights, timer)
+        with timer.phase("first_inference"):
+            model(np.zeros((480, 640, 3), dtype=np.uint8))
+        timer.report()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
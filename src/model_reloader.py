@@ -0,0 +1,105 @@
+"""
+Smart Bin SI - Rechargement à chaud des poids YOLO
+- Surveille le fichier de poids dans MODELS_DIR (taille + date de modification)
+- Un fichier nouveau et stable (inchangé entre deux vérifications) est chargé,
+  préchauffé et vérifié dans un thread : la boucle caméra continue avec l'ancien modèle
+- Le détecteur récupère le candidat entre deux images (take) et l'échange
+- Chaque rechargement est journalisé (durées de chargement / échange / interruption)
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from config import MODEL_RELOAD_INTERVAL, MODEL_RELOAD_LOG
+
+
+def _signature(path):
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+def log_reload(record, path=MODEL_RELOAD_LOG):
+    """Ajouter un rechargement au journal (JSON lines)"""
+    if not path:
+        return
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+class ModelReloader(threading.Thread):
+    """
+    Thread de surveillance et de préparation des nouveaux poids
+    """
+
+    def __init__(self, weights_path, prepare, interval=MODEL_RELOAD_INTERVAL):
+        """
+        Args:
+            weights_path: Fichier de poids surveillé
+            prepare: Fonction chemin -> (modèle chargé, préchauffé et vérifié, infos) ;
+                lève une exception si le modèle est refusé
+            interval: Période de vérification (s)
+        """
+        super().__init__(name="model-reloader", daemon=True)
+        self.weights_path = Path(weights_path)
+        self.prepare = prepare
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.loaded_signature = _signature(self.weights_path)
+        self._seen = self.loaded_signature
+        self._candidate = None
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.rejected = 0
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            signature = _signature(self.weights_path)
+            if signature is None or signature == self.loaded_signature:
+                self._seen = signature
+                continue
+            if signature != self._seen:
+                # Fichier en cours de copie ? Attendre qu'il ne bouge plus
+                self._seen = signature
+                continue
+            self.loaded_signature = signature  # Une seule tentative par version du fichier
+            self.attempts += 1
+            print(f"\n🔄 Nouveaux poids détectés : {self.weights_path.name} (chargement en arrière-plan)")
+            start = time.perf_counter()
+            try:
+                model, info = self.prepare(self.weights_path)
+            except Exception as e:
+                self.rejected += 1
+                print(f"✗ Nouveaux poids refusés, modèle actuel conservé : {e}")
+                log_reload({"at": time.time(), "path": str(self.weights_path), "status": "rejected",
+                            "reason": f"{type(e).__name__}: {e}",
+                            "prepare_ms": round((time.perf_counter() - start) * 1000, 1)})
+                continue
+            info["prepare_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            with self._lock:
+                self._candidate = (model, info)
+
+    def take(self):
+        """
+        Candidat prêt à être échangé (une seule fois), ou None
+
+        Retourne:
+            tuple: (modèle, infos) ou None
+        """
+        if self._candidate is None:
+            return None
+        with self._lock:
+            candidate, self._candidate = self._candidate, None
+        return candidate
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stats(self):
+        return {"attempts": self.attempts, "rejected": self.rejected,
+                "pending": self._candidate is not None}
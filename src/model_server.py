@@ -0,0 +1,360 @@
+"""
+Smart Bin SI - Serveur de modèle local (plusieurs caméras, un seul modèle)
+- Un seul processus charge les poids YOLO et sert les images via un socket Unix
+- Les requêtes de plusieurs WasteDetector sont regroupées en un seul passage
+  (taille de lot max + temps d'attente max)
+- Statistiques par client (latence) et par lot (taille) exportées en JSON
+
+Lancement : python3 src/model_server.py
+Côté détecteur : USE_MODEL_SERVER = True dans config.py
+"""
+
+import json
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from config import (
+    MODEL_PATH, INFERENCE_BACKEND, MODEL_SERVER_SOCKET, MODEL_SERVER_MAX_BATCH,
+    MODEL_SERVER_MAX_WAIT_MS, MODEL_SERVER_STATS_PATH,
+)
+
+# Protocole : [longueur de l'en-tête JSON (uint32)] [en-tête JSON] [données brutes]
+_HEADER_LEN = struct.Struct("!I")
+
+
+def _recv_exact(sock, nbytes):
+    """Lire exactement nbytes octets sur le socket (None si fermé)"""
+    buf = bytearray(nbytes)
+    view = memoryview(buf)
+    received = 0
+    while received < nbytes:
+        n = sock.recv_into(view[received:], nbytes - received)
+        if n == 0:
+            return None
+        received += n
+    return buf
+
+
+def send_message(sock, header, payload=b""):
+    """Envoyer un message (en-tête JSON + données brutes)"""
+    header = dict(header, nbytes=len(payload))
+    raw = json.dumps(header).encode()
+    sock.sendall(_HEADER_LEN.pack(len(raw)) + raw)
+    if payload:
+        sock.sendall(payload)
+
+
+def recv_message(sock):
+    """Recevoir un message : retourne (en-tête, données) ou (None, None) si fermé"""
+    raw_len = _recv_exact(sock, _HEADER_LEN.size)
+    if raw_len is None:
+        return None, None
+    raw = _recv_exact(sock, _HEADER_LEN.unpack(raw_len)[0])
+    if raw is None:
+        return None, None
+    header = json.loads(raw)
+    payload = b""
+    if header.get("nbytes"):
+        payload = _recv_exact(sock, header["nbytes"])
+        if payload is None:
+            return None, None
+    return header, payload
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    return float(np.percentile(np.asarray(values), q))
+
+
+# ============================================
+# SERVEUR
+# ============================================
+
+class _PendingRequest:
+    """Requête d'inférence en attente de son lot"""
+
+    __slots__ = ("client", "frame", "size", "received_at", "result", "done")
+
+    def __init__(self, client, frame, size):
+        self.client = client
+        self.frame = frame
+        self.size = size
+        self.received_at = time.perf_counter()
+        self.result = None
+        self.done = threading.Event()
+
+
+class ModelServer:
+    """
+    Sert un modèle YOLO unique à plusieurs clients avec regroupement dynamique
+    """
+
+    def __init__(self, model, socket_path=MODEL_SERVER_SOCKET,
+                 max_batch=MODEL_SERVER_MAX_BATCH, max_wait_ms=MODEL_SERVER_MAX_WAIT_MS,
+                 stats_path=MODEL_SERVER_STATS_PATH):
+        """
+        Args:
+            model: Modèle YOLO (appelable sur une liste d'images, résultats .xyxy)
+            socket_path: Chemin du socket Unix
+            max_batch: Nombre maximum d'images par passage
+            max_wait_ms: Attente maximale pour compléter un lot (ms)
+            stats_path: Fichier JSON des statistiques (None = pas d'export)
+        """
+        self.model = model
+        self.socket_path = str(socket_path)
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats_path = stats_path
+        self.requests = queue.Queue()
+        self.stop_event = threading.Event()
+        self._next_client_id = 0
+        self._stats_lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.client_latencies = {}   # client_id -> deque de latences (ms)
+        self.client_counts = Counter()
+
+    def serve_forever(self):
+        """Accepter les clients et lancer le thread de regroupement"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.socket_path)
+        server.listen()
+        server.settimeout(0.5)
+        threading.Thread(target=self._batch_loop, name="batcher", daemon=True).start()
+        threading.Thread(target=self._stats_loop, name="stats", daemon=True).start()
+        print(f"✓ Serveur de modèle prêt : {self.socket_path} "
+              f"(lot max {self.max_batch}, attente max {self.max_wait * 1000:.0f} ms)")
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                self._next_client_id += 1
+                threading.Thread(
+                    target=self._handle_client, args=(conn, self._next_client_id),
+                    name=f"client-{self._next_client_id}", daemon=True
+                ).start()
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.write_stats()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _handle_client(self, conn, client_id):
+        """Boucle d'un client : une requête à la fois, réponse après son lot"""
+        print(f"🔌 Client {client_id} connecté")
+        try:
+            while not self.stop_event.is_set():
+                header, payload = recv_message(conn)
+                if header is None:
+                    break
+                op = header.get("op")
+                if op == "hello":
+                    names = self.model.names
+                    if not isinstance(names, dict):
+                        names = dict(enumerate(names))
+                    send_message(conn, {"ok": True, "client_id": client_id,
+                                        "names": {str(k): v for k, v in names.items()}})
+                elif op == "infer":
+                    frame = np.frombuffer(payload, dtype=header["dtype"]).reshape(header["shape"])
+                    pending = _PendingRequest(client_id, frame, header.get("size"))
+                    self.requests.put(pending)
+                    pending.done.wait()
+                    if isinstance(pending.result, Exception):
+                        send_message(conn, {"ok": False, "error": str(pending.result)})
+                        continue
+                    boxes = np.ascontiguousarray(pending.result, dtype=np.float32)
+                    send_message(conn, {"ok": True, "n": len(boxes)}, boxes.tobytes())
+                elif op == "stats":
+                    send_message(conn, {"ok": True, "stats": self.get_stats()})
+                else:
+                    send_message(conn, {"ok": False, "error": f"opération inconnue : {op}"})
+        except (ConnectionError, OSError) as e:
+            print(f"⚠ Client {client_id} : {e}")
+        finally:
+            conn.close()
+            print(f"🔌 Client {client_id} déconnecté")
+
+    def _collect_batch(self):
+        """Attendre une requête, puis compléter le lot jusqu'à max_batch ou max_wait"""
+        try:
+            first = self.requests.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while not self.stop_event.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            # Un passage par taille d'entrée demandée
+            by_size = {}
+            for pending in batch:
+                by_size.setdefault(pending.size, []).append(pending)
+            for size, group in by_size.items():
+                self._run_group(size, group)
+
+    def _run_group(self, size, group):
+        frames = [pending.frame for pending in group]
+        try:
+            results = self.model(frames, size=size) if size else self.model(frames)
+            outputs = []
+            for pred in results.xyxy:
+                if hasattr(pred, "cpu"):
+                    pred = pred.cpu().numpy()
+                outputs.append(pred)
+        except Exception as e:
+            outputs = [e] * len(group)
+        now = time.perf_counter()
+        with self._stats_lock:
+            self.batch_sizes[len(group)] += 1
+            for pending, output in zip(group, outputs):
+                latencies = self.client_latencies.setdefault(pending.client, deque(maxlen=500))
+                latencies.append((now - pending.received_at) * 1000.0)
+                self.client_counts[pending.client] += 1
+        for pending, output in zip(group, outputs):
+            pending.result = output
+            pending.done.set()
+
+    def get_stats(self):
+        """Statistiques courantes : tailles de lots et latence par client"""
+        with self._stats_lock:
+            total_batches = sum(self.batch_sizes.values())
+            total_frames = sum(size * n for size, n in self.batch_sizes.items())
+            clients = {}
+            for client_id, latencies in self.client_latencies.items():
+                values = list(latencies)
+                clients[str(client_id)] = {
+                    "requests": self.client_counts[client_id],
+                    "latency_ms_p50": round(_percentile(values, 50), 2),
+                    "latency_ms_p95": round(_percentile(values, 95), 2),
+                    "latency_ms_max": round(max(values), 2) if values else 0.0,
+                }
+            return {
+                "timestamp": time.time(),
+                "batches": total_batches,
+                "frames": total_frames,
+                "mean_batch_size": round(total_frames / total_batches, 2) if total_batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self.batch_sizes.items())},
+                "clients": clients,
+            }
+
+    def write_stats(self):
+        if not self.stats_path:
+            return
+        tmp_path = f"{self.stats_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.get_stats(), f, indent=2)
+        os.replace(tmp_path, self.stats_path)
+
+    def _stats_loop(self):
+        while not self.stop_event.wait(5.0):
+            try:
+                self.write_stats()
+            except OSError as e:
+                print(f"⚠ Export des statistiques impossible : {e}")
+
+
+# ============================================
+# CLIENT
+# ============================================
+
+class ServerResults:
+    """Résultats au format YOLOv5 minimal (.xyxy) renvoyés par le serveur"""
+
+    def __init__(self, boxes, names):
+        self.xyxy = [boxes]
+        self.names = names
+
+
+class RemoteModel:
+    """
+    Modèle distant : même interface d'appel que le modèle torch.hub
+    (model(frame) → résultats avec .xyxy[0] et model.names)
+    """
+
+    def __init__(self, socket_path=MODEL_SERVER_SOCKET):
+        self.socket_path = str(socket_path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.socket_path)
+        self._lock = threading.Lock()
+        header, _ = self._request({"op": "hello"})
+        self.client_id = header["client_id"]
+        self.names = {int(k): v for k, v in header["names"].items()}
+        self.latencies = deque(maxlen=500)
+
+    def _request(self, header, payload=b""):
+        with self._lock:
+            send_message(self.sock, header, payload)
+            response, data = recv_message(self.sock)
+        if response is None:
+            raise ConnectionError("serveur de modèle déconnecté")
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "erreur du serveur de modèle"))
+        return response, data
+
+    def __call__(self, frame, size=None):
+        start = time.perf_counter()
+        frame = np.ascontiguousarray(frame)
+        header = {"op": "infer", "shape": list(frame.shape), "dtype": str(frame.dtype)}
+        if size:
+            header["size"] = int(size)
+        response, data = self._request(header, memoryview(frame).cast("B"))
+        boxes = np.frombuffer(data, dtype=np.float32).reshape(response["n"], 6)
+        self.latencies.append((time.perf_counter() - start) * 1000.0)
+        return ServerResults(boxes, self.names)
+
+    def server_stats(self):
+        """Statistiques du serveur (tous clients)"""
+        response, _ = self._request({"op": "stats"})
+        return response["stats"]
+
+    def close(self):
+        self.sock.close()
+
+
+# ============================================
+# POINT D'ENTRÉE PRINCIPAL
+# ============================================
+
+def main():
+    """Charger le modèle une seule fois et servir les détecteurs"""
+    from inference_backends import load_backend
+
+    print("\n" + "="*50)
+    print("🧠 SMART BIN SI - SERVEUR DE MODÈLE")
+    print("="*50)
+    server = ModelServer(load_backend(INFERENCE_BACKEND, MODEL_PATH))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Arrêt du serveur de modèle")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Smart Bin SI - Filtre de mouvement avant inférence
+Compare chaque image (réduite, niveaux de gris) à un modèle de fond glissant :
+YOLO ne tourne que si la scène change, ou si un objet suivi n'est pas encore résolu.
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from config import (
+    MOTION_SCALE_WIDTH, MOTION_PIXEL_THRESHOLD, MOTION_MIN_CHANGED_RATIO,
+    MOTION_BACKGROUND_ALPHA, MOTION_SETTLE_FRAMES, MOTION_IDLE_FPS,
+)
+
+
+class MotionGate:
+    """
+    Décide, image par image, si l'inférence YOLO est nécessaire
+    """
+
+    def __init__(self, scale_width=MOTION_SCALE_WIDTH, pixel_threshold=MOTION_PIXEL_THRESHOLD,
+                 min_changed_ratio=MOTION_MIN_CHANGED_RATIO, background_alpha=MOTION_BACKGROUND_ALPHA,
+                 settle_frames=MOTION_SETTLE_FRAMES, idle_fps=MOTION_IDLE_FPS):
+        """
+        Args:
+            scale_width: Largeur de l'image réduite utilisée pour la comparaison
+            pixel_threshold: Écart de niveau de gris pour qu'un pixel soit "changé"
+            min_changed_ratio: Proportion de pixels changés pour parler de mouvement
+            background_alpha: Vitesse d'adaptation du fond (0-1)
+            settle_frames: Inférences supplémentaires après l'arrêt du mouvement
+                (l'objet posé est classé une fois immobile)
+            idle_fps: Cadence de vérification quand la scène est statique (0 = pas de limite)
+        """
+        self.scale_width = scale_width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.background_alpha = background_alpha
+        self.settle_frames = settle_frames
+        self.idle_interval = 1.0 / idle_fps if idle_fps else 0.0
+        self.background = None
+        self.still_frames = 0
+        self.changed_ratio = 0.0
+
+        # Compteurs pour mesurer le CPU économisé
+        self.inferred = 0
+        self.gated = 0
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.scale_width, max(1, int(h * self.scale_width / w)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def should_infer(self, frame, unresolved=False):
+        """
+        Args:
+            frame: Image BGR pleine résolution
+            unresolved: True si un objet suivi attend encore une décision
+
+        Retourne:
+            bool: True si YOLO doit tourner sur cette image
+        """
+        small = self._prepare(frame)
+        if self.background is None or self.background.shape != small.shape:
+            self.background = small.astype(np.float32)
+            self.inferred += 1
+            return True
+
+        diff = cv2.absdiff(small, cv2.convertScaleAbs(self.background))
+        self.changed_ratio = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+        cv2.accumulateWeighted(small, self.background, self.background_alpha)
+
+        if self.changed_ratio >= self.min_changed_ratio:
+            self.still_frames = 0
+        else:
+            self.still_frames += 1
+
+        if unresolved or self.still_frames <= self.settle_frames:
+            self.inferred += 1
+            return True
+        self.gated += 1
+        return False
+
+    def wait_idle(self):
+        """Ralentir la boucle quand la scène est statique"""
+        if self.idle_interval:
+            time.sleep(self.idle_interval)
+
+    def stats(self):
+        total = self.inferred + self.gated
+        return {
+            "inferred": self.inferred,
+            "gated": self.gated,
+            "gated_ratio": round(self.gated / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,113 @@
+"""
+Smart Bin SI - Métriques du pipeline partagées avec l'interface admin
+- Le détecteur écrit un instantané JSON dans un bloc mémoire partagé (fichier mmap)
+  au plus une fois par PIPELINE_METRICS_INTERVAL : pas de socket, pas de requête
+- Compteur de séquence (pair = stable) : le lecteur relit si une écriture était en cours
+- L'interface admin lit le bloc avec read_metrics() (/api/pipeline/metrics)
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import PIPELINE_METRICS_PATH, PIPELINE_METRICS_SIZE, PIPELINE_METRICS_INTERVAL
+
+MAGIC = 0x53424D31            # "SBM1"
+HEADER = struct.Struct("<IIId")  # magic, séquence, taille du JSON, horodatage
+# Bornes des histogrammes de latence (ms)
+LATENCY_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def latency_histogram(samples_s, edges_ms=LATENCY_EDGES_MS):
+    """
+    Histogramme de latence : counts[i] = échantillons <= edges_ms[i], dernier = au-delà
+
+    Retourne:
+        dict: {"edges_ms": [...], "counts": [...]}
+    """
+    ms = np.asarray(samples_s, dtype=np.float64) * 1000
+    counts = np.bincount(np.searchsorted(edges_ms, ms), minlength=len(edges_ms) + 1)
+    return {"edges_ms": list(edges_ms), "counts": counts.tolist()}
+
+
+class MetricsPublisher:
+    """
+    Écrit les métriques du détecteur dans le bloc partagé
+    """
+
+    def __init__(self, path=PIPELINE_METRICS_PATH, size=PIPELINE_METRICS_SIZE,
+                 interval=PIPELINE_METRICS_INTERVAL):
+        self.path = Path(path)
+        self.size = size
+        self.interval = interval
+        self.last_publish = 0.0
+        self.published = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._seq = 0
+        self._write(b"{}")
+
+    def _write(self, payload):
+        if HEADER.size + len(payload) > self.size:
+            payload = json.dumps({"error": "métriques trop volumineuses",
+                                  "size": len(payload)}).encode()
+        now = time.time()
+        # Séquence impaire pendant l'écriture
+        self._seq += 1
+        HEADER.pack_into(self._map, 0, MAGIC, self._seq, 0, now)
+        self._map[HEADER.size:HEADER.size + len(payload)] = payload
+        self._seq += 1
+        HEADER.pack_into(self._map, 0, MAGIC, self._seq, len(payload), now)
+
+    def due(self):
+        return time.monotonic() - self.last_publish >= self.interval
+
+    def publish(self, metrics):
+        """Écrire un instantané (dict sérialisable en JSON)"""
+        self.last_publish = time.monotonic()
+        self._write(json.dumps(metrics, separators=(",", ":"), default=str).encode())
+        self.published += 1
+
+    def close(self, final=None):
+        """Dernier instantané (ex : {"running": False}) puis fermeture du bloc"""
+        if final is not None:
+            self.publish(final)
+        self._map.close()
+
+
+def read_metrics(path=PIPELINE_METRICS_PATH, retries=5):
+    """
+    Lire le dernier instantané publié par le détecteur
+
+    Retourne:
+        dict: Métriques + "age_s" (ancienneté), ou None si aucun détecteur n'a publié
+    """
+    path = Path(path)
+    if not path.exists() or path.stat().st_size < HEADER.size:
+        return None
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as block:
+            for _ in range(retries):
+                magic, seq, length, updated = HEADER.unpack_from(block, 0)
+                if magic != MAGIC:
+                    return None
+                if seq % 2:
+                    time.sleep(0.001)
+                    continue
+                payload = bytes(block[HEADER.size:HEADER.size + length])
+                if HEADER.unpack_from(block, 0)[1] != seq:
+                    continue
+                metrics = json.loads(payload) if length else {}
+                metrics["age_s"] = round(time.time() - updated, 3)
+                return metrics
+    return None
@@ -0,0 +1,108 @@
+"""
+Smart Bin SI - Zone de la plateforme (ROI)
+- Seule la zone de la plateforme est envoyée à YOLO (taille d'inférence réduite)
+- Les boîtes sont ensuite ramenées en coordonnées de l'image complète
+- Calibration : python3 src/platform_roi.py (sélection à la souris, enregistrée dans ROI_FILE)
+"""
+
+import json
+import sys
+from datetime import datetime
+
+import cv2
+
+from config import (
+    PLATFORM_ROI, ROI_FILE, CAMERA_SOURCE, USE_CSI_CAMERA, FRAME_WIDTH, FRAME_HEIGHT,
+)
+
+
+def _clamp(roi, width, height):
+    x1, y1, x2, y2 = [int(round(v)) for v in roi]
+    x1, x2 = sorted((max(0, min(x1, width)), max(0, min(x2, width))))
+    y1, y2 = sorted((max(0, min(y1, height)), max(0, min(y2, height))))
+    if x2 - x1 < 2 or y2 - y1 < 2:
+        return None
+    return x1, y1, x2, y2
+
+
+def load_roi(width=FRAME_WIDTH, height=FRAME_HEIGHT):
+    """
+    ROI de la plateforme : fichier de calibration si présent, sinon PLATFORM_ROI
+
+    Args:
+        width, height: Taille réelle des images de la caméra (première image lue)
+
+    Retourne:
+        tuple: (x1, y1, x2, y2) en pixels, ou None pour l'image entière
+    """
+    # PLATFORM_ROI est exprimée pour FRAME_WIDTH x FRAME_HEIGHT
+    roi, ref_w, ref_h = PLATFORM_ROI, FRAME_WIDTH, FRAME_HEIGHT
+    if ROI_FILE.exists():
+        data = json.loads(ROI_FILE.read_text())
+        roi = data["roi"]
+        ref_w, ref_h = data.get("frame_width", ref_w), data.get("frame_height", ref_h)
+    if roi is None:
+        return None
+    # Définie pour une autre résolution : mise à l'échelle proportionnelle
+    if (ref_w, ref_h) != (width, height):
+        sx, sy = width / ref_w, height / ref_h
+        roi = (roi[0] * sx, roi[1] * sy, roi[2] * sx, roi[3] * sy)
+    return _clamp(roi, width, height)
+
+
+def crop(frame, roi):
+    """Vue (sans copie) sur la zone de la plateforme"""
+    if roi is None:
+        return frame
+    x1, y1, x2, y2 = roi
+    return frame[y1:y2, x1:x2]
+
+
+def save_roi(roi, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+    """Enregistrer la ROI calibrée dans ROI_FILE"""
+    ROI_FILE.parent.mkdir(parents=True, exist_ok=True)
+    ROI_FILE.write_text(json.dumps({
+        "roi": list(roi),
+        "frame_width": width,
+        "frame_height": height,
+        "calibrated_at": datetime.now().isoformat(),
+    }, indent=2))
+
+
+def calibrate():
+    """Sélectionner la plateforme à la souris sur une image de la caméra"""
+    if USE_CSI_CAMERA:
+        from camera_pipeline import get_csi_pipeline  # Sans charger le détecteur (torch)
+        cap = cv2.VideoCapture(get_csi_pipeline(width=FRAME_WIDTH, height=FRAME_HEIGHT),
+                               cv2.CAP_GSTREAMER)
+    else:
+        cap = cv2.VideoCapture(CAMERA_SOURCE)
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+    # Laisser l'exposition se stabiliser
+    frame = None
+    for _ in range(10):
+        ret, image = cap.read()
+        if ret:
+            frame = image
+    cap.release()
+    if frame is None:
+        print("✗ Échec de lecture de la caméra")
+        return 1
+
+    print("🖱 Sélectionne la plateforme puis Entrée (c = annuler)")
+    x, y, w, h = cv2.selectROI("Zone de la plateforme", frame, showCrosshair=True)
+    cv2.destroyAllWindows()
+    if w == 0 or h == 0:
+        print("⊘ Calibration annulée")
+        return 1
+    height, width = frame.shape[:2]
+    roi = _clamp((x, y, x + w, y + h), width, height)
+    save_roi(roi, width, height)
+    ratio = (roi[2] - roi[0]) * (roi[3] - roi[1]) / (width * height)
+    print(f"✓ ROI enregistrée : {roi} ({ratio:.0%} de l'image) → {ROI_FILE}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(calibrate())
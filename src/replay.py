@@ -0,0 +1,223 @@
+"""
+Smart Bin SI - Relecture d'une vidéo ou d'un dossier d'images
+- CAMERA_SOURCE peut être un fichier vidéo ou un dossier d'images (ordre des noms)
+- Relecture déterministe : vitesse native (cadence de la source) ou maximale,
+  files bloquantes (aucune image jetée), horloge = temps de la source
+- Arduino en simulation, questions du mode apprentissage répondues par un script
+- Rapport JSON : latences p50/p95/p99 par étape et débit total
+
+Exemple (config.py) :
+  CAMERA_SOURCE = "data/replays/session1.mp4"
+  REPLAY_SPEED = "max"
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from config import (
+    REPLAY_SPEED, REPLAY_FOLDER_FPS, REPLAY_ANSWERS, REPLAY_DEFAULT_ANSWER, REPLAY_REPORT_PATH,
+)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+# Étapes mesurées, dans l'ordre du pipeline
+STAGES = ("capture", "inference", "postprocess", "draw", "decision")
+
+
+def is_replay_source(source):
+    """
+    True si la source est un fichier vidéo ou un dossier d'images
+    (pas un index de caméra ni un périphérique comme /dev/video0)
+    """
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit()):
+        return False
+    path = Path(source)
+    return path.is_dir() or path.is_file()  # is_file : fichier régulier seulement
+
+
+class FolderCapture:
+    """Dossier d'images lu comme un cv2.VideoCapture (read / isOpened / get / release)"""
+
+    def __init__(self, folder, fps=REPLAY_FOLDER_FPS):
+        self.paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        self.fps = fps
+        self.position = 0
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def read(self, image=None):
+        # cv2.imread alloue toujours : image (tampon de sortie) est ignoré
+        while self.position < len(self.paths):
+            frame = cv2.imread(str(self.paths[self.position]))
+            self.position += 1
+            if frame is not None:
+                return True, frame
+        return False, None
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return len(self.paths)
+        return 0
+
+    def set(self, prop, value):
+        return False
+
+    def release(self):
+        self.paths = []
+
+
+class ReplayCapture:
+    """
+    Capture de relecture : cadence native ou maximale, horloge de la source
+    """
+
+    def __init__(self, source, speed=REPLAY_SPEED):
+        """
+        Args:
+            source: Fichier vidéo ou dossier d'images
+            speed: "native" (cadence de la source) ou "max" (aussi vite que possible)
+        """
+        self.source = Path(source)
+        self.cap = FolderCapture(source) if self.source.is_dir() else cv2.VideoCapture(str(source))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or REPLAY_FOLDER_FPS
+        self.native = speed == "native"
+        self.frames_read = 0
+        self.started = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self, image=None):
+        if self.started is None:
+            self.started = time.perf_counter()
+        if self.native:
+            # Attendre l'instant de l'image dans la source
+            delay = self.started + self.frames_read / self.fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        ret, frame = self.cap.read(image) if image is not None else self.cap.read()
+        if ret:
+            self.frames_read += 1
+        return ret, frame
+
+    def clock(self):
+        """Horodatage de la dernière image lue, en secondes de la source"""
+        return max(self.frames_read - 1, 0) / self.fps
+
+    def set(self, prop, value):
+        return False
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        self.cap.release()
+
+
+class ScriptedAnswers:
+    """
+    Réponses automatiques aux questions (input) : une réponse par ligne du script,
+    puis REPLAY_DEFAULT_ANSWER quand le script est épuisé
+    """
+
+    def __init__(self, path=REPLAY_ANSWERS, default=REPLAY_DEFAULT_ANSWER):
+        self.answers = []
+        if path and Path(path).exists():
+            self.answers = [line.rstrip("\n") for line in Path(path).read_text().splitlines()]
+        self.default = default
+        self.asked = 0
+
+    def __call__(self, prompt=""):
+        answer = self.answers[self.asked] if self.asked < len(self.answers) else self.default
+        self.asked += 1
+        print(f"{prompt}{answer}  [script]")
+        return answer
+
+
+class StageTimer:
+    """Durées par étape du pipeline (secondes) et rapport de latence"""
+
+    def __init__(self, window=None):
+        """
+        Args:
+            window: Nombre de mesures gardées par étape (None = toutes, pour la relecture ;
+                borné en fonctionnement continu pour les métriques en direct)
+        """
+        self.window = window
+        self.samples = {stage: deque(maxlen=window) for stage in STAGES}
+        self.started = time.perf_counter()
+        self.frames = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            if stage not in self.samples:
+                self.samples[stage] = deque(maxlen=self.window)
+            self.samples[stage].append(seconds)
+
+    def snapshot(self):
+        """Copie des mesures par étape (lecture depuis un autre thread)"""
+        with self._lock:
+            return {stage: list(samples) for stage, samples in self.samples.items()}
+
+    @contextmanager
+    def measure(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def report(self, extra=None):
+        """
+        Retourne:
+            dict: {étape: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}, throughput...}
+        """
+        elapsed = time.perf_counter() - self.started
+        stages = {}
+        for stage, samples in self.snapshot().items():
+            if not samples:
+                continue
+            ms = np.asarray(samples) * 1000
+            p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+            stages[stage] = {
+                "count": len(ms),
+                "mean_ms": round(float(ms.mean()), 2),
+                "p50_ms": round(float(p50), 2),
+                "p95_ms": round(float(p95), 2),
+                "p99_ms": round(float(p99), 2),
+                "max_ms": round(float(ms.max()), 2),
+            }
+        report = {
+            "stages": stages,
+            "frames": self.frames,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_fps": round(self.frames / elapsed, 2) if elapsed else 0.0,
+        }
+        report.update(extra or {})
+        return report
+
+    def write_report(self, path=REPLAY_REPORT_PATH, extra=None):
+        """Afficher le rapport et l'écrire en JSON"""
+        report = self.report(extra)
+        print("\n📊 Latence par étape (ms)")
+        print(f"  {'étape':12} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8}")
+        for stage, s in report["stages"].items():
+            print(f"  {stage:12} {s['count']:6d} {s['p50_ms']:8.2f} {s['p95_ms']:8.2f} {s['p99_ms']:8.2f}")
+        print(f"  Débit : {report['throughput_fps']} images/s "
+              f"({report['frames']} images en {report['elapsed_s']} s)")
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(json.dumps(report, indent=2))
+            print(f"✓ Rapport écrit : {path}")
+        return report
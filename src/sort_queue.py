@@ -0,0 +1,112 @@
+"""
+Smart Bin SI - File des objets à trier (tri groupé)
+- Chaque piste prête (preuves suffisantes) entre une seule fois dans la file
+- Les objets en attente partent en lot quand la plateforme est libre : ordre des bacs
+  choisi pour limiter la rotation du servo d'orientation (repos → bacs → repos)
+- Statistiques : objets triés par minute, rotation évitée par rapport à un aller-retour par objet
+"""
+
+import time
+from collections import deque
+from itertools import permutations
+
+from config import (
+    ORIENTATION_ANGLES, ORIENTATION_REST, SORT_BATCH_MAX, SORT_BATCH_WINDOW,
+)
+
+
+def travel(bins, angles=ORIENTATION_ANGLES, rest=ORIENTATION_REST):
+    """Rotation totale (degrés) pour enchaîner les bacs depuis le repos puis y revenir"""
+    path = [rest] + [angles[b] for b in bins] + [rest]
+    return sum(abs(b - a) for a, b in zip(path, path[1:]))
+
+
+def order_by_travel(bins, angles=ORIENTATION_ANGLES, rest=ORIENTATION_REST):
+    """
+    Ordre des bacs minimisant la rotation : objets d'un même bac regroupés,
+    puis meilleure permutation des bacs distincts (3 bacs : 6 ordres au plus)
+
+    Retourne:
+        list: Bacs (avec répétitions) dans l'ordre d'envoi
+    """
+    distinct = list(dict.fromkeys(bins))
+    best = min(permutations(distinct), key=lambda order: travel(order, angles, rest))
+    return [b for b in best for _ in range(bins.count(b))]
+
+
+class SortQueue:
+    """
+    Objets suivis en attente de tri
+    """
+
+    def __init__(self, max_batch=SORT_BATCH_MAX, window=SORT_BATCH_WINDOW):
+        """
+        Args:
+            max_batch: Objets max par commande
+            window: Attente (s) après le premier objet pour en regrouper d'autres
+        """
+        self.max_batch = max_batch
+        self.window = window
+        self.items = []              # [{"track_id", "class", "bin", "queued_at"}, ...]
+        self.sorted_times = deque(maxlen=1000)
+        self.batches = 0
+        self.items_sorted = 0
+        self.travel_deg = 0
+        self.naive_travel_deg = 0    # Aller-retour depuis le repos pour chaque objet
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, track_id, waste_class, bin_color, now=None):
+        """Mettre un objet en file (une seule fois par piste)"""
+        if any(item["track_id"] == track_id for item in self.items):
+            return False
+        self.items.append({"track_id": track_id, "class": waste_class, "bin": bin_color,
+                           "queued_at": time.time() if now is None else now})
+        return True
+
+    def due(self, now=None):
+        """Un lot doit-il partir (file pleine, ou plus ancien objet assez attendu) ?"""
+        if not self.items:
+            return False
+        now = time.time() if now is None else now
+        return len(self.items) >= self.max_batch or now - self.items[0]["queued_at"] >= self.window
+
+    def take_batch(self, now=None):
+        """
+        Retirer le prochain lot (objets les plus anciens), ordonné pour la rotation
+
+        Retourne:
+            list: Objets dans l'ordre d'envoi
+        """
+        batch, self.items = self.items[:self.max_batch], self.items[self.max_batch:]
+        order = order_by_travel([item["bin"] for item in batch])
+        remaining = list(batch)
+        ordered = []
+        for bin_color in order:
+            item = next(i for i in remaining if i["bin"] == bin_color)
+            remaining.remove(item)
+            ordered.append(item)
+
+        now = time.time() if now is None else now
+        self.batches += 1
+        self.items_sorted += len(ordered)
+        self.sorted_times.extend([now] * len(ordered))
+        self.travel_deg += travel(order)
+        self.naive_travel_deg += sum(travel([b]) for b in order)
+        return ordered
+
+    def per_minute(self, now=None):
+        now = time.time() if now is None else now
+        return sum(1 for t in self.sorted_times if now - t <= 60)
+
+    def stats(self, now=None):
+        return {
+            "queued": len(self.items),
+            "items_sorted": self.items_sorted,
+            "batches": self.batches,
+            "items_per_minute": self.per_minute(now),
+            "avg_batch": round(self.items_sorted / self.batches, 2) if self.batches else 0.0,
+            "travel_deg": self.travel_deg,
+            "travel_saved_deg": self.naive_travel_deg - self.travel_deg,
+        }
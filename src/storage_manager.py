@@ -0,0 +1,391 @@
+"""
+Smart Bin SI - Quota et rétention du dossier d'apprentissage (carte SD)
+- Index incrémental (taille, date, classe) des images de TRAINING_DIR : mis à jour à chaque
+  écriture, réécrit au plus toutes les SAVE_INTERVAL s ; parcours complet seulement à la
+  création de l'index, si une image est plus récente que l'index (arrêt brutal) ou 'rescan'
+- Avant chaque écriture : place faite si le quota total ou celui de la classe est dépassé,
+  écriture refusée (erreur comptée et affichée) s'il reste moins de STORAGE_MIN_FREE_MB libres
+- Politiques d'éviction : "oldest" (plus anciennes d'abord), "balanced" (plus anciennes
+  de la classe la plus volumineuse), "errors_first" (_duplicates/ puis _errors/, puis anciennes)
+- Usage lu par l'interface admin : /api/storage
+
+Commandes :
+  python3 src/storage_manager.py status
+  python3 src/storage_manager.py rescan             (reconstruire l'index depuis le disque)
+  python3 src/storage_manager.py enforce [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+from config import (
+    TRAINING_DIR, STORAGE_QUOTA_MB, STORAGE_CLASS_CAP_MB, STORAGE_LOW_WATER,
+    STORAGE_EVICTION_POLICY, STORAGE_MIN_FREE_MB, STORAGE_INDEX_NAME,
+)
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+POLICIES = ("oldest", "balanced", "errors_first")
+# Ordre d'éviction de "errors_first" (dossier de premier niveau → rang)
+EXPENDABLE = {"_duplicates": 0, "_errors": 1}
+SAVE_INTERVAL = 2.0      # Délai max (s) avant réécriture de l'index après une modification
+MB = 1024 * 1024
+
+
+def _kind_and_class(rel):
+    """Chemin relatif → (dossier spécial ou "ok", classe)"""
+    parts = Path(rel).parts
+    kind = parts[0] if parts[0].startswith("_") else "ok"
+    return kind, parts[-2] if len(parts) > 1 else ""
+
+
+def _file_size(image_path):
+    """Taille de l'image + de son label YOLO"""
+    size = image_path.stat().st_size
+    label = image_path.with_suffix(".txt")
+    if label.exists():
+        size += label.stat().st_size
+    return size
+
+
+class StorageManager:
+    """
+    Index des images et application du quota (partagé par les threads d'écriture)
+    """
+
+    def __init__(self, root=TRAINING_DIR, quota_mb=STORAGE_QUOTA_MB, class_cap_mb=STORAGE_CLASS_CAP_MB,
+                 policy=STORAGE_EVICTION_POLICY, low_water=STORAGE_LOW_WATER,
+                 min_free_mb=STORAGE_MIN_FREE_MB, readonly=False, on_evict=None):
+        """
+        Args:
+            root: Dossier des images d'apprentissage
+            quota_mb: Taille max du dossier (0 = pas de quota)
+            class_cap_mb: Taille max par classe (0 = pas de limite)
+            policy: "oldest", "balanced" ou "errors_first"
+            low_water: Après éviction, descendre à cette fraction de la limite
+                (évictions groupées plutôt qu'à chaque image)
+            min_free_mb: Espace libre minimal à garder sur le disque
+            readonly: Lecture seule (autre processus, ex : interface admin) : index lu tel
+                quel, jamais reconstruit ni réécrit
+            on_evict: Fonction appelée avec les chemins des images supprimées
+                (ex : ImageDeduplicator.forget)
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Politique d'éviction inconnue : {policy} (choix : {', '.join(POLICIES)})")
+        self.root = Path(root)
+        self.quota = int(quota_mb * MB)
+        self.class_cap = int(class_cap_mb * MB)
+        self.policy = policy
+        self.low_water = low_water
+        self.min_free = int(min_free_mb * MB)
+        self.index_path = self.root / STORAGE_INDEX_NAME
+        self._lock = threading.RLock()
+        self.entries = {}        # chemin relatif → [taille, date]
+        self.total = 0
+        self.class_bytes = {}    # classe → octets (hors _duplicates)
+        self.class_files = {}    # classe → nombre d'images (hors _duplicates)
+        self.kind_bytes = {}     # "ok", "_errors", ... → octets
+        self.readonly = readonly
+        self.on_evict = on_evict
+        self._changes = 0
+        self._saved_at = 0.0
+        self.evicted = 0
+        self.evicted_bytes = 0
+        self.refused = 0
+        self._load()
+
+    # ---------- index ----------
+
+    def _load(self):
+        entries = None
+        if self.index_path.exists():
+            try:
+                entries = json.loads(self.index_path.read_text())
+            except (OSError, ValueError):
+                entries = None
+        if self.readonly:
+            for rel, (size, mtime) in (entries or {}).items():
+                self._account(rel, size, mtime)
+            return
+        if entries is None or self._index_stale():
+            self.rescan()
+            return
+        for rel, (size, mtime) in entries.items():
+            self._account(rel, size, mtime)
+
+    def _index_stale(self):
+        """
+        Une image est-elle plus récente que l'index (écrite après la dernière sauvegarde) ?
+        Les dates des images ne sont lues que dans les dossiers modifiés depuis l'index
+        """
+        saved = self.index_path.stat().st_mtime
+        folders = [(self.root, False)]
+        while folders:
+            folder, changed = folders.pop()
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        folders.append((entry.path, entry.stat().st_mtime > saved))
+                    elif (changed and entry.name.lower().endswith(IMAGE_SUFFIXES)
+                          and entry.stat().st_mtime > saved):
+                        print(f"ℹ Index de stockage en retard sur {entry.path} : reconstruction")
+                        return True
+        return False
+
+    def rescan(self):
+        """Reconstruire l'index depuis le disque (parcours complet, hors boucle caméra)"""
+        with self._lock:
+            self.entries, self.total, self.kind_bytes = {}, 0, {}
+            self.class_bytes, self.class_files = {}, {}
+            if self.root.exists():
+                for path in self.root.rglob("*"):
+                    if path.suffix.lower() not in IMAGE_SUFFIXES or path.name.startswith("."):
+                        continue
+                    stat = path.stat()
+                    self._account(path.relative_to(self.root).as_posix(), _file_size(path), stat.st_mtime)
+            self.save(force=True)
+
+    def _account(self, rel, size, mtime):
+        old = self.entries.get(rel)
+        if old is not None:
+            self._unaccount(rel)
+        self.entries[rel] = [size, mtime]
+        kind, class_name = _kind_and_class(rel)
+        self.total += size
+        self.kind_bytes[kind] = self.kind_bytes.get(kind, 0) + size
+        if kind != "_duplicates":
+            self.class_bytes[class_name] = self.class_bytes.get(class_name, 0) + size
+            self.class_files[class_name] = self.class_files.get(class_name, 0) + 1
+
+    def _unaccount(self, rel):
+        size, _ = self.entries.pop(rel)
+        kind, class_name = _kind_and_class(rel)
+        self.total -= size
+        self.kind_bytes[kind] -= size
+        if kind != "_duplicates":
+            self.class_bytes[class_name] -= size
+            self.class_files[class_name] -= 1
+        return size
+
+    def save(self, force=False):
+        """Réécrire l'index (modifications de plus de SAVE_INTERVAL s, ou immédiatement)"""
+        with self._lock:
+            if self.readonly:
+                return
+            if not force and (not self._changes or time.time() - self._saved_at < SAVE_INTERVAL):
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = self.index_path.with_name(self.index_path.name + ".tmp")
+            tmp.write_text(json.dumps(self.entries, separators=(",", ":")))
+            os.replace(tmp, self.index_path)
+            self._changes = 0
+            self._saved_at = time.time()
+
+    # ---------- chemin d'écriture ----------
+
+    def make_room(self, path, nbytes):
+        """
+        Libérer la place pour une image avant son écriture
+
+        Args:
+            path: Image à venir (dans root)
+            nbytes: Taille de l'image + label
+
+        Lève:
+            OSError: Disque presque plein malgré l'éviction (image à abandonner)
+        """
+        _, class_name = _kind_and_class(Path(path).relative_to(self.root))
+        with self._lock:
+            if self.class_cap and self.class_bytes.get(class_name, 0) + nbytes > self.class_cap:
+                self.evict(self.class_cap * self.low_water - nbytes, class_name=class_name)
+            if self.quota and self.total + nbytes > self.quota:
+                self.evict(self.quota * self.low_water - nbytes)
+            # Carte SD remplie par autre chose que les images : refuser plutôt que supprimer
+            free = shutil.disk_usage(self.root).free
+            if free - nbytes < self.min_free:
+                self.refused += 1
+                raise OSError(f"espace disque insuffisant ({free // MB} Mo libres, "
+                              f"minimum {self.min_free // MB} Mo)")
+
+    def add(self, path, nbytes=None):
+        """Enregistrer une image écrite (et son label) dans l'index"""
+        path = Path(path)
+        with self._lock:
+            self._account(path.relative_to(self.root).as_posix(),
+                          _file_size(path) if nbytes is None else nbytes, time.time())
+            self._changes += 1
+            self.save()
+
+    # ---------- éviction ----------
+
+    def _candidates(self, class_name=None):
+        """Images évictables dans l'ordre de la politique"""
+        items = [(rel, size, mtime) for rel, (size, mtime) in self.entries.items()
+                 if class_name is None or _kind_and_class(rel) in (("ok", class_name),
+                                                                   ("_errors", class_name),
+                                                                   ("_review", class_name))]
+        if self.policy == "errors_first":
+            items.sort(key=lambda item: (EXPENDABLE.get(_kind_and_class(item[0])[0], 2), item[2]))
+        else:
+            items.sort(key=lambda item: item[2])
+        return items
+
+    def _victims(self, target, class_name=None):
+        """Images à supprimer pour descendre à target octets (total ou classe)"""
+        if class_name is not None:
+            used = self.class_bytes.get(class_name, 0)
+        else:
+            used = self.total
+        candidates = self._candidates(class_name)
+        if self.policy != "balanced" or class_name is not None:
+            victims = []
+            for rel, size, _ in candidates:
+                if used <= target:
+                    break
+                victims.append(rel)
+                used -= size
+            return victims
+
+        # Équilibré : toujours dans la classe la plus volumineuse (plus anciennes d'abord)
+        by_class = {}
+        for rel, size, _ in candidates:
+            by_class.setdefault(_kind_and_class(rel)[1], []).append((rel, size))
+        remaining = dict(self.class_bytes)
+        cursor = {name: 0 for name in by_class}
+        victims = []
+        while used > target:
+            open_classes = [name for name in by_class if cursor[name] < len(by_class[name])]
+            if not open_classes:
+                break
+            name = max(open_classes, key=lambda n: remaining.get(n, 0))
+            rel, size = by_class[name][cursor[name]]
+            cursor[name] += 1
+            victims.append(rel)
+            remaining[name] = remaining.get(name, 0) - size
+            used -= size
+        return victims
+
+    def evict(self, target, class_name=None, dry_run=False):
+        """
+        Supprimer des images (+ labels) jusqu'à target octets
+
+        Args:
+            target: Octets visés (pour le dossier entier, ou pour class_name)
+            class_name: Limiter l'éviction à une classe
+            dry_run: Lister sans supprimer
+
+        Retourne:
+            list: Chemins relatifs supprimés (ou à supprimer)
+        """
+        with self._lock:
+            victims = self._victims(max(target, 0), class_name)
+            if dry_run or not victims:
+                return victims
+            freed = 0
+            for rel in victims:
+                path = self.root / rel
+                for companion in (path, path.with_suffix(".txt")):
+                    try:
+                        companion.unlink()
+                    except FileNotFoundError:
+                        pass  # Supprimée à la main : seulement l'oublier
+                freed += self._unaccount(rel)
+            self.evicted += len(victims)
+            self.evicted_bytes += freed
+            self._changes += len(victims)
+            self.save(force=True)
+        evicted = [self.root / rel for rel in victims]
+        # Liens durs du jeu de réentraînement : sans eux, l'espace n'est pas libéré
+        from finetune import unlink_evicted
+        unlink_evicted(evicted)
+        if self.on_evict:
+            self.on_evict(evicted)
+        scope = f"classe {class_name}" if class_name else "quota"
+        print(f"🧹 Stockage ({scope}) : {len(victims)} images supprimées, {freed / MB:.1f} Mo libérés "
+              f"(politique {self.policy})")
+        return victims
+
+    def enforce(self, dry_run=False):
+        """Appliquer quotas par classe puis total (commande, ou après un import)"""
+        victims = []
+        with self._lock:
+            if self.class_cap:
+                for class_name, used in list(self.class_bytes.items()):
+                    if used > self.class_cap:
+                        victims += self.evict(self.class_cap * self.low_water, class_name, dry_run)
+            if self.quota and self.total > self.quota:
+                victims += self.evict(self.quota * self.low_water, dry_run=dry_run)
+        return victims
+
+    # ---------- rapport ----------
+
+    def usage(self):
+        with self._lock:
+            disk = shutil.disk_usage(self.root) if self.root.exists() else None
+            return {
+                "root": str(self.root),
+                "files": len(self.entries),
+                "bytes": self.total,
+                "quota_bytes": self.quota or None,
+                "quota_used": round(self.total / self.quota, 3) if self.quota else None,
+                "class_cap_bytes": self.class_cap or None,
+                "classes": {name: {"files": self.class_files[name], "bytes": size}
+                            for name, size in sorted(self.class_bytes.items()) if size},
+                "folders": {kind: size for kind, size in sorted(self.kind_bytes.items()) if size},
+                "policy": self.policy,
+                "evicted": self.evicted,
+                "evicted_bytes": self.evicted_bytes,
+                "refused": self.refused,
+                "disk_free_bytes": disk.free if disk else None,
+                "disk_total_bytes": disk.total if disk else None,
+            }
+
+    def close(self):
+        self.save(force=True)
+
+
+def read_usage(root=TRAINING_DIR):
+    """
+    Usage d'après l'index écrit par le détecteur (lecture seule, aucun fichier écrit)
+
+    Retourne:
+        dict: Usage (voir StorageManager.usage), ou None si l'index n'existe pas encore
+    """
+    storage = StorageManager(root, readonly=True)
+    if not storage.index_path.exists():
+        return None
+    usage = storage.usage()
+    usage["index_updated_at"] = storage.index_path.stat().st_mtime
+    return usage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quota du dossier d'apprentissage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Usage par classe et par dossier")
+    sub.add_parser("rescan", help="Reconstruire l'index depuis le disque")
+    enforce = sub.add_parser("enforce", help="Appliquer les quotas")
+    enforce.add_argument("--dry-run", action="store_true", help="Lister sans supprimer")
+    args = parser.parse_args()
+
+    storage = StorageManager()
+    if args.command == "rescan":
+        storage.rescan()
+        print(f"✓ Index reconstruit : {len(storage.entries)} images, {storage.total / MB:.1f} Mo")
+    elif args.command == "enforce":
+        victims = storage.enforce(dry_run=args.dry_run)
+        if args.dry_run:
+            for rel in victims:
+                print(f"  {rel}")
+            print(f"ℹ {len(victims)} images seraient supprimées (simulation)")
+    print(json.dumps(storage.usage(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+"""
+Smart Bin SI - Suivi multi-objets pour la décision de tri
+- Associe les détections d'une image à l'autre (IoU, puis distance des centres)
+- Chaque piste a un identifiant persistant et cumule la confiance par classe
+- Le tri se déclenche quand l'avance de la meilleure classe dépasse un seuil,
+  au lieu d'exiger MIN_DETECTIONS images consécutives de la même classe
+
+Benchmark (images avant décision, ancien compteur vs suivi) :
+  python3 src/tracker.py --synthetic 200
+  python3 src/tracker.py --log data/detections.jsonl
+"""
+
+import argparse
+import json
+import random
+import sys
+from itertools import count
+
+import numpy as np
+
+from detections import Detection, box_iou, X1, Y1, X2, Y2, CONF, CLS
+from config import (
+    TRACK_IOU_THRESHOLD, TRACK_MAX_CENTROID_DISTANCE, TRACK_MAX_MISSES,
+    TRACK_EVIDENCE_THRESHOLD, MIN_DETECTIONS,
+)
+
+
+class Track:
+    """Un objet suivi sur la plateforme"""
+
+    __slots__ = ("track_id", "bbox", "class_scores", "class_hits", "hits", "misses",
+                 "age", "resolved")
+
+    def __init__(self, track_id, bbox):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.class_scores = {}   # id de classe -> confiance cumulée
+        self.class_hits = {}     # id de classe -> nombre d'images
+        self.hits = 0
+        self.misses = 0
+        self.age = 0
+        self.resolved = False    # Décision de tri déjà prise (ou ignorée)
+
+    def add(self, bbox, class_id, confidence):
+        self.bbox = bbox
+        self.class_scores[class_id] = self.class_scores.get(class_id, 0.0) + confidence
+        self.class_hits[class_id] = self.class_hits.get(class_id, 0) + 1
+        self.hits += 1
+        self.misses = 0
+
+    def ranked_classes(self):
+        """Classes triées par confiance cumulée décroissante : [(id, score), ...]"""
+        return sorted(self.class_scores.items(), key=lambda kv: kv[1], reverse=True)
+
+    @property
+    def best_class(self):
+        ranked = self.ranked_classes()
+        return ranked[0][0] if ranked else None
+
+    @property
+    def evidence(self):
+        """Avance de la meilleure classe sur la deuxième (confiance cumulée)"""
+        ranked = self.ranked_classes()
+        if not ranked:
+            return 0.0
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return ranked[0][1] - runner_up
+
+    def as_detection(self, names):
+        """Detection représentant la piste (classe retenue, confiance moyenne)"""
+        class_id = self.best_class
+        confidence = self.class_scores[class_id] / self.class_hits[class_id]
+        return Detection(names[class_id], class_id, confidence, list(self.bbox))
+
+    def __repr__(self):
+        return f"Track(#{self.track_id}, cls={self.best_class}, evidence={self.evidence:.2f})"
+
+
+class ObjectTracker:
+    """
+    Suivi IoU / centre avec accumulation de la confiance par classe
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD,
+                 max_centroid_distance=TRACK_MAX_CENTROID_DISTANCE,
+                 max_misses=TRACK_MAX_MISSES, evidence_threshold=TRACK_EVIDENCE_THRESHOLD):
+        """
+        Args:
+            iou_threshold: IoU minimale pour associer une détection à une piste
+            max_centroid_distance: Distance max (px) des centres si l'IoU est insuffisante
+            max_misses: Images sans détection avant suppression de la piste
+            evidence_threshold: Avance de confiance cumulée déclenchant le tri
+        """
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_misses = max_misses
+        self.evidence_threshold = evidence_threshold
+        self.tracks = []
+        self._ids = count(1)
+
+    def reset(self):
+        self.tracks = []
+
+    def _match(self, boxes):
+        """Associer détections et pistes : liste de (index piste, index détection)"""
+        if not self.tracks or not len(boxes):
+            return []
+        track_boxes = np.array([t.bbox for t in self.tracks], dtype=np.float32)
+        ious = box_iou(track_boxes, boxes[:, :4])
+        centers_t = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+        centers_d = (boxes[:, :2] + boxes[:, 2:4]) / 2
+        dist = np.linalg.norm(centers_t[:, None, :] - centers_d[None, :, :], axis=2)
+        # Score : IoU si suffisante, sinon proximité des centres (toujours < IoU valide)
+        score = np.where(ious >= self.iou_threshold, 1.0 + ious,
+                         np.where(dist <= self.max_centroid_distance,
+                                  1.0 - dist / (self.max_centroid_distance + 1e-9), -1.0))
+        pairs = []
+        while True:
+            ti, di = np.unravel_index(np.argmax(score), score.shape)
+            if score[ti, di] < 0:
+                return pairs
+            pairs.append((ti, di))
+            score[ti, :] = -1.0
+            score[:, di] = -1.0
+
+    def update(self, boxes):
+        """
+        Mettre à jour les pistes avec les détections d'une image
+
+        Args:
+            boxes: Tableau (N, 6) [x1, y1, x2, y2, conf, cls] (ex : Detections.boxes)
+
+        Retourne:
+            list: Pistes actives
+        """
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        pairs = self._match(boxes)
+        matched_tracks = {ti for ti, _ in pairs}
+        matched_dets = {di for _, di in pairs}
+
+        for ti, di in pairs:
+            row = boxes[di]
+            self.tracks[ti].add(row[[X1, Y1, X2, Y2]].tolist(), int(row[CLS]), float(row[CONF]))
+        for ti, track in enumerate(self.tracks):
+            track.age += 1
+            if ti not in matched_tracks:
+                track.misses += 1
+        for di in range(len(boxes)):
+            if di not in matched_dets:
+                row = boxes[di]
+                track = Track(next(self._ids), row[[X1, Y1, X2, Y2]].tolist())
+                track.add(track.bbox, int(row[CLS]), float(row[CONF]))
+                track.age = 1
+                self.tracks.append(track)
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        return self.tracks
+
+    def pending(self):
+        """Pistes visibles sans décision de tri"""
+        return [t for t in self.tracks if not t.resolved and t.misses == 0]
+
+    def leading(self):
+        """Piste non résolue la plus avancée vers une décision (ou None)"""
+        pending = self.pending()
+        return max(pending, key=lambda t: t.evidence) if pending else None
+
+    def ready(self):
+        """Piste dont les preuves suffisent pour trier (ou None)"""
+        track = self.leading()
+        if track is not None and track.evidence >= self.evidence_threshold:
+            return track
+        return None
+
+    def ready_all(self):
+        """Toutes les pistes dont les preuves suffisent, de la plus sûre à la moins sûre"""
+        ready = [t for t in self.pending() if t.evidence >= self.evidence_threshold]
+        return sorted(ready, key=lambda t: t.evidence, reverse=True)
+
+
+# ============================================
+# BENCHMARK : IMAGES AVANT DÉCISION
+# ============================================
+
+class ClassEqualityCounter:
+    """Ancienne règle : MIN_DETECTIONS meilleures boîtes consécutives de même classe"""
+
+    def __init__(self, min_detections=MIN_DETECTIONS):
+        self.min_detections = min_detections
+        self.last_class = None
+        self.count = 0
+
+    def update(self, boxes):
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 6)
+        if not len(boxes):
+            return None
+        best_class = int(boxes[np.argmax(boxes[:, CONF]), CLS])
+        if best_class == self.last_class:
+            self.count += 1
+        else:
+            self.count = 1
+            self.last_class = best_class
+        if self.count >= self.min_detections:
+            self.count = 0
+            return best_class
+        return None
+
+
+def synthetic_episodes(n, seed=0, n_classes=6, flicker=0.3, miss=0.1, max_frames=40):
+    """
+    Épisodes simulés : un objet posé sur la plateforme, classe parfois confondue
+
+    Retourne:
+        list: [(classe réelle, [boîtes (N, 6) par image]), ...]
+    """
+    rng = random.Random(seed)
+    episodes = []
+    for _ in range(n):
+        true_class = rng.randrange(n_classes)
+        confuser = (true_class + 1 + rng.randrange(n_classes - 1)) % n_classes
+        cx, cy = rng.uniform(200, 440), rng.uniform(150, 330)
+        frames = []
+        for _ in range(max_frames):
+            rows = []
+            if rng.random() > miss:
+                jx, jy = rng.gauss(0, 4), rng.gauss(0, 4)
+                box = [cx + jx - 50, cy + jy - 40, cx + jx + 50, cy + jy + 40]
+                if rng.random() < flicker:
+                    rows.append(box + [rng.uniform(0.6, 0.8), confuser])
+                else:
+                    rows.append(box + [rng.uniform(0.65, 0.95), true_class])
+            if rng.random() < 0.05:
+                # Fausse détection ailleurs dans l'image
+                rows.append([20, 20, 60, 60, rng.uniform(0.6, 0.7), rng.randrange(n_classes)])
+            frames.append(np.array(rows, dtype=np.float32).reshape(-1, 6))
+        episodes.append((true_class, frames))
+    return episodes
+
+
+def log_episodes(path, gap=10):
+    """
+    Épisodes lus depuis un journal de détections (une ligne JSON par image inférée,
+    clé "boxes"), séparés par au moins gap images vides
+    """
+    episodes, current, empty = [], [], 0
+    with open(path) as f:
+        for line in f:
+            boxes = np.array(json.loads(line)["boxes"], dtype=np.float32).reshape(-1, 6)
+            empty = empty + 1 if not len(boxes) else 0
+            if empty >= gap and current:
+                episodes.append((None, current))
+                current = []
+            elif len(boxes) or current:
+                current.append(boxes)
+    if current:
+        episodes.append((None, current))
+    return episodes
+
+
+def _first_decision(rule, frames):
+    for i, boxes in enumerate(frames, 1):
+        if isinstance(rule, ObjectTracker):
+            rule.update(boxes)
+            track = rule.ready()
+            if track is not None:
+                return i, track.best_class
+        else:
+            decided = rule.update(boxes)
+            if decided is not None:
+                return i, decided
+    return None, None
+
+
+def benchmark(episodes):
+    """Comparer l'ancien compteur et le suivi sur les mêmes épisodes"""
+    report = {}
+    for name, factory in (("class_counter", ClassEqualityCounter), ("tracker", ObjectTracker)):
+        frames_to_decision, wrong, undecided = [], 0, 0
+        for true_class, frames in episodes:
+            n, decided = _first_decision(factory(), frames)
+            if n is None:
+                undecided += 1
+                continue
+            frames_to_decision.append(n)
+            if true_class is not None and decided != true_class:
+                wrong += 1
+        decided_count = len(frames_to_decision)
+        report[name] = {
+            "episodes": len(episodes),
+            "decided": decided_count,
+            "undecided": undecided,
+            "median_frames_to_decision": float(np.median(frames_to_decision)) if decided_count else None,
+            "p90_frames_to_decision": float(np.percentile(frames_to_decision, 90)) if decided_count else None,
+            "wrong_class": wrong if episodes and episodes[0][0] is not None else None,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la décision de tri")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, metavar="N", help="N épisodes simulés")
+    source.add_argument("--log", help="Journal de détections (JSONL, DETECTION_LOG_PATH)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    episodes = synthetic_episodes(args.synthetic, args.seed) if args.synthetic else log_episodes(args.log)
+    report = benchmark(episodes)
+    print("\n📊 Images avant décision de tri")
+    for name, stats in report.items():
+        print(f"  {name}")
+        for key, value in stats.items():
+            print(f"    {key:27} : {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
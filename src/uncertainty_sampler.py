@@ -0,0 +1,131 @@
+"""
+Smart Bin SI - Échantillonnage par incertitude (apprentissage actif)
+- Chaque décision de tri reçoit un score d'incertitude calculé sur sa piste :
+  confiance faible, faible avance de la 1re classe sur la 2e, désaccord entre images
+- Seules les décisions au-dessus d'un seuil sont demandées à l'opérateur / enregistrées ;
+  le seuil suit les scores récents pour ne retenir qu'une part ACTIVE_LEARNING_BUDGET
+- Valeur des labels obtenus : part des demandes où l'opérateur corrige le modèle
+"""
+
+from collections import deque
+
+import numpy as np
+
+from config import (
+    ACTIVE_LEARNING_BUDGET, ACTIVE_LEARNING_MIN_SCORE, ACTIVE_LEARNING_WINDOW,
+    ACTIVE_LEARNING_WEIGHTS,
+)
+
+# Scores récents nécessaires avant d'utiliser le quantile (sinon seuil minimal seul)
+WARMUP_DECISIONS = 20
+
+
+def uncertainty(track):
+    """
+    Composantes d'incertitude d'une piste (chacune entre 0 et 1)
+
+    Retourne:
+        dict: {"confidence", "margin", "disagreement"}
+    """
+    ranked = track.ranked_classes()
+    best, best_score = ranked[0]
+    runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    return {
+        # 1 - confiance moyenne de la classe retenue
+        "confidence": 1.0 - best_score / track.class_hits[best],
+        # Avance relative de la 1re classe sur la 2e (confiance cumulée) : 0 = nette
+        "margin": runner_up / best_score if best_score > 0 else 1.0,
+        # Part des images où une autre classe était détectée
+        "disagreement": 1.0 - track.class_hits[best] / max(track.hits, 1),
+    }
+
+
+class UncertaintySampler:
+    """
+    Choix des décisions à faire valider (budget de demandes / sauvegardes)
+    """
+
+    def __init__(self, budget=ACTIVE_LEARNING_BUDGET, min_score=ACTIVE_LEARNING_MIN_SCORE,
+                 window=ACTIVE_LEARNING_WINDOW, weights=ACTIVE_LEARNING_WEIGHTS):
+        """
+        Args:
+            budget: Part visée des décisions retenues (0.2 = une sur cinq)
+            min_score: Score minimal : une décision sûre n'est jamais retenue
+            window: Nombre de scores récents pour le seuil
+            weights: Poids (confiance, marge, désaccord) dans le score
+        """
+        self.budget = budget
+        self.min_score = min_score
+        self.weights = dict(zip(("confidence", "margin", "disagreement"), weights))
+        total = sum(self.weights.values())
+        self.weights = {k: w / total for k, w in self.weights.items()}
+        self.recent = deque(maxlen=window)
+        self.decisions = 0
+        self.selected = 0
+        self.outcomes = {"confirmed": 0, "corrected": 0, "skipped": 0}
+        self.selected_score_sum = 0.0
+        self.corrected_score_sum = 0.0
+
+    def score(self, track):
+        """Score d'incertitude pondéré (0 = sûr, 1 = très incertain) et ses composantes"""
+        parts = uncertainty(track)
+        return sum(self.weights[k] * v for k, v in parts.items()), parts
+
+    @property
+    def threshold(self):
+        """Seuil courant : quantile (1 - budget) des scores récents, au moins min_score"""
+        if len(self.recent) < WARMUP_DECISIONS:
+            return self.min_score
+        return max(self.min_score, float(np.quantile(self.recent, 1.0 - self.budget)))
+
+    def select(self, track):
+        """
+        Cette décision doit-elle être validée / enregistrée ?
+
+        Retourne:
+            tuple: (retenue, score)
+        """
+        score, parts = self.score(track)
+        selected = score >= self.threshold
+        self.recent.append(score)
+        self.decisions += 1
+        if selected:
+            self.selected += 1
+            self.selected_score_sum += score
+            print(f"❓ Décision incertaine (score {score:.2f} : confiance {parts['confidence']:.2f}, "
+                  f"marge {parts['margin']:.2f}, désaccord {parts['disagreement']:.2f})")
+        return selected, score
+
+    def record(self, score, detected_class, answer):
+        """
+        Réponse de l'opérateur à une décision retenue
+
+        Args:
+            score: Score de la décision
+            detected_class: Classe proposée par le modèle
+            answer: Classe validée, ou None si ignorée
+        """
+        if answer is None:
+            self.outcomes["skipped"] += 1
+        elif answer == detected_class:
+            self.outcomes["confirmed"] += 1
+        else:
+            self.outcomes["corrected"] += 1
+            self.corrected_score_sum += score
+
+    def stats(self):
+        answered = self.outcomes["confirmed"] + self.outcomes["corrected"]
+        return {
+            "decisions": self.decisions,
+            "selected": self.selected,
+            "save_rate": round(self.selected / self.decisions, 3) if self.decisions else 0.0,
+            "budget": self.budget,
+            "threshold": round(self.threshold, 3),
+            "outcomes": dict(self.outcomes),
+            # Valeur des labels : erreurs du modèle trouvées par demande répondue
+            "label_value": round(self.outcomes["corrected"] / answered, 3) if answered else 0.0,
+            "mean_selected_score": round(self.selected_score_sum / self.selected, 3)
+            if self.selected else None,
+            "mean_corrected_score": round(self.corrected_score_sum / self.outcomes["corrected"], 3)
+            if self.outcomes["corrected"] else None,
+        }
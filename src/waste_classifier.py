@@ -1,9 +1,14 @@
 """
 Smart Bin SI - Base de données (objet → bac) + Arduino (tri)
 Utilisé par yolo_detector.py pour le tri et l'apprentissage des associations.
+Base en journal WAL (synchronous=NORMAL) ; les usage_count sont comptés en mémoire et
+écrits en une transaction par un thread (DB_USAGE_FLUSH_INTERVAL) et à l'arrêt (cleanup).
 """
 
 import sqlite3
+import threading
+import time
+import numpy as np
 import serial
 import serial.tools.list_ports
 from pathlib import Path
@@ -13,7 +18,8 @@ from datetime import datetime
 try:
     from config import (
         DB_PATH, ARDUINO_PORT, BAUD_RATE, SORTING_DURATION,
-        VALID_BINS, WASTE_TO_BIN_MAPPING,
+        VALID_BINS, WASTE_TO_BIN_MAPPING, BIN_CACHE_CHECK_INTERVAL,
+        DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_BUSY_TIMEOUT_MS, DB_USAGE_FLUSH_INTERVAL,
     )
 except ImportError:
     import sys
@@ -21,19 +27,40 @@ except ImportError:
     sys.path.insert(0, str(Path(__file__).resolve().parent))
     from config import (
         DB_PATH, ARDUINO_PORT, BAUD_RATE, SORTING_DURATION,
-        VALID_BINS, WASTE_TO_BIN_MAPPING,
+        VALID_BINS, WASTE_TO_BIN_MAPPING, BIN_CACHE_CHECK_INTERVAL,
+        DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_BUSY_TIMEOUT_MS, DB_USAGE_FLUSH_INTERVAL,
     )
 
+from actuator import SortActuator
+
 # Connexions globales
 _conn = None
+_db_lock = threading.RLock()   # Connexion partagée avec le thread d'écriture des compteurs
 _serial = None
+_actuator = None
+# Incréments de usage_count pas encore écrits (nom → nombre)
+_usage_pending = {}
+_usage_flusher = None
+
+# Saisie utilisateur (remplaçable par des réponses scriptées en relecture)
+_input = input
+# Cache mémoire de la table waste_classification fusionnée avec WASTE_TO_BIN_MAPPING
+_cache_lock = threading.RLock()
+_bin_cache = None          # nom normalisé → couleur du bac
+_cache_generation = 0      # Incrémenté à chaque invalidation
+_data_version = None       # PRAGMA data_version lu au chargement du cache
+_last_version_check = 0.0
+_class_bins = {}           # tuple des noms du modèle → (génération, tableau par id)
 
 
 def init_database():
-    """Crée la base SQLite et la table si besoin."""
-    global _conn
+    """Crée la base SQLite et la table si besoin (WAL + écriture groupée des compteurs)."""
+    global _conn, _usage_flusher
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    _conn = sqlite3.connect(str(DB_PATH))
+    _conn = sqlite3.connect(str(DB_PATH), check_same_thread=False)
+    _conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+    _conn.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE}")
+    _conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
     _conn.execute("""
         CREATE TABLE IF NOT EXISTS waste_classification (
             item_name TEXT PRIMARY KEY,
@@ -43,22 +70,81 @@ def init_database():
         )
     """)
     _conn.commit()
+    invalidate_bin_cache()
+    if _usage_flusher is None and DB_USAGE_FLUSH_INTERVAL > 0:
+        _usage_flusher = _UsageFlusher(DB_USAGE_FLUSH_INTERVAL)
+        _usage_flusher.start()
+
+
+class _UsageFlusher(threading.Thread):
+    """Écrit périodiquement les usage_count en attente (une transaction)"""
+
+    def __init__(self, interval):
+        super().__init__(name="db-usage-flush", daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            flush_usage_counts()
 
+    def stop(self):
+        self.stop_event.set()
+        self.join(timeout=5.0)
+
+
+def record_usage(item_name):
+    """Compter une utilisation (écrite au prochain flush_usage_counts)"""
+    with _db_lock:
+        _usage_pending[item_name] = _usage_pending.get(item_name, 0) + 1
+
+
+def flush_usage_counts():
+    """
+    Écrire les usage_count en attente en une seule transaction
 
-def init_serial_connection():
-    """Ouvre la connexion série vers l'Arduino. En mode simulation si pas d'Arduino."""
-    global _serial
-    if _serial is not None:
+    Retourne:
+        int: Nombre d'objets mis à jour
+    """
+    with _db_lock:
+        if not _conn or not _usage_pending:
+            return 0
+        pending = list(_usage_pending.items())
+        try:
+            with _conn:
+                _conn.executemany(
+                    "UPDATE waste_classification SET usage_count = usage_count + ? WHERE item_name = ?",
+                    [(count, name) for name, count in pending]
+                )
+        except sqlite3.Error as e:
+            print(f"⚠ Compteurs d'utilisation non écrits (nouvel essai plus tard) : {e}")
+            return 0
+        _usage_pending.clear()
+        return len(pending)
+
+
+def init_serial_connection(simulate=False):
+    """
+    Ouvre la connexion série vers l'Arduino. En mode simulation si pas d'Arduino.
+    Démarre l'actionneur qui possède le port (file de commandes + lecture des acquittements).
+    - simulate: si True, n'ouvre pas le port (relecture d'une vidéo)
+    """
+    global _serial, _actuator
+    if _actuator is not None:
         return
-    try:
-        _serial = serial.Serial(ARDUINO_PORT, BAUD_RATE, timeout=1)
-        # Laisser le temps à l'Arduino de reset
-        import time
-        time.sleep(2)
-        print("✓ Arduino connecté")
-    except Exception as e:
-        print(f"⚠ Arduino non détecté ({e}) - mode simulation")
+    if simulate:
+        print("ℹ Arduino en simulation (relecture)")
         _serial = None
+    else:
+        try:
+            _serial = serial.Serial(ARDUINO_PORT, BAUD_RATE, timeout=1)
+            # Laisser le temps à l'Arduino de reset
+            time.sleep(2)
+            print("✓ Arduino connecté")
+        except Exception as e:
+            print(f"⚠ Arduino non détecté ({e}) - mode simulation")
+            _serial = None
+    _actuator = SortActuator(_serial).start()
 
 
 def init_serial():
@@ -67,37 +153,120 @@ def init_serial():
 
 
 def cleanup():
-    """Ferme la DB et la série."""
-    global _conn, _serial
-    if _conn:
-        _conn.close()
-        _conn = None
+    """Écrit les compteurs en attente, ferme la DB et la série."""
+    global _conn, _serial, _actuator, _usage_flusher
+    if _actuator:
+        _actuator.stop()
+        _actuator = None
+    if _usage_flusher:
+        _usage_flusher.stop()
+        _usage_flusher = None
+    flush_usage_counts()
+    with _db_lock:
+        if _conn:
+            _conn.close()
+            _conn = None
+    invalidate_bin_cache()
     if _serial and _serial.is_open:
         _serial.close()
         _serial = None
 
 
-def get_bin_color(item_name):
+# ============================================
+# CACHE OBJET → BAC
+# ============================================
+
+def invalidate_bin_cache():
+    """Force le rechargement du cache au prochain accès."""
+    global _bin_cache, _cache_generation
+    with _cache_lock:
+        _bin_cache = None
+        _cache_generation += 1
+
+
+def _read_data_version():
+    try:
+        with _db_lock:
+            return _conn.execute("PRAGMA data_version").fetchone()[0]
+    except sqlite3.Error:
+        return None
+
+
+def _check_external_change():
     """
-    Retourne la couleur du bac pour un objet (sans sauvegarder).
-    Cherche en DB, sinon mapping par défaut dans config.
+    Invalide le cache si un autre processus a modifié la DB (ex : interface admin).
+    data_version ne change pas pour les écritures de cette connexion :
+    celles-ci passent par save_to_database, qui invalide directement.
     """
-    if not item_name:
-        return None
-    item_name = item_name.strip().lower()
-    # 1. Base de données
+    global _last_version_check
+    now = time.monotonic()
+    if _bin_cache is None or now - _last_version_check < BIN_CACHE_CHECK_INTERVAL:
+        return
+    _last_version_check = now
+    if _conn and _read_data_version() != _data_version:
+        invalidate_bin_cache()
+
+
+def _load_bin_cache():
+    """Mapping par défaut (config) puis associations de la DB, prioritaires."""
+    global _bin_cache, _data_version, _last_version_check
+    cache = {name.strip().lower(): color for name, color in WASTE_TO_BIN_MAPPING.items()}
+    version = None
     if _conn:
         try:
-            row = _conn.execute(
-                "SELECT bin_color FROM waste_classification WHERE item_name = ?",
-                (item_name,)
-            ).fetchone()
-            if row:
-                return row[0]
+            version = _read_data_version()
+            with _db_lock:
+                cache.update(_conn.execute(
+                    "SELECT item_name, bin_color FROM waste_classification"
+                ).fetchall())
         except sqlite3.OperationalError:
             pass
-    # 2. Mapping par défaut (config)
-    return WASTE_TO_BIN_MAPPING.get(item_name)
+    _bin_cache = cache
+    _data_version = version
+    _last_version_check = time.monotonic()
+    return cache
+
+
+def _get_bin_cache():
+    with _cache_lock:
+        _check_external_change()
+        if _bin_cache is None:
+            return _load_bin_cache()
+        return _bin_cache
+
+
+def get_bin_color(item_name):
+    """
+    Retourne la couleur du bac pour un objet (sans sauvegarder).
+    Cherche en DB, sinon mapping par défaut dans config (via le cache mémoire).
+    """
+    if not item_name:
+        return None
+    return _get_bin_cache().get(item_name.strip().lower())
+
+
+def get_class_bins(names):
+    """
+    Table id de classe du modèle → couleur du bac (None si inconnu).
+    Permet d'associer toutes les détections d'une image à leur bac en une indexation :
+    get_class_bins(model.names)[boxes[:, CLS].astype(int)]
+    Le tableau est recalculé seulement quand le cache a été invalidé.
+
+    Args:
+        names: model.names (dict id → nom ou liste)
+    """
+    items = tuple(names.items()) if isinstance(names, dict) else tuple(enumerate(names))
+    with _cache_lock:
+        cache = _get_bin_cache()
+        cached = _class_bins.get(items)
+        if cached is not None and cached[0] == _cache_generation:
+            return cached[1]
+        size = max(idx for idx, _ in items) + 1 if items else 0
+        class_bins = np.empty(size, dtype=object)
+        for idx, name in items:
+            class_bins[idx] = cache.get(str(name).strip().lower())
+        _class_bins[items] = (_cache_generation, class_bins)
+        return class_bins
 
 
 def save_to_database(item_name, bin_color):
@@ -107,19 +276,33 @@ def save_to_database(item_name, bin_color):
     item_name = item_name.strip().lower()
     now = datetime.now().isoformat()
     try:
-        _conn.execute("""
-            INSERT INTO waste_classification (item_name, bin_color, created_at, usage_count)
-            VALUES (?, ?, ?, 1)
-            ON CONFLICT(item_name) DO UPDATE SET
-                bin_color = excluded.bin_color,
-                usage_count = usage_count + 1
-        """, (item_name, bin_color, now))
-        _conn.commit()
+        # Association apprise : validée tout de suite (rare, saisie par l'utilisateur)
+        with _db_lock:
+            _conn.execute("""
+                INSERT INTO waste_classification (item_name, bin_color, created_at, usage_count)
+                VALUES (?, ?, ?, 1)
+                ON CONFLICT(item_name) DO UPDATE SET
+                    bin_color = excluded.bin_color,
+                    usage_count = usage_count + 1
+            """, (item_name, bin_color, now))
+            _conn.commit()
+        invalidate_bin_cache()
         return True
     except Exception:
         return False
 
 
+def set_input_hook(func):
+    """Remplace input() pour les questions posées à l'utilisateur (None = input)."""
+    global _input
+    _input = func or input
+
+
+def prompt_user(prompt):
+    """Pose une question à l'utilisateur (ou au script de relecture)."""
+    return _input(prompt)
+
+
 def ask_user_for_bin(item_name):
     """
     Demande à l'utilisateur dans quel bac mettre cet objet.
@@ -131,7 +314,7 @@ def ask_user_for_bin(item_name):
         print(f"  {i} - {b}")
     print("  0 - Annuler")
     try:
-        choice = input("Choix : ").strip()
+        choice = prompt_user("Choix : ").strip()
         if choice == "0":
             return None
         idx = int(choice)
@@ -142,25 +325,63 @@ def ask_user_for_bin(item_name):
     return None
 
 
-def send_sort_command(bin_color):
-    """Envoie la commande de tri à l'Arduino."""
-    if _serial and _serial.is_open:
-        try:
-            _serial.write(f"{bin_color}\n".encode())
-            _serial.flush()
-        except Exception as e:
-            print(f"⚠ Erreur envoi Arduino : {e}")
-            return False
-    else:
+def send_sort_command(bin_color, wait=False):
+    """
+    Envoie la commande de tri à l'Arduino via la file de l'actionneur.
+    - wait: si True, attend la fin de la séquence ("Termine") ou SORTING_DURATION
+    """
+    if _actuator is None:
         print(f"[Simulation] → Tri vers bac {bin_color}")
+        return True
+    job = _actuator.submit(bin_color)
+    if job is None:
+        return False
+    if wait:
+        job.wait(SORTING_DURATION + 1)
+        return bool(job.ok)
+    return True
+
+
+def send_sort_batch(bin_colors, wait=False):
+    """
+    Envoie plusieurs tris en une commande "batch brown,green" : l'Arduino enchaîne
+    les bacs dans l'ordre donné sans revenir au repos entre deux.
+    Un seul bac → commande simple (compatible avec un ancien firmware).
+    """
+    if len(bin_colors) == 1:
+        return send_sort_command(bin_colors[0], wait=wait)
+    command = "batch " + ",".join(bin_colors)
+    if _actuator is None:
+        print(f"[Simulation] → {command}")
+        return True
+    job = _actuator.submit(command, timeout=SORTING_DURATION * len(bin_colors))
+    if job is None:
+        return False
+    if wait:
+        job.wait(SORTING_DURATION * len(bin_colors) + 1)
+        return bool(job.ok)
     return True
 
 
-def classify_and_sort(item_name, ask_if_unknown=True, auto_mode=False):
+def is_sorting():
+    """True si la plateforme est occupée (tri en cours ou en attente)."""
+    return _actuator is not None and _actuator.is_busy()
+
+
+def get_actuator_status():
+    """État de l'actionneur (connexion, file, dernier message Arduino)."""
+    if _actuator is None:
+        return {"connected": False, "busy": False}
+    return _actuator.status()
+
+
+def classify_and_sort(item_name, ask_if_unknown=True, auto_mode=False, wait=True, send=True):
     """
     Détermine le bac pour l'objet, enregistre si nouveau, envoie la commande de tri.
     - ask_if_unknown: si True, demande à l'utilisateur pour un objet inconnu
     - auto_mode: si True, utilise uniquement le mapping sans demander
+    - wait: si True, attend la fin de la séquence de tri ; sinon retourne aussitôt
+    - send: si False, détermine seulement le bac (tri groupé envoyé par send_sort_batch)
     Retourne la couleur du bac utilisée, ou None.
     """
     if not item_name:
@@ -176,22 +397,12 @@ def classify_and_sort(item_name, ask_if_unknown=True, auto_mode=False):
         else:
             return None
     else:
-        # Incrémenter usage_count
+        # Incrémenter usage_count (en mémoire : écrit par lot, pas de transaction par tri)
         if _conn:
-            try:
-                _conn.execute(
-                    "UPDATE waste_classification SET usage_count = usage_count + 1 WHERE item_name = ?",
-                    (item_name,)
-                )
-                _conn.commit()
-            except Exception:
-                pass
-
-    if bin_color:
-        send_sort_command(bin_color)
-        if _serial and _serial.is_open:
-            import time
-            time.sleep(SORTING_DURATION)
+            record_usage(item_name)
+
+    if bin_color and send:
+        send_sort_command(bin_color, wait=wait)
     return bin_color
 
 
@@ -199,12 +410,14 @@ def get_stats():
     """Retourne les stats de la base (pour affichage)."""
     if not _conn:
         return []
+    flush_usage_counts()
     try:
-        return _conn.execute("""
-            SELECT item_name, bin_color, usage_count
-            FROM waste_classification
-            ORDER BY usage_count DESC
-        """).fetchall()
+        with _db_lock:
+            return _conn.execute("""
+                SELECT item_name, bin_color, usage_count
+                FROM waste_classification
+                ORDER BY usage_count DESC
+            """).fetchall()
     except Exception:
         return []
 
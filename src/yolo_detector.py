@@ -5,48 +5,54 @@ Smart Bin SI - Détecteur YOLO avec apprentissage au fur et à mesure
 - Utilise waste_classifier pour le tri (DB + Arduino)
 """
 
-import cv2
-import torch
 import time
+_import_start = time.perf_counter()
+
+import cv2
+import json
+import os
+import queue
+import threading
 import numpy as np
-from pathlib import Path
-from datetime import datetime
+from collections import deque
+from contextlib import nullcontext
 
 import waste_classifier
+from detections import Detections
+from camera_pipeline import FrameGrabber, InferenceStage, FrameRing, get_csi_pipeline
+from motion_gate import MotionGate
+from platform_roi import load_roi, crop
+from tracker import ObjectTracker
+from model_server import RemoteModel
+from inference_backends import load_backend, BackendResults
+from inference_workers import WorkerInferenceStage, WorkerModel, snapshot_weights
+from model_registry import StartupTimer, checkpoint_names, fallback_weights
+from model_reloader import ModelReloader, log_reload
+from image_writer import TrainingImageWriter
+from storage_manager import StorageManager
+from image_dedup import ImageDeduplicator
+from replay import is_replay_source, ReplayCapture, ScriptedAnswers, StageTimer
+from pipeline_metrics import MetricsPublisher, latency_histogram
+from adaptive_resolution import ResolutionController
+from sort_queue import SortQueue
+from uncertainty_sampler import UncertaintySampler
 from config import (
-    MODEL_PATH, CONFIDENCE_THRESHOLD, IOU_THRESHOLD,
-    CAMERA_SOURCE, USE_CSI_CAMERA, FRAME_WIDTH, FRAME_HEIGHT, SHOW_DISPLAY,
-    AUTO_SORT_DELAY, MIN_DETECTIONS, LEARNING_MODE, SAVE_IMAGES,
+    MODEL_PATH, CONFIDENCE_THRESHOLD,
+    INFERENCE_BACKEND, INFERENCE_SIZE,
+    MODEL_HOT_RELOAD, MODEL_RELOAD_MAX_SLOWDOWN, MODEL_RELOAD_PROBATION,
+    USE_MODEL_SERVER, MODEL_SERVER_SOCKET,
+    CAMERA_SOURCE, REPLAY_SPEED, USE_CSI_CAMERA, FRAME_WIDTH, FRAME_HEIGHT, SHOW_DISPLAY,
+    CAPTURE_QUEUE_SIZE, RESULT_QUEUE_SIZE, FRAME_RING_HISTORY, INFERENCE_WORKERS,
+    INFERENCE_RING_SLOTS, MOTION_GATE, ROI_INFERENCE_SIZE,
+    ADAPTIVE_RESOLUTION, ADAPTIVE_SIZES, ADAPTIVE_TARGET_FPS, ADAPTIVE_CONFIRM_RATIO,
+    ARDUINO_PORT, BAUD_RATE, PIPELINE_METRICS, PIPELINE_METRICS_WINDOW,
+    SORT_BATCH, AUTO_SORT_DELAY, LEARNING_MODE, SAVE_IMAGES, DEDUP_IMAGES, DETECTION_LOG_PATH,
+    ACTIVE_LEARNING,
     TRAINING_DIR, BIN_COLORS,
 )
 
-
-# ============================================
-# SUPPORT CAMÉRA CSI JETSON
-# ============================================
-
-def get_csi_pipeline(camera_id=0, width=640, height=480, fps=30):
-    """
-    Créer un pipeline GStreamer pour caméra CSI Jetson
-    
-    Args:
-        camera_id: ID du capteur caméra (0 ou 1)
-        width: Largeur de l'image
-        height: Hauteur de l'image
-        fps: Fréquence d'images
-    
-    Retourne:
-        str: Chaîne de pipeline GStreamer
-    """
-    return (
-        f"nvarguscamerasrc sensor-id={camera_id} ! "
-        f"video/x-raw(memory:NVMM), width={width}, height={height}, "
-        f"format=NV12, framerate={fps}/1 ! "
-        f"nvvidconv flip-method=0 ! "
-        f"video/x-raw, width={width}, height={height}, format=BGRx ! "
-        f"videoconvert ! "
-        f"video/x-raw, format=BGR ! appsink"
-    )
+# Durée des imports du module (torch, OpenCV...) pour le détail du démarrage
+_IMPORT_SECONDS = time.perf_counter() - _import_start
 
 
 # ============================================
@@ -70,153 +76,485 @@ class WasteDetector:
         print("🤖 SMART BIN SI - DÉTECTEUR YOLO")
         print("="*50)
         
-        # Charger le modèle YOLO
+        # Relecture d'une vidéo / d'un dossier : Arduino simulé, réponses scriptées,
+        # latence mesurée par étape (toutes les mesures en relecture, fenêtre glissante
+        # pour les métriques en direct)
+        self.replay = is_replay_source(CAMERA_SOURCE)
+        self.stage_timer = None
+        self.resolution = None
+        
+        # Zone de la plateforme : seule cette zone est envoyée à YOLO.
+        # Taille configurée en attendant la première image (_resolve_roi)
+        self.roi = load_roi()
+        self.roi_shape = (FRAME_HEIGHT, FRAME_WIDTH)
+        self.inference_size = ROI_INFERENCE_SIZE if self.roi else INFERENCE_SIZE
+        if self.roi:
+            print(f"✓ Zone de la plateforme : {self.roi} (inférence {self.inference_size} px)")
+        
+        # Charger le modèle YOLO (avec détail du temps de démarrage)
+        self.startup = StartupTimer()
+        self.startup.add("imports", _IMPORT_SECONDS)
+        self.model_path = model_path
+        # Processus d'inférence : le modèle est chargé dans chacun, pas ici
+        self.use_workers = INFERENCE_WORKERS > 0 and not USE_MODEL_SERVER
         self.model = self.load_model(model_path)
+        self.class_bins = None
+        
+        # Rechargement à chaud : l'échange de modèle attend la fin de l'inférence en cours
+        self.model_lock = threading.RLock()
+        self.reloader = None
+        self.inference_stage = None  # Étape des processus d'inférence (rechargement, retour arrière)
+        self.previous_model = None   # Ancien modèle, gardé pendant la période d'essai
+        self.previous_bins = None
+        self.probation = 0
+        self.inference_latency = None  # Moyenne glissante (s), référence des vérifications
+        self._pending_reload = None    # Échange fait, interruption d'inférence à mesurer
+        self._last_result_time = None
+        
+        # Tailles d'inférence adaptatives : jamais au-delà de la taille configurée.
+        # Pas en relecture : la taille dépendrait de la vitesse de la machine
+        # (benchmark et détections non reproductibles)
+        sizes = [self.inference_size]
+        if ADAPTIVE_RESOLUTION and not self.replay:
+            sizes += [size for size in ADAPTIVE_SIZES if size < self.inference_size]
         
-        # Suivi des détections
-        self.last_detection = None
-        self.detection_count = 0
+        # Première inférence (préchauffage) hors de la boucle caméra, pour chaque taille
+        # (processus d'inférence : préchauffés par chacun au démarrage de l'étape)
+        if not self.use_workers:
+            with self.startup.phase("first_inference"):
+                blank = np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+                for size in sizes:
+                    self.detect_waste(blank, size)
+        self.startup.report()
+        
+        self.sizes = sorted(sizes)
+        if len(sizes) > 1:
+            self.resolution = ResolutionController(sizes)
+            print(f"✓ Taille d'inférence adaptative : {self.resolution.sizes} "
+                  f"(objectif {ADAPTIVE_TARGET_FPS} FPS)")
+        
+        # Mesures par étape (après le préchauffage) : toutes en relecture,
+        # fenêtre glissante pour les métriques en direct
+        if self.replay:
+            self.stage_timer = StageTimer()
+        elif PIPELINE_METRICS:
+            self.stage_timer = StageTimer(window=PIPELINE_METRICS_WINDOW)
+        
+        # Suivi des détections (pistes persistantes, preuves cumulées par classe)
+        self.tracker = ObjectTracker()
+        self.last_detection = None  # Piste en tête, pour la correction 'c'
         self.last_sort_time = 0
-        self.last_frame = None  # Pour sauvegarder l'image lors de corrections
+        self.sort_times = deque(maxlen=1000)  # Horodatages des tris (tris / minute)
+        self.last_sort = None
+        # Tri groupé : objets prêts en file, envoyés en lot quand la plateforme est libre
+        self.sort_queue = SortQueue() if SORT_BATCH else None
+        self.frame_ring = None  # Dernières images analysées (corrections, apprentissage)
+        # Apprentissage actif : seules les décisions incertaines sont demandées / enregistrées
+        self.sampler = UncertaintySampler() if ACTIVE_LEARNING else None
+        self.detection_log = open(DETECTION_LOG_PATH, "a") if DETECTION_LOG_PATH else None
+        
+        # Filtre de mouvement : YOLO seulement si la scène change
+        self.motion_gate = MotionGate() if MOTION_GATE else None
+        if self.motion_gate and self.replay:
+            self.motion_gate.idle_interval = 0.0  # La cadence vient de la relecture
         
         # Initialiser les connexions via waste_classifier
-        waste_classifier.init_serial_connection()
+        waste_classifier.init_serial_connection(simulate=self.replay)
+        if self.replay:
+            waste_classifier.set_input_hook(ScriptedAnswers())
         waste_classifier.init_database()
+        self.refresh_class_bins()
         
         # Dossier pour les images d'apprentissage (quand tu confirmes "correct")
+        # Écriture en arrière-plan : la boucle ne bloque pas sur le disque
+        self.image_writer = None
+        self.deduplicator = ImageDeduplicator() if SAVE_IMAGES and DEDUP_IMAGES else None
+        if self.deduplicator:
+            # Index des doublons prêts avant la boucle caméra (dossiers existants hashés ici)
+            folders = self.deduplicator.preload()
+            print(f"✓ Index des doublons : {folders} dossiers d'images")
         if SAVE_IMAGES:
             TRAINING_DIR.mkdir(parents=True, exist_ok=True)
+            # Quota de la carte SD appliqué par les threads d'écriture ;
+            # images supprimées retirées de l'index des doublons
+            storage = StorageManager(on_evict=self.deduplicator.forget if self.deduplicator else None)
+            self.image_writer = TrainingImageWriter(storage=storage)
         
         print("✓ Détecteur initialisé\n")
     
     def load_model(self, model_path):
         """
         Charger le modèle YOLO depuis un fichier
-        Supporte YOLOv5 et YOLOv8 via torch.hub ou ultralytics
+        Supporte YOLOv5 et YOLOv8 via torch.hub ou ultralytics,
+        ou un export ONNX / OpenVINO selon INFERENCE_BACKEND
+        Avec USE_MODEL_SERVER, se connecte au serveur de modèle partagé
         """
-        print(f"📦 Chargement du modèle depuis : {model_path}")
-        
-        if not Path(model_path).exists():
-            print(f"⚠ Fichier du modèle introuvable : {model_path}")
-            print("   Utilisation du YOLOv5s par défaut (pré-entraîné sur COCO)")
-            print("   Pour utiliser un modèle custom, entraîne-le d'abord !")
-            
-            # Charger YOLOv5s pré-entraîné comme solution de secours
-            model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
-        else:
-            # Charger le modèle custom entraîné
-            try:
-                model = torch.hub.load('ultralytics/yolov5', 'custom', path=model_path)
-                print("✓ Modèle custom chargé avec succès")
-            except Exception as e:
-                print(f"✗ Erreur lors du chargement du modèle custom : {e}")
-                print("   Retour au YOLOv5s pré-entraîné")
-                model = torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
-        
-        # Définir les paramètres du modèle
-        model.conf = CONFIDENCE_THRESHOLD
-        model.iou = IOU_THRESHOLD
-        
-        # Utiliser le GPU si disponible (important pour Jetson)
-        if torch.cuda.is_available():
-            model = model.cuda()
-            print("✓ Accélération GPU activée")
-        else:
-            print("⚠ Exécution sur CPU (plus lent)")
-        
-        return model
+        if USE_MODEL_SERVER:
+            print(f"🔌 Connexion au serveur de modèle : {MODEL_SERVER_SOCKET}")
+            with self.startup.phase("model_build"):
+                model = RemoteModel(MODEL_SERVER_SOCKET)
+            print(f"✓ Connecté (client {model.client_id}, {len(model.names)} classes)")
+            return model
+        if self.use_workers:
+            return self._load_worker_model(model_path)
+        return load_backend(INFERENCE_BACKEND, model_path, self.startup)
+    
+    def _load_worker_model(self, weights_path):
+        """
+        Mode INFERENCE_WORKERS : noms des classes lus dans le checkpoint, sans construire
+        le réseau (seuls les processus d'inférence chargent et préchauffent le modèle)
+        """
+        weights = weights_path if os.path.exists(weights_path) else fallback_weights()
+        try:
+            with self.startup.phase("model_build"):
+                names = checkpoint_names(weights)
+        except Exception as e:
+            # Checkpoint non YOLOv5 (hub, YOLOv8...) : modèle complet chargé pour ses noms, puis libéré
+            print(f"⚠ Noms des classes illisibles dans le checkpoint ({e}) : chargement complet")
+            names = load_backend(INFERENCE_BACKEND, weights_path, self.startup).names
+        print(f"✓ {len(names)} classes ; modèle chargé par {INFERENCE_WORKERS} processus d'inférence")
+        return WorkerModel(names, weights_path)
     
-    def detect_waste(self, frame):
+    def detect_waste(self, frame, size=None):
         """
         Exécuter la détection YOLO sur une image
+        Avec une zone de plateforme, seule la zone recadrée est analysée
+        (boîtes ramenées à l'image complète par process_detections)
         
         Args:
             frame: Image OpenCV (format BGR)
+            size: Taille d'inférence (défaut : taille configurée)
         
         Retourne:
             results: Résultats de détection YOLO
         """
+        size = size or self.inference_size
         # Exécuter l'inférence
-        results = self.model(frame)
+        start = time.perf_counter()
+        try:
+            results = self.model(crop(frame, self.roi), size=size)
+        except Exception as e:
+            # Modèle tout juste rechargé qui échoue : retour à l'ancien
+            if not self._rollback_model(e):
+                raise
+            start = time.perf_counter()
+            results = self.model(crop(frame, self.roi), size=size)
+        self._observe_inference(size, time.perf_counter() - start)
         return results
     
-    def process_detections(self, results):
+    def _observe_inference(self, size, seconds):
+        """Durée d'une inférence : mesures par étape et taille adaptative"""
+        if self.stage_timer:
+            self.stage_timer.add("inference", seconds)
+        if self.resolution:
+            self.resolution.observe(size, seconds)
+        if size == self.inference_size:
+            previous = self.inference_latency
+            self.inference_latency = seconds if previous is None else previous + 0.1 * (seconds - previous)
+    
+    # ------------------------------------------
+    # Rechargement à chaud des poids
+    # ------------------------------------------
+    
+    def _prepare_model(self, weights_path):
+        """
+        Thread de rechargement : charger, préchauffer et vérifier de nouveaux poids
+        
+        Retourne:
+            tuple: (modèle, infos de durée) ; lève ValueError si la vérification échoue
+        """
+        if self.use_workers:
+            return self._prepare_worker_model(weights_path)
+        start = time.perf_counter()
+        model = load_backend(INFERENCE_BACKEND, weights_path)
+        load_ms = (time.perf_counter() - start) * 1000
+        
+        # Image d'essai : dernière image analysée (copiée : l'anneau est réutilisé)
+        sample = self.frame_ring.latest() if self.frame_ring else None
+        if sample is None:
+            sample = np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+        region = crop(sample, self.roi).copy()
+        
+        start = time.perf_counter()
+        for size in self.sizes:
+            model(region, size=size)
+        warm_ms = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        results = model(region, size=self.inference_size)
+        latency = time.perf_counter() - start
+        self._smoke_check(model, results, latency)
+        return model, {
+            "path": str(weights_path),
+            "load_ms": round(load_ms, 1),
+            "warm_ms": round(warm_ms, 1),
+            "latency_ms": round(latency * 1000, 1),
+            "classes": len(model.names),
+        }
+    
+    def _prepare_worker_model(self, weights_path):
+        """
+        Thread de rechargement, mode INFERENCE_WORKERS : copie figée des poids et noms des
+        classes ; chargement, préchauffage et vérification ont lieu dans les nouveaux processus
+        """
+        start = time.perf_counter()
+        with self.model_lock:
+            keep = [getattr(model, "weights_path", None) for model in (self.model, self.previous_model)]
+        snapshot = snapshot_weights(weights_path, keep=keep)
+        model = WorkerModel(checkpoint_names(snapshot), str(snapshot))
+        return model, {
+            "path": str(snapshot),
+            "load_ms": round((time.perf_counter() - start) * 1000, 1),
+            "classes": len(model.names),
+        }
+    
+    def _check_worker_pool(self, model, pool):
+        """Thread de démarrage des processus : image d'essai avant l'échange"""
+        sample = self.frame_ring.latest() if self.frame_ring else None
+        if sample is None:
+            sample = np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+        boxes, latency = pool.run_once(crop(sample, self.roi).copy(), self.inference_size)
+        self._smoke_check(model, BackendResults([boxes], model.names), latency)
+    
+    def _smoke_check(self, model, results, latency):
+        """Vérifications minimales avant l'échange (sorties valides, latence raisonnable)"""
+        names = model.names
+        if not names:
+            raise ValueError("aucune classe dans le modèle")
+        boxes = Detections.from_results(results, names).boxes
+        if boxes.ndim != 2 or boxes.shape[1] != 6:
+            raise ValueError(f"sortie inattendue {boxes.shape}")
+        if not np.isfinite(boxes).all():
+            raise ValueError("valeurs non finies dans les détections")
+        if len(boxes) and (boxes[:, 5].min() < 0 or int(boxes[:, 5].max()) >= len(names)):
+            raise ValueError("identifiant de classe hors des noms du modèle")
+        if self.inference_latency and latency > MODEL_RELOAD_MAX_SLOWDOWN * self.inference_latency:
+            raise ValueError(f"latence {latency * 1000:.0f} ms, modèle actuel "
+                             f"{self.inference_latency * 1000:.0f} ms")
+    
+    def _swap_model(self, inference):
+        """Boucle principale : échanger le modèle préparé entre deux images"""
+        candidate = self.reloader.take() if self.reloader else None
+        if candidate is None:
+            return
+        model, info = candidate
+        class_bins = waste_classifier.get_class_bins(model.names)
+        if isinstance(inference, WorkerInferenceStage):
+            # Nouveaux processus démarrés en arrière-plan, l'ancien groupe sert jusqu'à l'échange
+            print("⏳ Démarrage des processus d'inférence avec les nouveaux poids...")
+            started = time.perf_counter()
+            
+            def on_ready():
+                info["warm_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                self._activate_model(model, class_bins, info)
+            
+            inference.reload(model.weights_path,
+                             check=lambda pool: self._check_worker_pool(model, pool),
+                             on_ready=on_ready,
+                             on_failed=lambda error: self._reject_worker_model(info, error))
+            return
+        self._activate_model(model, class_bins, info)
+    
+    def _activate_model(self, model, class_bins, info):
+        """Mettre le modèle préparé en service (entre deux images) ; période d'essai"""
+        start = time.perf_counter()
+        with self.model_lock:
+            self.previous_model, self.previous_bins = self.model, self.class_bins
+            self.model, self.class_bins = model, class_bins
+            self.probation = MODEL_RELOAD_PROBATION
+        info["swap_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        info["at"] = time.time()
+        self._pending_reload = info
+        print(f"✓ Nouveau modèle en service ({info['classes']} classes) : chargement "
+              f"{info['load_ms']:.0f} ms, préchauffage {info['warm_ms']:.0f} ms, "
+              f"échange {info['swap_ms']:.2f} ms")
+    
+    def _reject_worker_model(self, info, error):
+        """Étape des processus : les nouveaux poids n'ont pas démarré, l'ancien groupe reste"""
+        if self.reloader:
+            self.reloader.rejected += 1
+        log_reload({"at": time.time(), "path": info["path"], "status": "rejected",
+                    "reason": f"{type(error).__name__}: {error}"})
+    
+    def _rollback_model(self, error):
+        """
+        Thread d'inférence (ou étape des processus) : le nouveau modèle échoue pendant
+        sa période d'essai ; les processus repartent avec la copie figée des anciens poids
+        """
+        with self.model_lock:
+            if self.previous_model is None:
+                return False
+            print(f"✗ Nouveau modèle en échec ({error}) : retour à l'ancien")
+            self.model, self.class_bins = self.previous_model, self.previous_bins
+            self.previous_model = self.previous_bins = None
+            self.probation = 0
+            model = self.model
+        if self.inference_stage is not None:
+            self.inference_stage.reload(model.weights_path)
+        log_reload({"at": time.time(), "path": str(self.model_path), "status": "rolled_back",
+                    "reason": f"{type(error).__name__}: {error}"})
+        return True
+    
+    def _model_result_seen(self):
+        """Boucle principale, à chaque image analysée : interruption et période d'essai"""
+        now = time.perf_counter()
+        if self._pending_reload is not None:
+            info, self._pending_reload = self._pending_reload, None
+            if self._last_result_time is not None:
+                info["gap_ms"] = round((now - self._last_result_time) * 1000, 1)
+                print(f"ℹ Interruption d'inférence pendant l'échange : {info['gap_ms']:.0f} ms")
+            info["status"] = "swapped"
+            log_reload(info)
+        self._last_result_time = now
+        if self.probation:
+            self.probation -= 1
+            if not self.probation:
+                with self.model_lock:
+                    self.previous_model = self.previous_bins = None
+    
+    def process_detections(self, results, as_dicts=False):
         """
         Traiter les résultats YOLO et extraire les déchets
+        Lit directement results.xyxy[0] dans un tableau NumPy (pas de pandas)
         
         Args:
             results: Résultats de détection YOLO
+            as_dicts: True pour obtenir l'ancien format (liste de dicts)
         
         Retourne:
-            list: Déchets détectés avec [nom_classe, confiance, bbox]
+            Detections: Déchets détectés (ou liste de dicts {'class', 'confidence', 'bbox'})
         """
-        detections = []
-        
-        # Extraire les résultats (format dépend de YOLOv5 vs YOLOv8)
-        try:
-            # Format YOLOv5
-            predictions = results.pandas().xyxy[0]
-            
-            for idx, row in predictions.iterrows():
-                class_name = row['name']
-                confidence = row['confidence']
-                bbox = [row['xmin'], row['ymin'], row['xmax'], row['ymax']]
-                
-                detections.append({
-                    'class': class_name,
-                    'confidence': confidence,
-                    'bbox': bbox
-                })
-        except:
-            # Analyse alternative si pandas non disponible
-            pred = results.xyxy[0].cpu().numpy()
-            for detection in pred:
-                x1, y1, x2, y2, conf, cls = detection
-                class_name = self.model.names[int(cls)]
-                
-                detections.append({
-                    'class': class_name,
-                    'confidence': float(conf),
-                    'bbox': [float(x1), float(y1), float(x2), float(y2)]
-                })
-        
+        with self._measure("postprocess"):
+            detections = Detections.from_results(
+                results, self.model.names,
+                conf_threshold=CONFIDENCE_THRESHOLD,
+                class_bins=self.class_bins,
+                offset=self.roi[:2] if self.roi else None,
+            )
+        if as_dicts:
+            return detections.to_dicts()
         return detections
     
-    def should_trigger_sort(self, detection):
+    def refresh_class_bins(self):
+        """
+        Récupérer la table id de classe → couleur du bac (cache de waste_classifier)
+        Permet d'associer toutes les détections d'une image à leur bac en une indexation
+        Appelé depuis le thread principal (connexion SQLite) ; le tableau n'est
+        reconstruit que si la base a changé
+        """
+        self.class_bins = waste_classifier.get_class_bins(self.model.names)
+    
+    def should_trigger_sort(self, detections, now=None):
         """
         Décider si on doit déclencher l'action de tri
-        Utilise un filtrage temporel pour éviter les faux positifs
+        Suit les objets d'une image à l'autre et cumule la confiance par classe :
+        le tri se déclenche quand une piste a assez de preuves pour sa classe
         
         Args:
-            detection: Dictionnaire de détection actuel
+            detections: Detections de l'image courante
+            now: Horodatage de l'image (temps de la source en relecture)
         
         Retourne:
-            bool: True si on doit trier maintenant
+            Track: Piste à trier maintenant, ou None
         """
-        current_time = time.time()
+        current_time = time.time() if now is None else now
+        
+        self._update_tracking(detections)
         
         # Vérifier si assez de temps s'est écoulé depuis le dernier tri
+        # et que la plateforme a fini la séquence précédente
         if current_time - self.last_sort_time < AUTO_SORT_DELAY:
-            return False
+            return None
+        if waste_classifier.is_sorting():
+            return None
         
-        # Vérifier si le même objet est détecté plusieurs fois
-        if detection and self.last_detection:
-            if detection['class'] == self.last_detection['class']:
-                self.detection_count += 1
-            else:
-                self.detection_count = 1
-                self.last_detection = detection
-        else:
-            self.detection_count = 1
-            self.last_detection = detection
+        # Déclencher si une piste a accumulé assez de preuves
+        track = self.tracker.ready()
+        if track is not None:
+            track.resolved = True
+            self.last_sort_time = current_time
+        return track
+    
+    def _update_tracking(self, detections):
+        """Prolonger les pistes avec les détections de l'image"""
+        self.tracker.update(detections.boxes)
+        leading = self.tracker.leading()
+        self.last_detection = leading.as_detection(detections.names) if leading else None
+    
+    def queue_ready_tracks(self, detections, now=None):
+        """
+        Tri groupé : chaque objet suivi dont les preuves suffisent entre dans la file
+        (tous les objets de la plateforme, pas seulement le plus confiant)
         
-        # Déclencher si le minimum de détections consécutives est atteint
-        if self.detection_count >= MIN_DETECTIONS:
-            self.detection_count = 0
+        Args:
+            detections: Detections de l'image courante
+            now: Horodatage de l'image (temps de la source en relecture)
+        """
+        current_time = time.time() if now is None else now
+        self._update_tracking(detections)
+        for track in self.tracker.ready_all():
+            track.resolved = True
+            waste_class, bin_color = self._classify_track(track, detections, send=False)
+            if bin_color:
+                self.sort_queue.add(track.track_id, waste_class, bin_color, current_time)
+                print(f"📥 En file : {waste_class} → {bin_color} ({len(self.sort_queue)} en attente)")
+    
+    def dispatch_sort_queue(self, now=None):
+        """Envoyer le prochain lot si la plateforme est libre (ordre limitant la rotation)"""
+        current_time = time.time() if now is None else now
+        if current_time - self.last_sort_time < AUTO_SORT_DELAY or waste_classifier.is_sorting():
+            return
+        if not self.sort_queue.due(current_time):
+            return
+        batch = self.sort_queue.take_batch(current_time)
+        print("\n🎯 TRI GROUPÉ : " + " → ".join(f"{item['class']} ({item['bin']})" for item in batch))
+        if waste_classifier.send_sort_batch([item["bin"] for item in batch]):
             self.last_sort_time = current_time
-            return True
+            for item in batch:
+                self._record_sort(item["class"], item["bin"])
+    
+    def _classify_track(self, track, detections, send=True):
+        """
+        Classe (validée en mode apprentissage) et bac d'une piste prête
+        
+        Retourne:
+            tuple: (classe, couleur du bac), bac None si ignoré ou inconnu
+        """
+        best_detection = track.as_detection(detections.names)
+        waste_class = best_detection.class_name
+        
+        # Apprentissage actif : une décision sûre n'interrompt pas l'opérateur
+        # et n'ajoute pas d'image redondante
+        selected, score = self.sampler.select(track) if self.sampler else (True, None)
+        
+        # En mode apprentissage, demander confirmation
+        if LEARNING_MODE and selected:
+            corrected_class = self.handle_correction(*self._correction_sample(best_detection))
+            if self.sampler:
+                self.sampler.record(score, waste_class, corrected_class)
+            if corrected_class is None:
+                return waste_class, None  # Ignoré par l'utilisateur
+            waste_class = corrected_class
+        elif selected and self.sampler:
+            # Mode auto : image gardée pour vérification (hors jeu d'entraînement)
+            frame, sample = self._correction_sample(best_detection)
+            self.save_image_for_training(frame, waste_class, bbox=sample.bbox,
+                                         class_id=sample.class_id, review=True)
         
-        return False
+        # Utiliser waste_classifier pour le tri
+        # ask_if_unknown=True pour permettre d'apprendre
+        # wait=False : la boucle continue pendant que la plateforme bouge
+        bin_color = waste_classifier.classify_and_sort(
+            waste_class,
+            ask_if_unknown=True,
+            auto_mode=False,
+            wait=False,
+            send=send
+        )
+        if bin_color:
+            # Un nouvel objet a pu être appris : mettre à jour la table des bacs
+            self.refresh_class_bins()
+        return waste_class, bin_color
     
     def get_bin_color_for_display(self, waste_class):
         """
@@ -228,7 +566,7 @@ class WasteDetector:
         Retourne:
             str: Couleur du bac ou None
         """
-        # Chercher en base de données sans sauvegarder
+        # Cache mémoire (DB + mapping par défaut), sans requête SQL
         bin_color = waste_classifier.get_bin_color(waste_class)
         return bin_color
     
@@ -238,18 +576,23 @@ class WasteDetector:
         
         Args:
             frame: Image OpenCV
-            detections: Liste des dictionnaires de détection
+            detections: Detections de l'image
         
         Retourne:
             frame: Image annotée
         """
+        # Zone de la plateforme analysée
+        if self.roi:
+            x1, y1, x2, y2 = self.roi
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 255, 255), 1)
+        
         for det in detections:
-            x1, y1, x2, y2 = [int(v) for v in det['bbox']]
-            class_name = det['class']
-            confidence = det['confidence']
+            x1, y1, x2, y2 = [int(v) for v in det.bbox]
+            class_name = det.class_name
+            confidence = det.confidence
             
-            # Obtenir la couleur du bac pour ce déchet (juste pour affichage)
-            bin_color = self.get_bin_color_for_display(class_name)
+            # Couleur du bac pré-calculée pour toute l'image (table par id de classe)
+            bin_color = det.bin_color
             
             color = BIN_COLORS.get(bin_color, BIN_COLORS["unknown"])
             
@@ -273,7 +616,8 @@ class WasteDetector:
         
         return frame
     
-    def save_image_for_training(self, frame, class_name, bbox=None, class_id=None, correct=True):
+    def save_image_for_training(self, frame, class_name, bbox=None, class_id=None, correct=True,
+                                review=False):
         """
         Sauvegarde une image pour le réentraînement YOLO.
         Quand tu confirmes que la détection est correcte, l'image est stockée
@@ -285,32 +629,39 @@ class WasteDetector:
             bbox: [x1, y1, x2, y2] optionnel → génère un .txt au format YOLO
             class_id: index de la classe (pour le .txt YOLO)
             correct: True = bonne détection, False = erreur (sauvegardé dans _errors/)
+            review: True = décision incertaine non validée (sauvegardé dans _review/)
         """
         if not SAVE_IMAGES:
             return
         class_name = class_name.strip().lower().replace(" ", "_")
-        if correct:
+        if review:
+            folder = TRAINING_DIR / "_review" / class_name
+            prefix = "rev"
+        elif correct:
             folder = TRAINING_DIR / class_name
+            prefix = "ok"
         else:
             folder = TRAINING_DIR / "_errors" / class_name
-        folder.mkdir(parents=True, exist_ok=True)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        prefix = "ok" if correct else "err"
-        base = f"{prefix}_{timestamp}"
-        filename = folder / f"{base}.jpg"
-        cv2.imwrite(str(filename), frame)
-        # Fichier label YOLO (une ligne : class_id x_center y_center width height, normalisé 0-1)
-        if bbox is not None and class_id is not None and len(bbox) == 4:
-            h, w = frame.shape[:2]
-            x1, y1, x2, y2 = [float(x) for x in bbox]
-            x_center = ((x1 + x2) / 2) / w
-            y_center = ((y1 + y2) / 2) / h
-            width = (x2 - x1) / w
-            height = (y2 - y1) / h
-            label_path = folder / f"{base}.txt"
-            with open(label_path, "w") as f:
-                f.write(f"{class_id} {x_center:.6f} {y_center:.6f} {width:.6f} {height:.6f}\n")
-        print(f"💾 Image sauvegardée pour apprentissage : {filename.name} ({class_name})")
+            prefix = "err"
+        
+        # Quasi-doublon d'une image déjà enregistrée pour cette classe ?
+        image_hash = None
+        if self.deduplicator:
+            image_hash, duplicate = self.deduplicator.check(folder, frame, bbox)
+            if duplicate:
+                print(f"⊘ Image quasi identique à {duplicate} ({class_name}), non enregistrée")
+                return
+        
+        # Encodage et écriture dans le thread d'écriture (nom unique, sans écrasement)
+        # Copie ici seulement : les tampons de l'anneau d'images sont réutilisés.
+        # Hash indexé seulement une fois l'image écrite (pas de doublon d'un fichier absent)
+        def on_written(path):
+            self.deduplicator.register(folder, path.name, image_hash)
+        
+        filename = self.image_writer.save(folder, prefix, frame.copy(), bbox=bbox, class_id=class_id,
+                                          on_written=on_written if self.deduplicator else None)
+        if filename is not None:
+            print(f"💾 Image sauvegardée pour apprentissage : {filename.name} ({class_name})")
     
     def _class_name_to_id(self, class_name):
         """Retourne l'index de la classe dans le modèle (pour le label YOLO)."""
@@ -328,11 +679,11 @@ class WasteDetector:
         
         Args:
             frame: Image actuelle
-            best_detection: dict avec 'class', 'confidence', 'bbox'
+            best_detection: Detection (classe, confiance, bbox)
         """
-        detected_class = best_detection["class"]
-        bbox = best_detection.get("bbox")
-        class_id = self._class_name_to_id(detected_class)
+        detected_class = best_detection.class_name
+        bbox = best_detection.bbox
+        class_id = best_detection.class_id
         
         print(f"\n⚠ YOLO a détecté : '{detected_class}'")
         print("Est-ce correct ?")
@@ -340,7 +691,7 @@ class WasteDetector:
         print("  n - Non, corriger le nom")
         print("  skip - Ignorer")
         
-        choice = input("Votre choix : ").strip().lower()
+        choice = waste_classifier.prompt_user("Votre choix : ").strip().lower()
         
         if choice == 'y':
             print("✓ Détection confirmée → image sauvegardée pour réentraînement")
@@ -351,7 +702,7 @@ class WasteDetector:
         
         elif choice == 'n':
             print("\nQuel est le vrai nom de cet objet ?")
-            correct_name = input("Nom correct : ").strip()
+            correct_name = waste_classifier.prompt_user("Nom correct : ").strip()
             
             if correct_name:
                 correct_name = correct_name.strip().lower().replace(" ", "_")
@@ -363,12 +714,212 @@ class WasteDetector:
         print("⊘ Détection ignorée")
         return None
     
+    def _correction_sample(self, detection):
+        """
+        Image des FRAME_RING_HISTORY dernières où la classe détectée est la plus confiante
+        (objet le mieux vu), avec la boîte correspondant à cette image
+        
+        Retourne:
+            tuple: (image, Detection)
+        """
+        frame, best = self.frame_ring.best(detection.class_id)
+        if frame is None:
+            return self.frame_ring.latest(), detection
+        return frame, best
+    
+    def _tracking_unresolved(self):
+        """Un objet est-il suivi sans décision de tri encore prise ?"""
+        return bool(self.tracker.pending())
+    
+    def _confirming(self):
+        """La piste en tête approche-t-elle du seuil de tri ?"""
+        leading = self.tracker.leading()
+        return (leading is not None and
+                leading.evidence >= ADAPTIVE_CONFIRM_RATIO * self.tracker.evidence_threshold)
+    
+    def _prepare(self, frame):
+        """
+        Filtre de mouvement et choix de la taille d'inférence
+        
+        Retourne:
+            tuple: (zone à analyser, taille), ou None si l'image est sautée
+        """
+        self._resolve_roi(frame)
+        region = crop(frame, self.roi)
+        if self.motion_gate and not self.motion_gate.should_infer(
+                region, unresolved=self._tracking_unresolved()):
+            self.motion_gate.wait_idle()
+            return None
+        # Taille adaptée à la charge, maximale pour les images qui confirment un tri
+        size = self.resolution.select(self._confirming()) if self.resolution else self.inference_size
+        return region, size
+    
+    def _resolve_roi(self, frame):
+        """
+        ROI ramenée à la taille réelle des images : la caméra peut ignorer
+        FRAME_WIDTH / FRAME_HEIGHT (autre mode du capteur, vidéo relue)
+        """
+        shape = frame.shape[:2]
+        if shape == self.roi_shape:
+            return
+        self.roi_shape = shape
+        self.roi = load_roi(width=shape[1], height=shape[0])
+        print(f"ℹ Images {shape[1]}x{shape[0]} : zone de la plateforme {self.roi}")
+    
+    def _infer(self, frame):
+        """
+        Étape d'inférence du pipeline : image -> Detections
+        Retourne None si le filtre de mouvement a sauté l'image
+        """
+        prepared = self._prepare(frame)
+        if prepared is None:
+            return None
+        with self.model_lock:
+            results = self.detect_waste(frame, prepared[1])
+            return self.process_detections(results)
+    
+    def _finish_worker_result(self, boxes, size, seconds):
+        """Boîtes (N, 6) d'un processus d'inférence -> Detections (mêmes mesures que detect_waste)"""
+        self._observe_inference(size, seconds)
+        with self.model_lock:
+            return self.process_detections(BackendResults([boxes], self.model.names))
+    
+    def _create_frame_ring(self):
+        """
+        Anneau d'images préalloué : historique + images en cours
+        (files de capture et de résultats, inférences en vol, lecture et affichage)
+        """
+        in_flight = 1
+        if self.use_workers:
+            in_flight = INFERENCE_RING_SLOTS or 2 * INFERENCE_WORKERS
+        return FrameRing(FRAME_RING_HISTORY, CAPTURE_QUEUE_SIZE + RESULT_QUEUE_SIZE + in_flight + 2)
+    
+    def _start_inference_stage(self, frames):
+        """
+        Étape d'inférence : thread dans ce processus, ou N processus parallèles
+        (INFERENCE_WORKERS) alimentés par un anneau d'images en mémoire partagée
+        """
+        if self.use_workers:
+            print(f"⚙ Inférence répartie sur {INFERENCE_WORKERS} processus")
+            # Copie figée : MODEL_PATH peut être remplacé, retour arrière toujours possible
+            if os.path.exists(self.model.weights_path):
+                self.model.weights_path = str(snapshot_weights(self.model.weights_path))
+            self.inference_stage = WorkerInferenceStage(
+                frames, INFERENCE_WORKERS, self._prepare, self._finish_worker_result,
+                maxsize=RESULT_QUEUE_SIZE, blocking=self.replay, ring=self.frame_ring,
+                weights_path=self.model.weights_path, warmup_sizes=self.sizes,
+                on_error=self._rollback_model)
+            return self.inference_stage
+        return InferenceStage(frames, self._infer, maxsize=RESULT_QUEUE_SIZE,
+                              blocking=self.replay, ring=self.frame_ring)
+    
+    def _measure(self, stage):
+        """Mesure de la durée d'une étape (relecture et métriques en direct)"""
+        return self.stage_timer.measure(stage) if self.stage_timer else nullcontext()
+    
+    def _handle_sort_decision(self, detections, now=None):
+        """
+        Décision de tri sur le résultat le plus récent
+        
+        Args:
+            detections: Detections de l'image la plus récente
+            now: Horodatage de l'image
+        """
+        if self.detection_log:
+            self.detection_log.write(json.dumps({
+                "t": round(time.time(), 3),
+                "boxes": detections.boxes.round(2).tolist(),
+            }) + "\n")
+        
+        if self.sort_queue is not None:
+            self.queue_ready_tracks(detections, now)
+            self.dispatch_sort_queue(now)
+            return
+        
+        track = self.should_trigger_sort(detections, now)
+        if track is None:
+            return
+        waste_class, bin_color = self._classify_track(track, detections)
+        if bin_color:
+            print(f"\n🎯 TRI AUTO DÉCLENCHÉ : {waste_class}")
+            print(f"✓ Tri vers le bac {bin_color} lancé")
+            self._record_sort(waste_class, bin_color)
+    
+    def _record_sort(self, waste_class, bin_color):
+        now = time.time()
+        self.sort_times.append(now)
+        self.last_sort = {"class": waste_class, "bin": bin_color, "at": now}
+    
+    def _metrics_snapshot(self, grabber, inference, fps, frame_shape):
+        """Instantané publié pour l'interface admin (/api/pipeline/metrics)"""
+        now = time.time()
+        samples = self.stage_timer.snapshot()
+        stages = self.stage_timer.report()["stages"]
+        for stage, summary in stages.items():
+            summary["histogram"] = latency_histogram(samples[stage])
+        leading = self.tracker.leading()
+        last_detection = None
+        if leading and self.last_detection:
+            last_detection = self.last_detection.as_dict()
+            last_detection.update(track_id=leading.track_id, evidence=round(leading.evidence, 3))
+        arduino = waste_classifier.get_actuator_status()
+        arduino.update(port=None if self.replay else ARDUINO_PORT, baudrate=BAUD_RATE)
+        return {
+            "running": True,
+            "pid": os.getpid(),
+            "updated_at": now,
+            "camera": {
+                "source": str(CAMERA_SOURCE),
+                "replay": self.replay,
+                "resolution": f"{frame_shape[1]}x{frame_shape[0]}" if frame_shape else None,
+                "fps": fps,
+                "frames": grabber.frame_id,
+                "last_frame": self.last_frame_time,
+            },
+            "stages": stages,
+            "queues": {
+                "capture": grabber.frames.qsize(),
+                "results": inference.results.qsize(),
+                "actuator": arduino.get("queued", 0),
+                "image_writer": self.image_writer.jobs.qsize() if self.image_writer else 0,
+            },
+            "dropped": {"capture": grabber.dropped, "results": inference.dropped},
+            "frame_ring": self.frame_ring.stats(),
+            "inference_workers": inference.stats() if isinstance(inference, WorkerInferenceStage) else None,
+            "motion_gate": self.motion_gate.stats() if self.motion_gate else None,
+            "resolution": self.resolution.stats() if self.resolution else {"size": self.inference_size},
+            "model": {
+                "path": str(self.model_path),
+                "backend": INFERENCE_BACKEND,
+                "probation": self.probation,
+                "reloads": self.reloader.stats() if self.reloader else None,
+            },
+            "sorts": {
+                "total": len(self.sort_times),
+                "per_minute": sum(1 for t in self.sort_times if now - t <= 60),
+                "last": self.last_sort,
+                "queue": self.sort_queue.stats(now) if self.sort_queue else None,
+            },
+            "active_learning": self.sampler.stats() if self.sampler else None,
+            "storage": self.image_writer.storage.usage() if self.image_writer else None,
+            "last_detection": last_detection,
+            "arduino": arduino,
+        }
+    
     def run_camera_detection(self):
         """
         Boucle principale : capturer images, détecter déchets, déclencher tri
+        
+        Pipeline en 3 étapes reliées par des files bornées :
+        capture (thread) → inférence (thread) → affichage / décision (thread principal).
+        Les FPS sont limités par l'inférence seule, et les décisions portent
+        toujours sur l'image la plus récente.
         """
-        # Initialiser la caméra
-        if USE_CSI_CAMERA:
+        # Initialiser la caméra (ou la relecture)
+        if self.replay:
+            print(f"🎞 Relecture : {CAMERA_SOURCE} (vitesse {REPLAY_SPEED})")
+            cap = ReplayCapture(CAMERA_SOURCE)
+        elif USE_CSI_CAMERA:
             print("📷 Ouverture caméra CSI...")
             pipeline = get_csi_pipeline(width=FRAME_WIDTH, height=FRAME_HEIGHT)
             cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
@@ -387,88 +938,129 @@ class WasteDetector:
         print("CONTRÔLES :")
         print("  'q' - Quitter")
         print("  's' - Forcer le tri de la détection actuelle")
-        print("  'r' - Réinitialiser le compteur de détections")
+        print("  'r' - Réinitialiser le suivi des détections")
         if LEARNING_MODE:
             print("  'c' - Corriger la dernière détection")
         print("  'stats' - Voir les statistiques")
         print("="*50 + "\n")
         
+        # Démarrer les étapes capture et inférence
+        # En relecture, les files bloquent (aucune image jetée) et l'horloge est celle de la source
+        # Images lues directement dans l'anneau préalloué (pas d'allocation par image)
+        self.frame_ring = self._create_frame_ring()
+        grabber = FrameGrabber(cap, maxsize=CAPTURE_QUEUE_SIZE, blocking=self.replay,
+                               clock=cap.clock if self.replay else time.time,
+                               timer=self.stage_timer, ring=self.frame_ring)
+        inference = self._start_inference_stage(grabber.frames)
+        grabber.start()
+        inference.start()
+        
+        # Surveillance des poids (pas en relecture : résultats reproductibles)
+        if MODEL_HOT_RELOAD and not USE_MODEL_SERVER and not self.replay:
+            self.reloader = ModelReloader(self.model_path, self._prepare_model)
+            self.reloader.start()
+        
         fps_time = time.time()
         fps_counter = 0
         fps_display = 0
+        frame_shape = None
+        self.last_frame_time = None
+        metrics = MetricsPublisher() if PIPELINE_METRICS else None
+        detections = Detections.from_results(np.empty((0, 6)), self.model.names)
         
         try:
             while True:
-                # Capturer l'image
-                ret, frame = cap.read()
-                if not ret:
-                    print("✗ Échec de lecture de l'image")
-                    break
+                # Nouveau modèle prêt : échange entre deux images
+                self._swap_model(inference)
                 
-                # Sauvegarder la dernière frame pour corrections
-                self.last_frame = frame.copy()
+                # Attendre le résultat d'inférence le plus récent
+                try:
+                    item = inference.results.get(timeout=0.01)
+                except queue.Empty:
+                    item = False
                 
-                # Exécuter la détection YOLO
-                results = self.detect_waste(frame)
-                detections = self.process_detections(results)
-                
-                # Dessiner les détections
-                if SHOW_DISPLAY:
-                    frame = self.draw_detections(frame, detections)
+                if item is None:
+                    if inference.error is not None:
+                        print(f"✗ Erreur d'inférence : {inference.error}")
+                    elif self.replay:
+                        print("\n✓ Fin de la relecture")
+                    else:
+                        print("✗ Échec de lecture de l'image")
+                    break
                 
-                # Vérifier si on doit déclencher le tri
-                if detections:
-                    best_detection = max(detections, key=lambda x: x['confidence'])
+                if item is not False:
+                    frame_id, frame_time, frame, result = item
+                    # result None : image sautée par le filtre de mouvement (scène statique)
+                    inferred = result is not None
+                    if self.stage_timer:
+                        self.stage_timer.frames += 1
+                    frame_shape = frame.shape
+                    self.last_frame_time = time.time()
                     
-                    if self.should_trigger_sort(best_detection):
-                        waste_class = best_detection['class']
+                    # Image analysée gardée dans l'historique de l'anneau (sans copie),
+                    # annotations dessinées sur un tampon d'affichage réutilisé
+                    if inferred:
+                        self.frame_ring.keep(frame_id, frame, frame_time, result)
+                    display = self.frame_ring.display(frame) if SHOW_DISPLAY else None
+                    if not inferred:
+                        self.frame_ring.release(frame_id)
+                    
+                    if inferred:
+                        detections = result
+                        self._model_result_seen()
+                        # Associations modifiées (apprentissage, interface admin) ?
+                        self.refresh_class_bins()
                         
-                        # En mode apprentissage, demander confirmation
-                        if LEARNING_MODE:
-                            corrected_class = self.handle_correction(self.last_frame, best_detection)
-                            if corrected_class is None:
-                                continue  # Ignoré par l'utilisateur
-                            waste_class = corrected_class
+                        # Dessiner les détections
+                        if SHOW_DISPLAY:
+                            with self._measure("draw"):
+                                self.draw_detections(display, detections)
                         
-                        print(f"\n🎯 TRI AUTO DÉCLENCHÉ : {waste_class}")
+                        # Vérifier si on doit déclencher le tri
+                        with self._measure("decision"):
+                            self._handle_sort_decision(detections, frame_time)
+                    
+                    # Calculer les FPS (cadencés par l'inférence)
+                    fps_counter += 1
+                    if time.time() - fps_time > 1.0:
+                        fps_display = fps_counter
+                        fps_counter = 0
+                        fps_time = time.time()
+                    
+                    # Afficher les infos sur l'image
+                    if SHOW_DISPLAY:
+                        # Info FPS et détections
+                        info_text = f"FPS: {fps_display} | Detections: {len(detections)}"
+                        if self.resolution:
+                            info_text += f" | {self.resolution.size}px"
+                        cv2.putText(display, info_text, (10, 30), 
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
                         
-                        # Utiliser waste_classifier pour le tri
-                        # ask_if_unknown=True pour permettre d'apprendre
-                        bin_color = waste_classifier.classify_and_sort(
-                            waste_class,
-                            ask_if_unknown=True,
-                            auto_mode=False
-                        )
+                        # Suivi de détection (piste en tête)
+                        leading = self.tracker.leading()
+                        if leading and self.last_detection:
+                            status_text = (f"Suivi #{leading.track_id}: {self.last_detection.class_name} "
+                                           f"({leading.evidence:.1f}/{self.tracker.evidence_threshold:.1f})")
+                            cv2.putText(display, status_text, (10, 60), 
+                                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
                         
-                        if bin_color:
-                            print(f"✓ Trié vers le bac {bin_color}")
-                
-                # Calculer les FPS
-                fps_counter += 1
-                if time.time() - fps_time > 1.0:
-                    fps_display = fps_counter
-                    fps_counter = 0
-                    fps_time = time.time()
+                        # Filtre de mouvement
+                        if self.motion_gate:
+                            gate = self.motion_gate.stats()
+                            gate_text = f"YOLO: {gate['inferred']} | Saute: {gate['gated']}"
+                            cv2.putText(display, gate_text, (10, 90), 
+                                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 200, 255), 2)
+                        
+                        # Mode
+                        mode_text = "Mode: Apprentissage" if LEARNING_MODE else "Mode: Auto"
+                        cv2.putText(display, mode_text, (10, FRAME_HEIGHT - 10), 
+                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2)
+                        
+                        cv2.imshow('Smart Bin - Detection', display)
                 
-                # Afficher les infos sur l'image
-                if SHOW_DISPLAY:
-                    # Info FPS et détections
-                    info_text = f"FPS: {fps_display} | Detections: {len(detections)}"
-                    cv2.putText(frame, info_text, (10, 30), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    
-                    # Suivi de détection
-                    if self.last_detection:
-                        status_text = f"Suivi: {self.last_detection['class']} ({self.detection_count}/{MIN_DETECTIONS})"
-                        cv2.putText(frame, status_text, (10, 60), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-                    
-                    # Mode
-                    mode_text = "Mode: Apprentissage" if LEARNING_MODE else "Mode: Auto"
-                    cv2.putText(frame, mode_text, (10, FRAME_HEIGHT - 10), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 255), 2)
-                    
-                    cv2.imshow('Smart Bin - Detection', frame)
+                # Publier les métriques pour l'interface admin (au plus 1 fois / intervalle)
+                if metrics and metrics.due():
+                    metrics.publish(self._metrics_snapshot(grabber, inference, fps_display, frame_shape))
                 
                 # Gérer les entrées clavier
                 key = cv2.waitKey(1) & 0xFF
@@ -478,34 +1070,38 @@ class WasteDetector:
                     break
                 
                 elif key == ord('s'):
-                    # Tri manuel forcé
-                    if detections:
-                        best = max(detections, key=lambda x: x['confidence'])
-                        waste_class = best['class']
+                    # Tri manuel forcé (pas par-dessus une séquence en cours)
+                    if waste_classifier.is_sorting():
+                        print("\n⏳ Plateforme occupée, tri manuel ignoré")
+                    elif detections:
+                        waste_class = detections.best().class_name
                         print(f"\n⚡ TRI MANUEL FORCÉ : {waste_class}")
-                        waste_classifier.classify_and_sort(
+                        bin_color = waste_classifier.classify_and_sort(
                             waste_class,
                             ask_if_unknown=True,
-                            auto_mode=False
+                            auto_mode=False,
+                            wait=False
                         )
+                        if bin_color:
+                            self._record_sort(waste_class, bin_color)
                 
                 elif key == ord('r'):
-                    # Réinitialiser le compteur
-                    self.detection_count = 0
+                    # Réinitialiser le suivi
+                    self.tracker.reset()
                     self.last_detection = None
-                    print("\n↻ Compteur de détections réinitialisé")
+                    print("\n↻ Suivi des détections réinitialisé")
                 
                 elif key == ord('c') and LEARNING_MODE:
                     # Corriger la dernière détection
                     if self.last_detection:
                         corrected = self.handle_correction(
-                            self.last_frame,
-                            self.last_detection
+                            *self._correction_sample(self.last_detection)
                         )
                         if corrected:
                             bin_color = waste_classifier.ask_user_for_bin(corrected)
                             if bin_color:
                                 waste_classifier.save_to_database(corrected, bin_color)
+                                self.refresh_class_bins()
                 
                 # Commande textuelle pour stats
                 # (Note: ne fonctionne que si on redirige stdin, sinon utiliser 's' dans le menu)
@@ -514,12 +1110,64 @@ class WasteDetector:
             print("\n\n⚠ Interrompu par l'utilisateur")
         
         finally:
+            # Arrêter les étapes avant de libérer la caméra
+            grabber.stop()
+            inference.stop()
+            if self.reloader:
+                self.reloader.stop()
+            grabber.join(timeout=2.0)
+            inference.join(timeout=5.0)
+            if grabber.dropped or inference.dropped:
+                print(f"ℹ Images jetées : {grabber.dropped} (capture), {inference.dropped} (affichage)")
+            ring = self.frame_ring.stats()
+            if ring["overflow"]:
+                print(f"ℹ Anneau d'images : {ring['overflow']} lectures hors anneau ({ring['slots']} emplacements)")
+            if isinstance(inference, WorkerInferenceStage):
+                workers = inference.stats()
+                print(f"ℹ Processus d'inférence : {workers['completed']} images traitées, "
+                      f"{workers['stale']} résultats dépassés par un plus récent")
+            if self.sort_queue and self.sort_queue.batches:
+                sorts = self.sort_queue.stats()
+                print(f"ℹ Tri groupé : {sorts['items_sorted']} objets en {sorts['batches']} lots, "
+                      f"{sorts['items_per_minute']} objets / min, "
+                      f"rotation évitée {sorts['travel_saved_deg']}°")
+            if self.sampler and self.sampler.decisions:
+                sampler = self.sampler.stats()
+                print(f"ℹ Apprentissage actif : {sampler['selected']}/{sampler['decisions']} décisions "
+                      f"retenues ({sampler['save_rate']:.0%}), {sampler['outcomes']['corrected']} "
+                      f"erreurs du modèle trouvées ({sampler['label_value']:.0%} des réponses)")
+            if self.motion_gate:
+                gate = self.motion_gate.stats()
+                print(f"ℹ Filtre de mouvement : {gate['inferred']} inférences, "
+                      f"{gate['gated']} images sautées ({gate['gated_ratio']:.0%})")
+            
             # Nettoyage
             cap.release()
             if SHOW_DISPLAY:
                 cv2.destroyAllWindows()
             
             waste_classifier.cleanup()
+            if self.image_writer:
+                # Écrire les images encore en file avant de quitter
+                self.image_writer.close()
+                writer = self.image_writer.stats()
+                print(f"ℹ Images d'apprentissage : {writer['written']} écrites, "
+                      f"{writer['dropped']} abandonnées, file max {writer['max_queue_depth']}")
+            if self.deduplicator:
+                self.deduplicator.save()
+                print(f"ℹ Doublons d'images évités : {self.deduplicator.stats()['duplicates']}")
+            if self.detection_log:
+                self.detection_log.close()
+            if metrics:
+                metrics.close(final={"running": False, "pid": os.getpid(), "updated_at": time.time()})
+            if self.replay:
+                self.stage_timer.write_report(extra={
+                    "source": str(CAMERA_SOURCE),
+                    "speed": REPLAY_SPEED,
+                    "frames_read": grabber.frame_id,
+                    "motion_gate": self.motion_gate.stats() if self.motion_gate else None,
+                    "resolution": self.resolution.stats() if self.resolution else None,
+                })
             
             print("\n✓ Système de détection arrêté\n")
 